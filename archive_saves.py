@@ -0,0 +1,420 @@
+import fnmatch
+import io
+import os
+import struct
+import tarfile
+import tempfile
+import threading
+import zipfile
+import zlib
+
+from save_formats import get_layout
+import save_io
+
+# Saves inside an archive are addressed as "<archive path>::<member name>"
+MEMBER_SEPARATOR = "::"
+
+ARCHIVE_EXTENSIONS = (".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz")
+
+# Bytes copied per step when moving unchanged members into the rebuilt archive
+COPY_CHUNK_SIZE = 1024 * 1024
+
+# Zip records, little-endian (APPNOTE 4.3.7, 4.3.12 and 4.3.16)
+_LOCAL = struct.Struct("<4s2B4HL2L2H")
+_CENTRAL = struct.Struct("<4s4B4HL2L5H2L")
+_END = struct.Struct("<4s4H2LH")
+_LOCAL_SIG = b"PK\x03\x04"
+_CENTRAL_SIG = b"PK\x01\x02"
+_END_SIG = b"PK\x05\x06"
+_DESCRIPTOR_SIG = b"PK\x07\x08"
+
+_FLAG_ENCRYPTED = 0x01
+_FLAG_DESCRIPTOR = 0x08
+_FLAG_UTF8 = 0x800
+
+# Compressed tars are one stream, so they are always re-encoded as a whole
+_TAR_MAGIC = ((b"\x1f\x8b", "gz"), (b"BZh", "bz2"), (b"\xfd7zXZ\x00", "xz"))
+
+# Members of the compressed tar read last, so opening each of its saves in a tab
+# decompresses the stream once rather than once per member
+_tar_cache_lock = threading.Lock()
+_tar_cache = None       # (archive path, fingerprint, {member name: bytes})
+
+
+class ArchiveError(Exception):
+    """Raised when an archive cannot be read or rebuilt"""
+
+
+class ArchiveEntry:
+    """Scan result for one save inside an archive"""
+
+    def __init__(self, member, layout_key, name=None, color_start=-1, colors=None, error=None):
+        self.member = member
+        self.layout_key = layout_key
+        self.name = name
+        self.color_start = color_start
+        self.colors = colors or {}
+        self.error = error
+
+    def __repr__(self):
+        return f"ArchiveEntry({self.member!r}, {self.name!r})"
+
+
+def is_archive(path):
+    """True if path names an archive file this module can open"""
+    return path.lower().endswith(ARCHIVE_EXTENSIONS) and os.path.isfile(path)
+
+
+def member_path(archive_path, member):
+    return f"{archive_path}{MEMBER_SEPARATOR}{member}"
+
+
+def split_member_path(path):
+    """Return (archive path, member name), or (path, None) for a plain file"""
+    archive_path, sep, member = path.partition(MEMBER_SEPARATOR)
+    if not sep or not archive_path.lower().endswith(ARCHIVE_EXTENSIONS):
+        return path, None
+    return archive_path, member
+
+
+def is_member_path(path):
+    return split_member_path(path)[1] is not None
+
+
+def _wanted(name, pattern_ext, member_glob):
+    if pattern_ext and not name.lower().endswith(pattern_ext):
+        return False
+    return not member_glob or fnmatch.fnmatch(name, member_glob)
+
+
+def iter_members(archive_path, pattern_ext=(".sav",), member_glob=None):
+    """Yield (member name, bytearray) for each matching file, holding one member in memory at a time"""
+    try:
+        if zipfile.is_zipfile(archive_path):
+            with zipfile.ZipFile(archive_path) as zf:
+                for info in zf.infolist():
+                    if not info.is_dir() and _wanted(info.filename, pattern_ext, member_glob):
+                        with zf.open(info) as f:
+                            yield info.filename, bytearray(f.read())
+            return
+        # Stream mode reads a compressed tar front to back without seeking or caching members
+        with tarfile.open(archive_path, "r|*") as tf:
+            for info in tf:
+                if info.isfile() and _wanted(info.name, pattern_ext, member_glob):
+                    yield info.name, bytearray(tf.extractfile(info).read())
+    except (zipfile.BadZipFile, tarfile.TarError, zlib.error, EOFError) as e:
+        raise ArchiveError(f"Cannot read {archive_path}: {e}")
+
+
+def list_members(archive_path, pattern_ext=(".sav",)):
+    """Names of the matching files in an archive, in archive order"""
+    try:
+        if zipfile.is_zipfile(archive_path):
+            with zipfile.ZipFile(archive_path) as zf:
+                return [i.filename for i in zf.infolist() if not i.is_dir() and _wanted(i.filename, pattern_ext, None)]
+        with tarfile.open(archive_path, "r|*") as tf:
+            return [i.name for i in tf if i.isfile() and _wanted(i.name, pattern_ext, None)]
+    except (zipfile.BadZipFile, tarfile.TarError, zlib.error, EOFError) as e:
+        raise ArchiveError(f"Cannot read {archive_path}: {e}")
+
+
+def _compressed_tar(archive_path):
+    with open(archive_path, 'rb') as f:
+        head = f.read(6)
+    return any(head.startswith(magic) for magic, _ in _TAR_MAGIC)
+
+
+def read_member(path):
+    """Read one archive member given as "<archive>::<member>"; returns (bytearray, archive fingerprint)
+
+    Zip members and members of plain tars are read directly. A compressed tar can only be
+    read front to back, so all of its members are decompressed in one pass and kept until
+    another archive is read or this one changes.
+    """
+    global _tar_cache
+    archive_path, member = split_member_path(path)
+    if member is None:
+        return save_io.read_save(path)
+    fp = save_io.fingerprint(archive_path)
+    try:
+        if zipfile.is_zipfile(archive_path):
+            with zipfile.ZipFile(archive_path) as zf:
+                return bytearray(zf.read(member)), fp
+        if not _compressed_tar(archive_path):
+            with tarfile.open(archive_path, "r:") as tf:
+                f = tf.extractfile(tf.getmember(member))
+                if f is None:
+                    raise KeyError(member)
+                return bytearray(f.read()), fp
+        with _tar_cache_lock:
+            if _tar_cache is None or _tar_cache[:2] != (archive_path, fp):
+                _tar_cache = (archive_path, fp, {name: bytes(data) for name, data
+                                                 in iter_members(archive_path, pattern_ext=None)})
+            return bytearray(_tar_cache[2][member]), fp
+    except KeyError:
+        raise ArchiveError(f"{archive_path} has no member '{member}'")
+    except (zipfile.BadZipFile, tarfile.TarError, zlib.error, EOFError) as e:
+        raise ArchiveError(f"Cannot read {archive_path}: {e}")
+
+
+def scan_archive(archive_path, layout, player_name=None, pattern_ext=(".sav",), member_glob=None):
+    """Yield an ArchiveEntry per matching member; with player_name None the name is discovered"""
+    if isinstance(layout, str):
+        layout = get_layout(layout)
+    for member, data in iter_members(archive_path, pattern_ext, member_glob):
+        try:
+            color_start = layout.scan(data, player_name)
+            name = player_name or layout.name_before_block(data, color_start)[1]
+            yield ArchiveEntry(member, layout.key, name, color_start, layout.decode_block(data, color_start))
+        except ValueError as e:
+            yield ArchiveEntry(member, layout.key, error=str(e))
+
+
+def plan_archive_recolor(entries, layout, hex_colors):
+    """Build {member: (patches, expected)} setting hex_colors in every scanned entry that needs it"""
+    if isinstance(layout, str):
+        layout = get_layout(layout)
+    member_patches = {}
+    for entry in entries:
+        if entry.error:
+            continue
+        # The scan decoded the current colors, so the old bytes are re-encoded rather than re-read
+        current = layout.encode_patches(entry.color_start, entry.colors)
+        wanted = layout.encode_patches(entry.color_start, hex_colors)
+        old_bytes = dict(current)
+        changed = [(offset, new) for offset, new in wanted if old_bytes[offset] != new]
+        if changed:
+            member_patches[entry.member] = (changed, [(offset, old_bytes[offset]) for offset, _ in changed])
+    return member_patches
+
+
+# Rebuilding ------------------------------------------------------------------
+
+def _apply_patches(member, data, patches, expected):
+    """Write (offset, bytes) patches into a member after checking its target bytes"""
+    for offset, old in expected or ():
+        on_disk = bytes(data[offset:offset + len(old)])
+        if on_disk != old:
+            raise save_io.ConflictError(
+                f"{member} changed since it was loaded: bytes at {offset:X} are "
+                f"{on_disk.hex().upper()}, expected {old.hex().upper()}")
+    for offset, new in patches:
+        if offset < 0 or not new or offset + len(new) > len(data):
+            raise ValueError(f"Patch at {offset:X} lies outside {member}")
+        data[offset:offset + len(new)] = new
+
+
+def _copy_range(src, dst, length):
+    while length > 0:
+        chunk = src.read(min(COPY_CHUNK_SIZE, length))
+        if not chunk:
+            raise ArchiveError("Archive ended in the middle of a member")
+        dst.write(chunk)
+        length -= len(chunk)
+
+
+def _read_central_directory(src, size):
+    """Return the end record fields, its comment and the raw central directory"""
+    tail_start = max(0, size - _END.size - 0xFFFF)
+    src.seek(tail_start)
+    tail = src.read()
+    pos = tail.rfind(_END_SIG)
+    if pos == -1 or pos + _END.size > len(tail):
+        raise ArchiveError("No zip end record found")
+    end = _END.unpack_from(tail, pos)
+    entries, cd_size, cd_offset, comment_len = end[4], end[5], end[6], end[7]
+    if entries == 0xFFFF or cd_offset == 0xFFFFFFFF or cd_size == 0xFFFFFFFF:
+        raise ArchiveError("Zip64 archives can be read but not rewritten")
+    if tail_start + pos != cd_offset + cd_size:
+        raise ArchiveError("Zip archives with leading data (e.g. self-extractors) cannot be rewritten")
+    src.seek(cd_offset)
+    return end, tail[pos + _END.size:pos + _END.size + comment_len], src.read(cd_size)
+
+
+def _rewrite_zip(archive_path, src, out, member_patches):
+    """Copy every member's compressed bytes through unchanged except the patched ones"""
+    pending = dict(member_patches)
+    central = []
+    with zipfile.ZipFile(src) as zf:
+        end, comment, directory = _read_central_directory(src, os.fstat(src.fileno()).st_size)
+        pos = 0
+        while pos < len(directory):
+            fields = list(_CENTRAL.unpack_from(directory, pos))
+            if fields[0] != _CENTRAL_SIG:
+                raise ArchiveError("Corrupt zip central directory")
+            flags, method, csize, offset = fields[5], fields[6], fields[10], fields[18]
+            name_len, extra_len, comment_len = fields[12], fields[13], fields[14]
+            record_tail = directory[pos + _CENTRAL.size:pos + _CENTRAL.size + name_len + extra_len + comment_len]
+            pos += _CENTRAL.size + len(record_tail)
+            name = record_tail[:name_len].decode("utf-8" if flags & _FLAG_UTF8 else "cp437")
+            if offset == 0xFFFFFFFF or csize == 0xFFFFFFFF:
+                raise ArchiveError("Zip64 archives can be read but not rewritten")
+
+            src.seek(offset)
+            local = _LOCAL.unpack(src.read(_LOCAL.size))
+            if local[0] != _LOCAL_SIG:
+                raise ArchiveError(f"Corrupt local header for {name}")
+            local_names = src.read(local[10] + local[11])
+            fields[18] = out.tell()
+
+            if name not in pending:
+                # Raw copy: local header, compressed data and any data descriptor, byte for byte
+                length = csize
+                if flags & _FLAG_DESCRIPTOR:
+                    src.seek(offset + _LOCAL.size + len(local_names) + csize)
+                    length += 16 if src.read(4) == _DESCRIPTOR_SIG else 12
+                src.seek(offset)
+                _copy_range(src, out, _LOCAL.size + len(local_names) + length)
+                central.append(_CENTRAL.pack(*fields) + record_tail)
+                continue
+
+            if flags & _FLAG_ENCRYPTED:
+                raise ArchiveError(f"{name} is encrypted and cannot be patched")
+            if method not in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED):
+                raise ArchiveError(f"{name} uses compression method {method}, which cannot be re-encoded")
+            data = bytearray(zf.read(name))
+            patches, expected = pending.pop(name)
+            _apply_patches(name, data, patches, expected)
+            if method == zipfile.ZIP_DEFLATED:
+                compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+                encoded = compressor.compress(data) + compressor.flush()
+            else:
+                encoded = bytes(data)
+            crc = zlib.crc32(data)
+            flags &= ~_FLAG_DESCRIPTOR
+            out.write(_LOCAL.pack(_LOCAL_SIG, local[1], local[2], flags, method, local[5], local[6],
+                                  crc, len(encoded), len(data), local[10], local[11]) + local_names)
+            out.write(encoded)
+            fields[5], fields[9], fields[10], fields[11] = flags, crc, len(encoded), len(data)
+            central.append(_CENTRAL.pack(*fields) + record_tail)
+
+    if pending:
+        raise ArchiveError(f"{archive_path} has no member '{next(iter(pending))}'")
+    cd_offset = out.tell()
+    for record in central:
+        out.write(record)
+    out.write(_END.pack(_END_SIG, 0, 0, len(central), len(central), out.tell() - cd_offset, cd_offset, len(comment)))
+    out.write(comment)
+
+
+def _tar_compression(src):
+    src.seek(0)
+    head = src.read(6)
+    for magic, compression in _TAR_MAGIC:
+        if head.startswith(magic):
+            return compression
+    return ""
+
+
+def _rewrite_tar(archive_path, held, out, member_patches):
+    """Stream every member into a new tar, patching the listed ones on the way through"""
+    pending = dict(member_patches)
+    compression = _tar_compression(held)
+    held.seek(0)
+    with tarfile.open(fileobj=held, mode="r|*") as src, tarfile.open(fileobj=out, mode=f"w|{compression}") as dst:
+        for info in src:
+            if not info.isfile():
+                dst.addfile(info)
+            elif info.name in pending:
+                data = bytearray(src.extractfile(info).read())
+                patches, expected = pending.pop(info.name)
+                _apply_patches(info.name, data, patches, expected)
+                dst.addfile(info, io.BytesIO(data))
+            else:
+                dst.addfile(info, src.extractfile(info))
+    if pending:
+        raise ArchiveError(f"{archive_path} has no member '{next(iter(pending))}'")
+
+
+def _verify(archive_path, member_patches):
+    """Re-read the patched members of a rebuilt archive and check every patch landed"""
+    found = 0
+    for name, data in iter_members(archive_path, pattern_ext=None):
+        if name in member_patches:
+            for offset, new in member_patches[name][0]:
+                if data[offset:offset + len(new)] != new:
+                    raise ArchiveError(f"Rebuilt archive failed verification at {name}:{offset:X}")
+            found += 1
+    if found != len(member_patches):
+        raise ArchiveError("Rebuilt archive is missing patched members")
+
+
+def rewrite_archive(archive_path, member_patches, loaded_fingerprint=None, backup=True):
+    """Rebuild an archive with {member: (patches, expected)} applied; returns the new fingerprint
+
+    Zip members that are not patched keep their compressed bytes; only patched members
+    are re-encoded. The archive is rebuilt next to the original, verified and swapped in,
+    so memory use is bounded by the largest patched member.
+    """
+    if not member_patches:
+        return save_io.fingerprint(archive_path)
+
+    # Held for the whole rebuild, so editors and batch runs patching the same archive take
+    # turns instead of one swapping in a rebuild that drops the other's changes. Every read
+    # of the archive goes through this handle, since Windows locks block other handles
+    held, lock = _open_locked(archive_path)
+    temp_path = None
+    try:
+        try:
+            start_fingerprint = save_io.fingerprint(stat_result=os.fstat(held.fileno()))
+            # Without expected bytes there is nothing to rebase onto, so any outside write is a conflict
+            if loaded_fingerprint is not None and start_fingerprint != loaded_fingerprint \
+                    and not all(expected for _, expected in member_patches.values()):
+                raise save_io.ConflictError(f"{archive_path} changed on disk since it was loaded")
+
+            folder = os.path.dirname(os.path.abspath(archive_path))
+            fd, temp_path = tempfile.mkstemp(prefix=".rebuild-", suffix=os.path.basename(archive_path),
+                                             dir=folder)
+            with os.fdopen(fd, 'wb') as out:
+                try:
+                    if zipfile.is_zipfile(held):
+                        _rewrite_zip(archive_path, held, out, member_patches)
+                    else:
+                        _rewrite_tar(archive_path, held, out, member_patches)
+                except (zipfile.BadZipFile, tarfile.TarError, zlib.error, EOFError) as e:
+                    raise ArchiveError(f"Cannot rebuild {archive_path}: {e}")
+                out.flush()
+                os.fsync(out.fileno())
+            _verify(temp_path, member_patches)
+
+            if save_io.fingerprint(archive_path) != start_fingerprint:
+                raise save_io.ConflictError(f"{archive_path} changed on disk while it was being rebuilt")
+            if backup:
+                save_io.ensure_backup(archive_path, src=held)
+            if os.name != "nt":
+                os.replace(temp_path, archive_path)
+        finally:
+            lock.release()
+            held.close()
+        if os.name == "nt":
+            # Windows cannot replace a file that is still open, so the swap follows the unlock
+            os.replace(temp_path, archive_path)
+    except BaseException:
+        if temp_path and os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return save_io.fingerprint(archive_path)
+
+
+def _open_locked(archive_path):
+    """Open and lock an archive, retrying if a rebuild replaced it while waiting for the lock"""
+    while True:
+        held = open(archive_path, 'rb')
+        lock = save_io.FileLock(held)
+        try:
+            lock.acquire()
+            if os.path.samestat(os.fstat(held.fileno()), os.stat(archive_path)):
+                return held, lock
+            lock.release()
+        except BaseException:
+            held.close()
+            raise
+        held.close()
+
+
+def patch_save(path, patches, expected=None, loaded_fingerprint=None, backup=True):
+    """save_io.patch_file for plain saves and for "<archive>::<member>" paths"""
+    archive_path, member = split_member_path(path)
+    if member is None:
+        return save_io.patch_file(path, patches, expected, loaded_fingerprint, backup=backup)
+    return rewrite_archive(archive_path, {member: (patches, expected)}, loaded_fingerprint, backup)
@@ -0,0 +1,178 @@
+import json
+import os
+import threading
+import time
+
+from batch_tools import FilePatch, BatchResult, apply_plan
+import save_io
+
+JOURNAL_VERSION = 1
+
+
+class BatchJournal:
+    """Append-only write-ahead journal of planned and committed batch color patches"""
+
+    def __init__(self, path):
+        self.path = path
+        # The pipelined batch records plans and commits from different threads
+        self.lock = threading.Lock()
+        is_new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.f = open(path, 'a', encoding='utf-8')
+        if is_new:
+            self._append({"op": "begin", "version": JOURNAL_VERSION, "time": time.time()})
+            self.sync()
+        elif not self._ends_with_newline():
+            # A crash mid-append left a partial last line; end it so the next record starts
+            # on its own line instead of being glued onto the torn one
+            self.f.write("\n")
+            self.sync()
+
+    def _ends_with_newline(self):
+        with open(self.path, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b"\n"
+
+    def _append(self, record):
+        line = json.dumps(record, separators=(",", ":")) + "\n"
+        with self.lock:
+            self.f.write(line)
+
+    def record_plans(self, plans):
+        """Record planned deltas for several files and make them durable with a single fsync"""
+        for plan in plans:
+            self._append({
+                "op": "plan",
+                "path": os.path.abspath(plan.path),
+                "layout": plan.layout_key,
+                "fingerprint": list(plan.fingerprint) if plan.fingerprint else None,
+                "deltas": [[offset, old.hex(), new.hex()] for offset, old, new in plan.deltas],
+            })
+        self.sync()
+
+    def record_commit(self, path):
+        """Mark a file as committed; only call after the file itself has been fsynced"""
+        self._append({"op": "commit", "path": os.path.abspath(path)})
+
+    def record_rollback(self, path):
+        """Mark a file as rolled back to its planned old bytes"""
+        self._append({"op": "rollback", "path": os.path.abspath(path)})
+
+    def sync(self):
+        """Flush buffered records and fsync the journal"""
+        with self.lock:
+            self.f.flush()
+            os.fsync(self.f.fileno())
+
+    def close(self):
+        if not self.f.closed:
+            self.sync()
+            self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+class JournalState:
+    """Replayed view of a journal: every plan per file and whether the latest was committed"""
+
+    def __init__(self):
+        self.plans = {}         # path -> list of FilePatch in journal order, since the last rollback
+        self.committed = set()
+
+    @classmethod
+    def load(cls, path):
+        """Replay a journal file in one pass, ignoring a torn final line"""
+        state = cls()
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # A crash mid-append leaves at most one partial record at the end
+                    continue
+                op = record.get("op")
+                if op == "plan":
+                    deltas = [(offset, bytes.fromhex(old), bytes.fromhex(new))
+                              for offset, old, new in record["deltas"]]
+                    fp = tuple(record["fingerprint"]) if record.get("fingerprint") else None
+                    plan = FilePatch(record["path"], deltas, fp, record.get("layout"))
+                    state.plans.setdefault(record["path"], []).append(plan)
+                    state.committed.discard(record["path"])
+                elif op == "commit":
+                    state.committed.add(record["path"])
+                elif op == "rollback":
+                    state.plans.pop(record["path"], None)
+                    state.committed.discard(record["path"])
+        return state
+
+    def pending(self):
+        """Return the latest plan of every file that was never marked committed"""
+        return [plans[-1] for path, plans in self.plans.items() if path not in self.committed]
+
+
+def _read_targets(path, deltas):
+    """Return the bytes currently on disk at each delta offset"""
+    with open(path, 'rb') as f:
+        current = []
+        for offset, old, new in deltas:
+            f.seek(offset)
+            current.append(f.read(len(new)))
+    return current
+
+
+def resume_batch(journal_path, backup=True, progress=None):
+    """Finish every pending file in a journal; slots already holding the new bytes are skipped"""
+    state = JournalState.load(journal_path)
+    results = []
+    with BatchJournal(journal_path) as journal:
+        for plan in state.pending():
+            try:
+                on_disk = _read_targets(plan.path, plan.deltas)
+            except OSError as e:
+                result = BatchResult(plan.path, "failed", str(e))
+            else:
+                # A crash may have left only some slots written; finish just the rest
+                remaining = [(offset, old, new) for (offset, old, new), cur in zip(plan.deltas, on_disk)
+                             if cur != new]
+                if not remaining:
+                    result = BatchResult(plan.path, "written", "already applied")
+                else:
+                    result = apply_plan(FilePatch(plan.path, remaining, None, plan.layout_key), backup=backup)
+            if result.status == "written":
+                journal.record_commit(plan.path)
+            results.append(result)
+            if progress:
+                progress(result)
+    return results
+
+
+def rollback_batch(journal_path, progress=None):
+    """Restore the planned old bytes for every file in a journal in one pass"""
+    state = JournalState.load(journal_path)
+    results = []
+    with BatchJournal(journal_path) as journal:
+        for path, plans in state.plans.items():
+            try:
+                # Undo newer plans first so each one sees the bytes it wrote
+                wrote = False
+                for plan in reversed(plans):
+                    on_disk = _read_targets(path, plan.deltas)
+                    # Revert only slots that hold our new bytes; anything else was changed by someone else
+                    revert = [(offset, old, new) for (offset, old, new), cur in zip(plan.deltas, on_disk)
+                              if cur == new]
+                    if revert:
+                        save_io.patch_file(path, [(offset, old) for offset, old, new in revert],
+                                           [(offset, new) for offset, old, new in revert], backup=False)
+                        wrote = True
+                journal.record_rollback(path)
+                result = BatchResult(path, "written" if wrote else "unchanged")
+            except (OSError, ValueError, save_io.ConflictError, save_io.LockTimeout) as e:
+                result = BatchResult(path, "failed", str(e))
+            results.append(result)
+            if progress:
+                progress(result)
+    return results
@@ -0,0 +1,142 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from save_formats import get_layout
+import batch_tools
+import save_io
+
+# Marks the end of a stage's stream
+_DONE = object()
+
+
+class _Item:
+    """One file moving through the pipeline"""
+
+    def __init__(self, path):
+        self.path = path
+        self.data = None
+        self.fingerprint = None
+        self.plan = None
+        self.holds_slot = False
+
+
+async def _run_stage(name, inbox, outbox, workers, handle, on_error):
+    """Run workers copies of handle over inbox, passing items it accepts on to outbox"""
+
+    async def worker():
+        while True:
+            item = await inbox.get()
+            if item is _DONE:
+                # Put the marker back so sibling workers also stop
+                await inbox.put(_DONE)
+                return
+            try:
+                keep = await handle(item)
+            except Exception as e:
+                on_error(item, f"{name}: {e}")
+                continue
+            if keep and outbox is not None:
+                # Blocks when the next stage is full, which throttles this one
+                await outbox.put(item)
+
+    await asyncio.gather(*(worker() for _ in range(workers)))
+    if outbox is not None:
+        await outbox.put(_DONE)
+
+
+def _take(iterator, count):
+    """Pull up to count items from an iterator"""
+    batch = []
+    for item in iterator:
+        batch.append(item)
+        if len(batch) >= count:
+            break
+    return batch
+
+
+async def run_pipeline(paths, layout, player_name, hex_colors, in_flight=8, io_workers=8,
+                       journal=None, backup=True, progress=None):
+    """Recolor saves with overlapping discover, read, scan, patch and write stages"""
+    if isinstance(layout, str):
+        layout = get_layout(layout)
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=io_workers, thread_name_prefix="batch-io")
+    results = []
+
+    # Bounded queues give backpressure between stages; the semaphore caps how many
+    # files are held between being read and being written
+    read_q = asyncio.Queue(maxsize=in_flight)
+    scan_q = asyncio.Queue(maxsize=in_flight)
+    patch_q = asyncio.Queue(maxsize=in_flight)
+    write_q = asyncio.Queue(maxsize=in_flight)
+    slots = asyncio.Semaphore(in_flight)
+
+    def finish(item, result):
+        if item.holds_slot:
+            item.holds_slot = False
+            slots.release()
+        results.append(result)
+        if progress:
+            progress(result)
+
+    def fail(item, message):
+        finish(item, batch_tools.BatchResult(item.path, "failed", message))
+
+    async def discover():
+        # Directory walking is blocking I/O too, so pull paths from the executor in batches
+        iterator = batch_tools.expand_paths(paths)
+        while True:
+            batch = await loop.run_in_executor(executor, _take, iterator, 64)
+            if not batch:
+                break
+            for path in batch:
+                await read_q.put(_Item(path))
+        await read_q.put(_DONE)
+
+    async def read(item):
+        await slots.acquire()
+        item.holds_slot = True
+        item.data, item.fingerprint = await loop.run_in_executor(executor, save_io.read_save, item.path)
+        return True
+
+    async def scan(item):
+        color_start = await loop.run_in_executor(executor, layout.scan, item.data, player_name)
+        item.plan = batch_tools.plan_from_buffer(item.path, item.data, layout, color_start,
+                                                 hex_colors, item.fingerprint)
+        # The buffer is no longer needed once the deltas are known
+        item.data = None
+        return True
+
+    async def patch(item):
+        if not item.plan.deltas:
+            finish(item, batch_tools.BatchResult(item.path, "unchanged"))
+            return False
+        if journal is not None:
+            await loop.run_in_executor(executor, journal.record_plans, [item.plan])
+        return True
+
+    async def write(item):
+        result = await loop.run_in_executor(executor, batch_tools.apply_plan, item.plan, backup)
+        if journal is not None and result.status == "written":
+            journal.record_commit(item.path)
+        finish(item, result)
+        return False
+
+    try:
+        await asyncio.gather(
+            discover(),
+            _run_stage("read", read_q, scan_q, io_workers, read, fail),
+            _run_stage("scan", scan_q, patch_q, max(1, io_workers // 2), scan, fail),
+            _run_stage("patch", patch_q, write_q, 1, patch, fail),
+            _run_stage("write", write_q, None, io_workers, write, fail),
+        )
+    finally:
+        if journal is not None:
+            journal.sync()
+        executor.shutdown(wait=True)
+    return results
+
+
+def run_batch(paths, layout, player_name, hex_colors, **kwargs):
+    """Synchronous wrapper around run_pipeline"""
+    return asyncio.run(run_pipeline(paths, layout, player_name, hex_colors, **kwargs))
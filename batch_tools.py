@@ -0,0 +1,117 @@
+import os
+
+from save_formats import get_layout
+import save_io
+
+
+class FilePatch:
+    """Planned color change for one save: (offset, old_bytes, new_bytes) deltas"""
+
+    def __init__(self, path, deltas, fingerprint=None, layout_key=None):
+        self.path = path
+        self.deltas = deltas
+        self.fingerprint = fingerprint
+        self.layout_key = layout_key
+
+    @property
+    def patches(self):
+        return [(offset, new) for offset, old, new in self.deltas]
+
+    @property
+    def expected(self):
+        return [(offset, old) for offset, old, new in self.deltas]
+
+    def __repr__(self):
+        return f"FilePatch({self.path!r}, {len(self.deltas)} delta(s))"
+
+
+class BatchResult:
+    """Outcome of applying one FilePatch"""
+
+    def __init__(self, path, status, message=""):
+        self.path = path
+        self.status = status      # "written", "unchanged", "skipped", "failed" or, in dry runs, "would-change"
+        self.message = message
+
+    def __repr__(self):
+        return f"BatchResult({self.path!r}, {self.status!r})"
+
+
+def plan_from_buffer(path, data, layout, color_start, hex_colors, fingerprint=None):
+    """Build the FilePatch that sets hex_colors in an already scanned buffer"""
+    deltas = []
+    for offset, new in layout.encode_patches(color_start, hex_colors):
+        old = bytes(data[offset:offset + len(new)])
+        # Only slots that actually change are written
+        if old != new:
+            deltas.append((offset, old, new))
+    return FilePatch(path, deltas, fingerprint, layout.key)
+
+
+def plan_recolor(path, layout, player_name, hex_colors, catalog=None):
+    """Read and scan one save and plan the patch that applies hex_colors to it
+
+    With player_name None the best discovered name in the save is used.
+    """
+    if isinstance(layout, str):
+        layout = get_layout(layout)
+    data, fingerprint = save_io.read_save(path)
+    color_start = -1
+    if catalog is not None and player_name:
+        # A catalog entry for this exact file version saves the name search
+        import save_catalog
+        color_start = save_catalog.cached_color_start(catalog, path, layout, player_name, data, fingerprint)
+    if color_start == -1:
+        color_start = layout.scan(data, player_name)
+    return plan_from_buffer(path, data, layout, color_start, hex_colors, fingerprint)
+
+
+def apply_plan(plan, backup=True):
+    """Write one FilePatch to disk with lock and verification; returns a BatchResult"""
+    if not plan.deltas:
+        return BatchResult(plan.path, "unchanged")
+    try:
+        save_io.patch_file(plan.path, plan.patches, plan.expected, plan.fingerprint, backup=backup)
+        return BatchResult(plan.path, "written")
+    except (OSError, ValueError, save_io.ConflictError, save_io.LockTimeout) as e:
+        return BatchResult(plan.path, "failed", str(e))
+
+
+def apply_batch(plans, journal=None, backup=True, progress=None, chunk_size=256):
+    """Apply many FilePatch objects, recording them in a BatchJournal if one is given"""
+    results = []
+    plans = list(plans)
+
+    for chunk_start in range(0, len(plans), chunk_size):
+        chunk = plans[chunk_start:chunk_start + chunk_size]
+
+        # Write-ahead: the whole chunk is planned and made durable with one fsync
+        if journal is not None:
+            journal.record_plans(p for p in chunk if p.deltas)
+
+        for plan in chunk:
+            result = apply_plan(plan, backup=backup)
+            results.append(result)
+            if journal is not None and result.status == "written":
+                # patch_file already fsynced the save, so the commit mark can be lazy
+                journal.record_commit(plan.path)
+            if progress:
+                progress(result)
+
+        if journal is not None:
+            journal.sync()
+
+    return results
+
+
+def expand_paths(paths, pattern_ext=(".sav",)):
+    """Expand directories in paths into the save files they contain"""
+    for path in paths:
+        if os.path.isdir(path):
+            for dirpath, dirnames, filenames in os.walk(path):
+                dirnames.sort()
+                for filename in sorted(filenames):
+                    if filename.lower().endswith(pattern_ext):
+                        yield os.path.join(dirpath, filename)
+        else:
+            yield path
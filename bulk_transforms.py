@@ -0,0 +1,224 @@
+import colorsys
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+
+from save_formats import COLOR_SLOTS, get_layout
+from palette import rgb_to_lab
+import batch_tools
+import save_io
+
+
+class ColorTensor:
+    """Colors of N characters as one flat (N, 3 slots, 3 channels) RGB byte array"""
+
+    def __init__(self, data, keys, slots=COLOR_SLOTS):
+        self.data = bytearray(data)
+        self.keys = list(keys)          # One key per character (e.g. the save path)
+        self.slots = tuple(slots)
+        self.stride = len(self.slots) * 3
+        if len(self.data) != len(self.keys) * self.stride:
+            raise ValueError("Tensor data does not match the number of characters")
+
+    @classmethod
+    def from_schemes(cls, keys, schemes, slots=COLOR_SLOTS):
+        """Stack dicts of slot -> '#RRGGBB' into a tensor"""
+        data = b"".join(bytes.fromhex(scheme[slot].lstrip('#')) for scheme in schemes for slot in slots)
+        return cls(data, keys, slots)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def copy(self):
+        return ColorTensor(self.data, self.keys, self.slots)
+
+    def scheme(self, index):
+        """Dict of slot -> '#RRGGBB' for one character"""
+        base = index * self.stride
+        return {slot: "#" + self.data[base + i * 3:base + i * 3 + 3].hex().upper()
+                for i, slot in enumerate(self.slots)}
+
+    def map_colors(self, transform, slots=None):
+        """Return a new tensor with transform((r, g, b)) -> (r, g, b) applied to the chosen slots
+
+        Each slot is read as three channel columns with extended slices. The transform runs
+        once per distinct color, and the mapped columns are written back the same way, so
+        only the transform itself is Python code per color.
+        """
+        slots = slots or self.slots
+        out = bytearray(self.data)
+        table = {}
+        for slot in slots:
+            pos = self.slots.index(slot) * 3
+            column = list(zip(self.data[pos::self.stride], self.data[pos + 1::self.stride],
+                              self.data[pos + 2::self.stride]))
+            for rgb in set(column).difference(table):
+                new = transform(rgb)
+                # Transforms may return ready bytes; anything else is rounded and clamped
+                table[rgb] = new if isinstance(new, bytes) else bytes(max(0, min(255, round(c))) for c in new)
+            mapped = b"".join(map(table.__getitem__, column))
+            for channel in range(3):
+                out[pos + channel::self.stride] = mapped[channel::3]
+        return ColorTensor(out, self.keys, self.slots)
+
+    def fill(self, slot, rgb):
+        """Return a new tensor with one slot set to the same (r, g, b) for every character"""
+        pos = self.slots.index(slot) * 3
+        out = bytearray(self.data)
+        for channel, value in enumerate(rgb):
+            out[pos + channel::self.stride] = bytes([value]) * len(self.keys)
+        return ColorTensor(out, self.keys, self.slots)
+
+    def changes(self, other):
+        """List (index, slot, old '#RRGGBB', new '#RRGGBB') for every slot that differs in other"""
+        changed = []
+        a, b = self.data, other.data
+        stride = self.stride
+        for base in range(0, len(a), stride):
+            # Whole characters are compared first; most are untouched by narrow transforms
+            if a[base:base + stride] == b[base:base + stride]:
+                continue
+            for i, slot in enumerate(self.slots):
+                pos = base + i * 3
+                if a[pos:pos + 3] != b[pos:pos + 3]:
+                    changed.append((base // stride, slot,
+                                    "#" + a[pos:pos + 3].hex().upper(), "#" + b[pos:pos + 3].hex().upper()))
+        return changed
+
+
+def _parse_hex(hex_color):
+    value = bytes.fromhex(hex_color.lstrip('#'))
+    if len(value) != 3:
+        raise ValueError(f"Invalid color value '{hex_color}'")
+    return tuple(value)
+
+
+# Transforms ------------------------------------------------------------------
+
+def hue_rotate(tensor, degrees, slots=None):
+    """Rotate hue by degrees, keeping saturation and brightness"""
+    shift = (degrees / 360.0) % 1.0
+
+    def rotate(rgb):
+        h, s, v = colorsys.rgb_to_hsv(*(c / 255 for c in rgb))
+        return (c * 255 for c in colorsys.hsv_to_rgb((h + shift) % 1.0, s, v))
+
+    return tensor.map_colors(rotate, slots)
+
+
+def clamp_saturation(tensor, minimum=0.0, maximum=1.0, slots=None):
+    """Clamp HSV saturation into [minimum, maximum]; greys stay grey"""
+
+    def clamp(rgb):
+        h, s, v = colorsys.rgb_to_hsv(*(c / 255 for c in rgb))
+        if s == 0:
+            return rgb
+        return (c * 255 for c in colorsys.hsv_to_rgb(h, max(minimum, min(maximum, s)), v))
+
+    return tensor.map_colors(clamp, slots)
+
+
+def team_palette(tensor, palette, mode="nearest", slots=None):
+    """Map colors onto a team palette
+
+    mode "nearest" snaps every color to the perceptually closest palette color;
+    mode "slots" sets color1, color2, color3 to the palette's first, second and third color.
+    """
+    colors = [_parse_hex(c) for c in palette]
+    if not colors:
+        raise ValueError("The team palette is empty")
+
+    if mode == "slots":
+        slots = slots or tensor.slots
+        result = tensor
+        for slot in slots:
+            result = result.fill(slot, colors[tensor.slots.index(slot) % len(colors)])
+        return result
+    if mode != "nearest":
+        raise ValueError(f"Unknown palette mode '{mode}'")
+
+    choices = [(bytes(c),) + rgb_to_lab(c) for c in colors]
+
+    def nearest(rgb):
+        l, a, b = rgb_to_lab(rgb)
+        best, best_distance = None, None
+        for value, pl, pa, pb in choices:
+            distance = (pl - l) ** 2 + (pa - a) ** 2 + (pb - b) ** 2
+            if best is None or distance < best_distance:
+                best, best_distance = value, distance
+        return best
+
+    return tensor.map_colors(nearest, slots)
+
+
+def randomize(tensor, seed, slots=None):
+    """Give every character random colors that depend only on the seed and its key"""
+    slots = slots or tensor.slots
+    # Seeded per key, so adding or reordering saves does not change anyone else's colors;
+    # one 9-byte digest per key holds the colors of all three slots
+    salt = hashlib.blake2b(str(seed).encode('utf-8')).digest()
+    stride = tensor.stride
+    noise = b"".join(hashlib.blake2b(str(key).encode('utf-8'), digest_size=stride, key=salt).digest()
+                     for key in tensor.keys)
+    out = bytearray(tensor.data)
+    for slot in slots:
+        pos = tensor.slots.index(slot) * 3
+        for channel in range(pos, pos + 3):
+            out[channel::stride] = noise[channel::stride]
+    return ColorTensor(out, tensor.keys, tensor.slots)
+
+
+# Loading and writing back ----------------------------------------------------
+
+class TransformTarget:
+    """Where one character's colors live on disk"""
+
+    def __init__(self, path, layout_key, color_start, fingerprint):
+        self.path = path
+        self.layout_key = layout_key
+        self.color_start = color_start
+        self.fingerprint = fingerprint
+
+
+def load_tensor(paths, layout, player_name=None, workers=4):
+    """Read every save once and stack its colors; returns (tensor, targets, failures)
+
+    With player_name None each save's best discovered name is used.
+    """
+    if isinstance(layout, str):
+        layout = get_layout(layout)
+
+    def load(path):
+        try:
+            data, fingerprint = save_io.read_save(path)
+            color_start = layout.scan(data, player_name)
+            return TransformTarget(path, layout.key, color_start, fingerprint), \
+                layout.decode_block(data, color_start), None
+        except (OSError, ValueError) as e:
+            return path, None, str(e)
+
+    targets, schemes, failures = [], [], []
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="transform") as executor:
+        for target, scheme, error in executor.map(load, batch_tools.expand_paths(paths)):
+            if error:
+                failures.append(batch_tools.BatchResult(target, "failed", error))
+            else:
+                targets.append(target)
+                schemes.append(scheme)
+    tensor = ColorTensor.from_schemes([t.path for t in targets], schemes, layout.slot_names)
+    return tensor, targets, failures
+
+
+def plan_writes(before, after, targets):
+    """Build one FilePatch per save holding only the slots whose colors changed
+
+    The old bytes come from the tensor, so nothing is re-read; patch_file still checks
+    them against the file if it changed since it was loaded.
+    """
+    deltas = {}
+    for index, slot, old, new in before.changes(after):
+        target = targets[index]
+        layout = get_layout(target.layout_key)
+        offset = layout.slot_positions(target.color_start)[slot]
+        deltas.setdefault(index, []).append((offset, layout.encode_slot(old), layout.encode_slot(new)))
+    return [batch_tools.FilePatch(targets[i].path, sorted(d), targets[i].fingerprint, targets[i].layout_key)
+            for i, d in sorted(deltas.items())]
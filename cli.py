@@ -0,0 +1,681 @@
+import argparse
+import os
+import sys
+import time
+
+from save_formats import COLOR_SLOTS, available_layouts, get_layout
+import batch_journal
+import batch_tools
+import save_diff
+import save_io
+
+
+def _load_color_positions(path, layout_key, player_name):
+    """Scan a save for player_name and return its slot positions, or None if not requested"""
+    if not (layout_key and player_name):
+        return None
+    layout = get_layout(layout_key)
+    with open(path, 'rb') as f:
+        data = f.read()
+    return layout.slot_positions(layout.scan(data, player_name))
+
+
+def cmd_diff(args):
+    """Compare a save with its backup (or another save) and list the changed byte ranges"""
+    other = args.other or save_diff.backup_path_for(args.file)
+    for path in (args.file, other):
+        if not os.path.exists(path):
+            print(f"Error: {path} does not exist", file=sys.stderr)
+            return 1
+
+    try:
+        color_positions = _load_color_positions(args.file, args.layout, args.name)
+    except ValueError as e:
+        print(f"Warning: {e}; color slots will not be marked", file=sys.stderr)
+        color_positions = None
+
+    ranges, elapsed = save_diff.diff_files(other, args.file, args.block_size, color_positions)
+    for line in save_diff.format_report(other, args.file, ranges, elapsed):
+        print(line)
+    return 0 if not ranges else 2
+
+
+def _parse_colors(args):
+    """Collect the --color1/--color2/--color3 options into a dict of '#RRGGBB' values"""
+    hex_colors = {}
+    for slot in COLOR_SLOTS:
+        value = getattr(args, slot, None)
+        if value:
+            value = "#" + value.lstrip('#').upper()
+            if len(value) != 7 or any(c not in "0123456789ABCDEF" for c in value[1:]):
+                raise ValueError(f"Invalid color for --{slot}: {value}")
+            hex_colors[slot] = value
+    return hex_colors
+
+
+def _print_results(results, elapsed):
+    """Print per-file failures and a status summary for batch results"""
+    counts = {}
+    for result in results:
+        counts[result.status] = counts.get(result.status, 0) + 1
+        if result.status == "failed":
+            print(f"FAILED {result.path}: {result.message}", file=sys.stderr)
+    summary = ", ".join(f"{count} {status}" for status, count in sorted(counts.items())) or "nothing to do"
+    rate = len(results) / elapsed if elapsed > 0 else 0.0
+    print(f"{summary} in {elapsed:.2f}s ({rate:.0f} files/s)")
+
+
+def cmd_batch(args):
+    """Recolor many saves, optionally journaled so an interrupted run can resume or roll back"""
+    started = time.perf_counter()
+
+    if args.rollback or args.resume:
+        if not args.journal or not os.path.exists(args.journal):
+            print("Error: --resume and --rollback need an existing --journal", file=sys.stderr)
+            return 1
+        if args.rollback:
+            results = batch_journal.rollback_batch(args.journal)
+        else:
+            results = batch_journal.resume_batch(args.journal, backup=not args.no_backup)
+        _print_results(results, time.perf_counter() - started)
+        return 0 if all(r.status != "failed" for r in results) else 1
+
+    if not (args.layout and (args.name or args.auto_name) and args.paths):
+        print("Error: --layout, --name (or --auto-name) and at least one path are required", file=sys.stderr)
+        return 1
+    if args.name and args.auto_name:
+        print("Error: give either --name or --auto-name, not both", file=sys.stderr)
+        return 1
+    # None makes the scan pick the best name followed by a valid block in each save
+    player_name = None if args.auto_name else args.name
+    try:
+        hex_colors = _parse_colors(args)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    if not hex_colors:
+        print("Error: give at least one of --color1, --color2, --color3", file=sys.stderr)
+        return 1
+
+    sources = batch_tools.expand_paths(args.paths)
+    if args.crawl:
+        # Saves are planned as the crawler finds them, not after the whole tree is listed
+        import save_crawler
+        sources = save_crawler.crawl_paths(args.paths, args.layout)
+
+    if args.pipeline:
+        # Overlap reading, scanning and writing across many files at once
+        import batch_pipeline
+        journal = batch_journal.BatchJournal(args.journal) if args.journal else None
+        try:
+            results = batch_pipeline.run_batch(sources, args.layout, player_name, hex_colors,
+                                               in_flight=args.in_flight, io_workers=args.io_workers,
+                                               journal=journal, backup=not args.no_backup)
+        finally:
+            if journal is not None:
+                journal.close()
+        _print_results(results, time.perf_counter() - started)
+        return 0 if all(r.status != "failed" for r in results) else 1
+
+    # Plan every file first so scan failures are reported before anything is written
+    plans = []
+    results = []
+    catalog = None
+    if args.catalog is not None:
+        import save_catalog
+        catalog = save_catalog.SaveCatalog(args.catalog or None)
+    try:
+        for path in sources:
+            try:
+                plans.append(batch_tools.plan_recolor(path, args.layout, player_name, hex_colors, catalog))
+            except (OSError, ValueError) as e:
+                results.append(batch_tools.BatchResult(path, "failed", str(e)))
+    finally:
+        if catalog is not None:
+            catalog.close()
+
+    if args.journal:
+        with batch_journal.BatchJournal(args.journal) as journal:
+            results += batch_tools.apply_batch(plans, journal, backup=not args.no_backup)
+    else:
+        results += batch_tools.apply_batch(plans, backup=not args.no_backup)
+
+    _print_results(results, time.perf_counter() - started)
+    return 0 if all(r.status != "failed" for r in results) else 1
+
+
+def cmd_scan(args):
+    """List every name occurrence and structural color block in a (possibly huge) save or dump"""
+    import parallel_scan
+
+    layout = get_layout(args.layout)
+    with open(args.file, 'rb') as f:
+        data = f.read()
+
+    started = time.perf_counter()
+    hits = parallel_scan.parallel_scan_hits(data, layout, args.name, workers=args.workers)
+    elapsed = time.perf_counter() - started
+
+    for pos in hits["names"]:
+        print(f"name   0x{pos:08X}")
+    for start, (colors, _) in zip(hits["blocks"], layout.decode_blocks(data, hits["blocks"])):
+        print(f"block  0x{start:08X}  " + " ".join(colors[slot] for slot in layout.slot_names))
+    rate = len(data) / elapsed / (1024 * 1024) if elapsed > 0 else 0.0
+    print(f"{len(hits['names'])} name hit(s), {len(hits['blocks'])} block(s) in {elapsed:.2f}s ({rate:.0f} MiB/s)")
+
+    if args.verify:
+        reference = parallel_scan.scan_hits(data, layout, args.name)
+        if reference != hits:
+            print("Error: parallel scan differs from the single-threaded scan", file=sys.stderr)
+            return 1
+        print("Verified against the single-threaded scan")
+    return 0
+
+
+def cmd_crawl(args):
+    """List every save under device or backup folders, streaming hits as they are found"""
+    import save_crawler
+
+    stats = save_crawler.CrawlStats()
+    kinds = set(args.kind.split(",")) if args.kind else None
+    for hit in save_crawler.crawl(args.roots, args.workers, confirm=args.confirm, stats=stats):
+        if kinds and hit.kind not in kinds:
+            continue
+        print(f"{hit.kind:<9}  {','.join(hit.layout_keys) or '?':<14}  {hit.size:>10,}  {hit.path}", flush=True)
+    print(stats.summary())
+    return 0
+
+
+def cmd_catalog(args):
+    """Refresh the save catalog and answer name and color queries from it"""
+    import save_catalog
+
+    with save_catalog.SaveCatalog(args.db) as catalog:
+        if args.paths:
+            started = time.perf_counter()
+            files = None
+            if args.crawl:
+                import save_crawler
+                files = save_crawler.crawl_paths(args.paths, workers=args.workers * 2)
+            stats = catalog.refresh(args.paths, workers=args.workers, files=files)
+            elapsed = time.perf_counter() - started
+            print(f"{stats['scanned']} scanned, {stats['unchanged']} unchanged, {stats['removed']} removed, "
+                  f"{stats['failed']} failed in {elapsed:.2f}s")
+
+        if args.name or args.color:
+            try:
+                if args.name:
+                    entries = catalog.find_name(args.name, args.layout, exact=not args.contains)
+                    if args.color:
+                        wanted = "#" + args.color.lstrip('#').upper()
+                        entries = [e for e in entries
+                                   if (e.colors[args.slot] == wanted if args.slot else wanted in e.colors.values())]
+                else:
+                    entries = catalog.find_color(args.color, args.slot, args.layout)
+            except ValueError as e:
+                print(f"Error: {e}", file=sys.stderr)
+                return 1
+            for entry in entries:
+                colors = " ".join(entry.colors[slot] for slot in COLOR_SLOTS)
+                print(f"{entry.path}  {entry.layout_key}  {entry.name}  0x{entry.color_start:X}  {colors}")
+            print(f"{len(entries)} match(es)")
+        elif not args.paths:
+            files, blocks, failed = catalog.summary()
+            print(f"{catalog.db_path}: {files} file(s), {blocks} color block(s), {failed} unreadable")
+    return 0
+
+
+def cmd_convert(args):
+    """Copy character colors from saves on one platform into the matching saves on another"""
+    import convert_saves
+
+    if args.source_layout == args.target_layout:
+        print("Error: --from and --to must be different layouts", file=sys.stderr)
+        return 1
+    for path in (args.source, args.target):
+        if not os.path.exists(path):
+            print(f"Error: {path} does not exist", file=sys.stderr)
+            return 1
+
+    started = time.perf_counter()
+    pairs, unpaired = convert_saves.pair_paths(args.source, args.target)
+    results = [batch_tools.BatchResult(path, "skipped", "no matching save in the target folder")
+               for path in unpaired]
+    for result in results:
+        print(f"SKIPPED {result.path}: {result.message}", file=sys.stderr)
+
+    journal = batch_journal.BatchJournal(args.journal) if args.journal else None
+    try:
+        results += convert_saves.convert_pairs(pairs, args.source_layout, args.target_layout, args.name,
+                                               journal=journal, backup=not args.no_backup,
+                                               dry_run=args.dry_run, workers=args.workers)
+    finally:
+        if journal is not None:
+            journal.close()
+    _print_results(results, time.perf_counter() - started)
+    return 0 if all(r.status != "failed" for r in results) else 1
+
+
+def cmd_similar(args):
+    """List groups of catalogued characters whose color schemes are near-duplicates"""
+    import save_catalog
+    import similar_schemes
+
+    with save_catalog.SaveCatalog(args.db) as catalog:
+        if args.paths:
+            catalog.refresh(args.paths, workers=args.workers)
+        entries = catalog.all_entries(args.layout)
+
+    started = time.perf_counter()
+    groups = similar_schemes.find_similar(entries, args.threshold)
+    elapsed = time.perf_counter() - started
+
+    for number, group in enumerate(groups, 1):
+        print(f"Group {number}: {len(group)} character(s)")
+        for entry in group.entries:
+            colors = " ".join(entry.colors[slot] for slot in COLOR_SLOTS)
+            print(f"  {colors}  {entry.name}  {entry.path}")
+    print(f"{len(groups)} group(s) among {len(entries)} character(s) in {elapsed:.2f}s")
+    return 0
+
+
+def cmd_transform(args):
+    """Recolor many characters at once with hue, saturation, palette and random transforms"""
+    import bulk_transforms
+
+    if args.name and args.auto_name:
+        print("Error: give either --name or --auto-name, not both", file=sys.stderr)
+        return 1
+    if not (args.name or args.auto_name):
+        print("Error: --name or --auto-name is required", file=sys.stderr)
+        return 1
+    slots = args.slots.split(",") if args.slots else None
+    if slots and any(slot not in COLOR_SLOTS for slot in slots):
+        print(f"Error: --slots must be a comma separated list of {', '.join(COLOR_SLOTS)}", file=sys.stderr)
+        return 1
+
+    started = time.perf_counter()
+    before, targets, results = bulk_transforms.load_tensor(args.paths, args.layout,
+                                                           None if args.auto_name else args.name,
+                                                           workers=args.workers)
+    # Transforms run in a fixed order: randomize, team palette, hue, saturation
+    try:
+        after = before
+        if args.randomize is not None:
+            after = bulk_transforms.randomize(after, args.randomize, slots)
+        if args.team_palette:
+            after = bulk_transforms.team_palette(after, args.team_palette.split(","), args.palette_mode, slots)
+        if args.hue:
+            after = bulk_transforms.hue_rotate(after, args.hue, slots)
+        if args.saturation_min is not None or args.saturation_max is not None:
+            after = bulk_transforms.clamp_saturation(after, args.saturation_min or 0.0,
+                                                     1.0 if args.saturation_max is None else args.saturation_max,
+                                                     slots)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+    plans = bulk_transforms.plan_writes(before, after, targets)
+    changed = {plan.path for plan in plans}
+    unchanged = [batch_tools.BatchResult(t.path, "unchanged") for t in targets if t.path not in changed]
+    if args.dry_run:
+        for index, slot, old, new in before.changes(after):
+            print(f"{targets[index].path}  {slot}  {old} -> {new}")
+        print(f"{len(plans)} save(s) would change, {len(unchanged)} unchanged, {len(results)} failed")
+        return 0
+
+    results += unchanged
+    if args.journal:
+        with batch_journal.BatchJournal(args.journal) as journal:
+            results += batch_tools.apply_batch(plans, journal, backup=not args.no_backup)
+    else:
+        results += batch_tools.apply_batch(plans, backup=not args.no_backup)
+    _print_results(results, time.perf_counter() - started)
+    return 0 if all(r.status != "failed" for r in results) else 1
+
+
+def cmd_fanout(args):
+    """Write many recolored copies of one save, differing only in the color bytes"""
+    import variant_fanout
+
+    if args.name and args.auto_name:
+        print("Error: give either --name or --auto-name, not both", file=sys.stderr)
+        return 1
+    player_name = None if args.auto_name else args.name
+    if player_name is None and not args.auto_name:
+        print("Error: --name or --auto-name is required", file=sys.stderr)
+        return 1
+
+    started = time.perf_counter()
+    try:
+        if args.variants:
+            variants = variant_fanout.read_variants(args.variants)
+        else:
+            layout = get_layout(args.layout)
+            data, _ = save_io.read_save(args.file)
+            base_colors = layout.decode_block(data, layout.scan(data, player_name))
+            if args.random:
+                variants = variant_fanout.random_variants(base_colors, args.random, args.seed)
+            elif args.hue_steps:
+                variants = variant_fanout.hue_variants(base_colors, args.hue_steps)
+            else:
+                print("Error: give --variants, --random or --hue-steps", file=sys.stderr)
+                return 1
+        results = variant_fanout.fan_out(args.file, args.layout, player_name, variants, args.out,
+                                         args.template, args.overwrite, args.workers)
+    except (OSError, ValueError, save_io.ConflictError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+    methods = {}
+    for result in results:
+        if result.status == "written":
+            methods[result.message] = methods.get(result.message, 0) + 1
+        elif result.status == "skipped":
+            print(f"SKIPPED {result.path}: {result.message}", file=sys.stderr)
+    _print_results(results, time.perf_counter() - started)
+    if methods:
+        print("Copy method: " + ", ".join(f"{method} x{count}" for method, count in sorted(methods.items())))
+    return 0 if all(r.status != "failed" for r in results) else 1
+
+
+def cmd_archive(args):
+    """List or recolor the saves inside a zip or tar archive without extracting it"""
+    import archive_saves
+
+    player_name = None if args.auto_name else args.name
+    try:
+        hex_colors = _parse_colors(args)
+        started = time.perf_counter()
+        entries = list(archive_saves.scan_archive(args.archive, args.layout, player_name,
+                                                  member_glob=args.member))
+        for entry in entries:
+            if entry.error:
+                print(f"FAILED {entry.member}: {entry.error}", file=sys.stderr)
+            else:
+                colors = " ".join(entry.colors[slot] for slot in COLOR_SLOTS)
+                print(f"{entry.member}  {entry.name}  0x{entry.color_start:X}  {colors}")
+        failed = sum(1 for entry in entries if entry.error)
+        print(f"{len(entries) - failed} save(s) scanned, {failed} failed in {time.perf_counter() - started:.2f}s")
+        if not hex_colors:
+            return 0 if not failed else 1
+
+        member_patches = archive_saves.plan_archive_recolor(entries, args.layout, hex_colors)
+        if args.dry_run:
+            print(f"Would patch {len(member_patches)} member(s)")
+            return 0
+        started = time.perf_counter()
+        archive_saves.rewrite_archive(args.archive, member_patches, backup=not args.no_backup)
+        print(f"Patched {len(member_patches)} member(s) and rebuilt {args.archive} "
+              f"in {time.perf_counter() - started:.2f}s")
+        return 0 if not failed else 1
+    except (OSError, ValueError, archive_saves.ArchiveError, save_io.ConflictError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+
+def cmd_audit(args):
+    """Check a library for saves the editors can't scan cleanly, before batch-editing it"""
+    import save_audit
+
+    player_name = None if args.auto_name else args.name
+    results, leftovers, elapsed = save_audit.audit_library(args.paths, args.layout, player_name,
+                                                           args.workers, args.stale_days)
+    for result in results:
+        if result.status != "ok" or (args.verbose and result.backup == "stale"):
+            print(f"{result.status.upper():<11} {result.path}: {result.message or 'backup is stale'}")
+    for path, reason in leftovers:
+        print(f"{'LEFTOVER':<11} {path}: {reason}")
+    if args.report:
+        save_audit.write_report(results, args.report)
+        print(f"Per-file report written to {args.report}")
+    for line in save_audit.summary_lines(results, leftovers, elapsed):
+        print(line)
+    return 0 if all(result.status == "ok" for result in results) else 1
+
+
+def cmd_serve(args):
+    """Run the local HTTP save service"""
+    import http_service
+    http_service.serve_forever(args.host, args.port, args.workers, args.cache_size, args.root, not args.quiet)
+    return 0
+
+
+def cmd_container(args):
+    """Read or recolor a save stored inside a hashed, compressed container"""
+    import compressed_saves
+
+    try:
+        raw, fp = save_io.read_save(args.file)
+        codec = compressed_saves.get_codec(args.codec) if args.codec else compressed_saves.detect_codec(raw)
+        if codec is None:
+            print(f"Error: {args.file} does not match any known container (hash check failed)", file=sys.stderr)
+            return 1
+        layout = get_layout(args.layout)
+
+        if args.unpack:
+            with open(args.unpack, 'wb') as f:
+                f.write(codec.open(raw).read_all())
+            print(f"Unpacked {codec.label} payload to {args.unpack}")
+            return 0
+
+        if not args.name:
+            print("Error: --name is required to locate the colors", file=sys.stderr)
+            return 1
+        hex_colors = _parse_colors(args)
+        if not hex_colors:
+            payload, color_start = codec.scan(raw, layout, args.name)
+            print(f"{codec.label} container, block at payload offset 0x{color_start:X} "
+                  f"of {payload.inflated:,} payload bytes")
+            for slot, value in layout.decode_block(payload.buffer, color_start).items():
+                print(f"{slot}: {value}")
+            return 0
+
+        new_raw, color_start = codec.recolor(raw, layout, args.name, hex_colors)
+        save_io.replace_file(args.file, new_raw, fp, backup=not args.no_backup)
+        print(f"Recolored block at payload offset 0x{color_start:X}; repacked and verified {len(new_raw):,} bytes")
+        return 0
+    except (OSError, ValueError, compressed_saves.ContainerError, save_io.ConflictError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+
+def build_parser():
+    """Build the argument parser for the command line tools"""
+    layout_keys = [layout.key for layout in available_layouts()]
+
+    parser = argparse.ArgumentParser(
+        prog="cli.py",
+        description="Borderlands Color Editor command line tools"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    # diff
+    diff_parser = subparsers.add_parser("diff", help="Show the byte ranges that differ between two saves")
+    diff_parser.add_argument("file", help="Save file to inspect")
+    diff_parser.add_argument("other", nargs="?", help="File to compare against (defaults to <file>.bak)")
+    diff_parser.add_argument("--layout", choices=layout_keys, help="Save layout used to mark color slots")
+    diff_parser.add_argument("--name", help="Character name used to locate the color slots")
+    diff_parser.add_argument("--block-size", type=int, default=save_diff.DEFAULT_BLOCK_SIZE,
+                             help="Size of the blocks compared before dropping to byte level")
+    diff_parser.set_defaults(func=cmd_diff)
+
+    # batch
+    batch_parser = subparsers.add_parser("batch", help="Apply colors to many saves at once")
+    batch_parser.add_argument("paths", nargs="*", help="Save files or folders of .sav files")
+    batch_parser.add_argument("--layout", choices=layout_keys, help="Save layout of the files")
+    batch_parser.add_argument("--name", help="Character name to locate in every save")
+    batch_parser.add_argument("--auto-name", action="store_true",
+                              help="Use the top discovered name with a valid color block in each save")
+    for slot in COLOR_SLOTS:
+        batch_parser.add_argument(f"--{slot}", help=f"New {slot} as RRGGBB")
+    batch_parser.add_argument("--journal", help="Write-ahead journal file for resuming or rolling back")
+    batch_parser.add_argument("--resume", action="store_true", help="Finish the files left pending in --journal")
+    batch_parser.add_argument("--rollback", action="store_true", help="Restore every file recorded in --journal")
+    batch_parser.add_argument("--no-backup", action="store_true", help="Do not create .bak files")
+    batch_parser.add_argument("--crawl", action="store_true",
+                              help="Find saves of --layout by header under the folders, whatever their names")
+    batch_parser.add_argument("--pipeline", action="store_true",
+                              help="Overlap file I/O with scanning (for slow or network storage)")
+    batch_parser.add_argument("--in-flight", type=int, default=8, help="Files held in memory at once with --pipeline")
+    batch_parser.add_argument("--io-workers", type=int, default=8, help="Threads doing file I/O with --pipeline")
+    batch_parser.add_argument("--catalog", nargs="?", const="", metavar="DB",
+                              help="Take block offsets from the save catalog when it is up to date")
+    batch_parser.set_defaults(func=cmd_batch)
+
+    # container
+    container_parser = subparsers.add_parser("container", help="Unpack, read or recolor a hashed, compressed save (sha1-zlib or sha1-lzo)")
+    container_parser.add_argument("file", help="Compressed save file")
+    container_parser.add_argument("--codec", help="Container codec (detected from the hash when omitted)")
+    container_parser.add_argument("--layout", choices=layout_keys, default="pc", help="Layout of the inner payload")
+    container_parser.add_argument("--name", help="Character name to locate in the payload")
+    for slot in COLOR_SLOTS:
+        container_parser.add_argument(f"--{slot}", help=f"New {slot} as RRGGBB")
+    container_parser.add_argument("--unpack", metavar="OUT", help="Write the decompressed payload to OUT and exit")
+    container_parser.add_argument("--no-backup", action="store_true", help="Do not create a .bak file")
+    container_parser.set_defaults(func=cmd_container)
+
+    # scan
+    scan_parser = subparsers.add_parser("scan", help="Find every name hit and color block, using all cores")
+    scan_parser.add_argument("file", help="Save file or memory dump to scan")
+    scan_parser.add_argument("--layout", choices=layout_keys, required=True, help="Layout of the color blocks")
+    scan_parser.add_argument("--name", help="Character name to find (case-insensitive)")
+    scan_parser.add_argument("--workers", type=int, help="Worker processes (defaults to the CPU count)")
+    scan_parser.add_argument("--verify", action="store_true", help="Check the result against a single-threaded scan")
+    scan_parser.set_defaults(func=cmd_scan)
+
+    # crawl
+    crawl_parser = subparsers.add_parser("crawl", help="Find saves in deep device and backup folder trees")
+    crawl_parser.add_argument("roots", nargs="+", help="Folders (or files) to search")
+    crawl_parser.add_argument("--workers", type=int, default=16, help="Threads listing folders and reading headers")
+    crawl_parser.add_argument("--confirm", action="store_true",
+                              help="Only report files whose color block is found, not just a save header")
+    crawl_parser.add_argument("--kind", help="Comma-separated kinds to list: stfs, save, container")
+    crawl_parser.set_defaults(func=cmd_crawl)
+
+    # catalog
+    catalog_parser = subparsers.add_parser("catalog", help="Index a save library and query it by name or color")
+    catalog_parser.add_argument("paths", nargs="*", help="Save files or folders to add or refresh")
+    catalog_parser.add_argument("--db", help="Catalog database (defaults to the per-user catalog)")
+    catalog_parser.add_argument("--name", help="List saves containing this character name")
+    catalog_parser.add_argument("--contains", action="store_true", help="Match --name as a substring")
+    catalog_parser.add_argument("--color", help="List saves using this RRGGBB color")
+    catalog_parser.add_argument("--slot", choices=COLOR_SLOTS, help="Only match --color in this slot")
+    catalog_parser.add_argument("--layout", choices=layout_keys, help="Only list blocks of this layout")
+    catalog_parser.add_argument("--workers", type=int, default=4, help="Threads scanning changed files")
+    catalog_parser.add_argument("--crawl", action="store_true",
+                                help="Find saves by header under the folders, whatever their names")
+    catalog_parser.set_defaults(func=cmd_catalog)
+
+    # convert
+    convert_parser = subparsers.add_parser("convert", help="Copy colors between platforms, file to file or folder to folder")
+    convert_parser.add_argument("source", help="Save file or folder to read colors from")
+    convert_parser.add_argument("target", help="Save file or folder to write colors into (paired by relative path)")
+    convert_parser.add_argument("--from", dest="source_layout", choices=layout_keys, required=True,
+                                help="Layout of the source saves")
+    convert_parser.add_argument("--to", dest="target_layout", choices=layout_keys, required=True,
+                                help="Layout of the target saves")
+    convert_parser.add_argument("--name", help="Character name (defaults to the name in front of each source block)")
+    convert_parser.add_argument("--journal", help="Write-ahead journal file, resumable with batch --resume")
+    convert_parser.add_argument("--no-backup", action="store_true", help="Do not create .bak files")
+    convert_parser.add_argument("--dry-run", action="store_true", help="Report what would change without writing")
+    convert_parser.add_argument("--workers", type=int, default=4, help="Threads reading and scanning pairs")
+    convert_parser.set_defaults(func=cmd_convert)
+
+    # similar
+    similar_parser = subparsers.add_parser("similar", help="Find characters with near-duplicate color schemes")
+    similar_parser.add_argument("paths", nargs="*", help="Save files or folders to refresh in the catalog first")
+    similar_parser.add_argument("--db", help="Catalog database (defaults to the per-user catalog)")
+    similar_parser.add_argument("--threshold", type=float, default=5.0,
+                                help="Largest perceptual difference (CIE76 delta E) per color slot")
+    similar_parser.add_argument("--layout", choices=layout_keys, help="Only compare blocks of this layout")
+    similar_parser.add_argument("--workers", type=int, default=4, help="Threads scanning changed files")
+    similar_parser.set_defaults(func=cmd_similar)
+
+    # transform
+    transform_parser = subparsers.add_parser("transform", help="Hue shift, clamp, palette-map or randomize many saves")
+    transform_parser.add_argument("paths", nargs="+", help="Save files or folders of .sav files")
+    transform_parser.add_argument("--layout", choices=layout_keys, required=True, help="Save layout of the files")
+    transform_parser.add_argument("--name", help="Character name to locate in every save")
+    transform_parser.add_argument("--auto-name", action="store_true",
+                                  help="Use the top discovered name with a valid color block in each save")
+    transform_parser.add_argument("--slots", help="Comma separated slots to change (default: all)")
+    transform_parser.add_argument("--randomize", metavar="SEED", help="Random colors, reproducible per seed and file")
+    transform_parser.add_argument("--team-palette", metavar="RRGGBB,...", help="Map colors onto these palette colors")
+    transform_parser.add_argument("--palette-mode", choices=("nearest", "slots"), default="nearest",
+                                  help="Snap to the nearest palette color, or assign palette colors to slots in order")
+    transform_parser.add_argument("--hue", type=float, help="Rotate hue by this many degrees")
+    transform_parser.add_argument("--saturation-min", type=float, help="Raise HSV saturation to at least this (0-1)")
+    transform_parser.add_argument("--saturation-max", type=float, help="Lower HSV saturation to at most this (0-1)")
+    transform_parser.add_argument("--journal", help="Write-ahead journal file for resuming or rolling back")
+    transform_parser.add_argument("--no-backup", action="store_true", help="Do not create .bak files")
+    transform_parser.add_argument("--dry-run", action="store_true", help="List the slot changes without writing")
+    transform_parser.add_argument("--workers", type=int, default=4, help="Threads reading saves")
+    transform_parser.set_defaults(func=cmd_transform)
+
+    # fanout
+    fanout_parser = subparsers.add_parser("fanout", help="Write many recolored variants of one save")
+    fanout_parser.add_argument("file", help="Source save")
+    fanout_parser.add_argument("--layout", choices=layout_keys, required=True, help="Save layout of the source")
+    fanout_parser.add_argument("--name", help="Character name to locate")
+    fanout_parser.add_argument("--auto-name", action="store_true",
+                               help="Use the top discovered name with a valid color block")
+    fanout_parser.add_argument("--out", required=True, help="Folder for the variants")
+    fanout_parser.add_argument("--variants", metavar="FILE", help="Text file with three RRGGBB colors per line")
+    fanout_parser.add_argument("--random", type=int, metavar="N", help="Write N random variants")
+    fanout_parser.add_argument("--seed", default="0", help="Seed for --random")
+    fanout_parser.add_argument("--hue-steps", type=int, metavar="N", help="Write N variants with evenly rotated hue")
+    fanout_parser.add_argument("--template", default="{stem}_{index:04d}{ext}",
+                               help="Output file name; {stem}, {index} and {ext} are filled in")
+    fanout_parser.add_argument("--overwrite", action="store_true", help="Replace existing output files")
+    fanout_parser.add_argument("--workers", type=int, default=4, help="Threads writing variants")
+    fanout_parser.set_defaults(func=cmd_fanout)
+
+    # archive
+    archive_parser = subparsers.add_parser("archive", help="List or recolor saves inside a zip or tar archive")
+    archive_parser.add_argument("archive", help="Zip or (compressed) tar archive")
+    archive_parser.add_argument("--layout", choices=layout_keys, required=True, help="Save layout of the members")
+    archive_parser.add_argument("--name", help="Character name to locate (discovered per save when omitted)")
+    archive_parser.add_argument("--auto-name", action="store_true",
+                                help="Use each save's top discovered name even if --name is given")
+    archive_parser.add_argument("--member", metavar="GLOB", help="Only members matching this pattern")
+    for slot in COLOR_SLOTS:
+        archive_parser.add_argument(f"--{slot}", help=f"New {slot} as RRGGBB")
+    archive_parser.add_argument("--dry-run", action="store_true", help="Show what would be patched")
+    archive_parser.add_argument("--no-backup", action="store_true", help="Do not create a .bak of the archive")
+    archive_parser.set_defaults(func=cmd_archive)
+
+    # audit
+    audit_parser = subparsers.add_parser("audit", help="Check every save in a library before batch-editing it")
+    audit_parser.add_argument("paths", nargs="+", help="Save files or folders of .sav files")
+    audit_parser.add_argument("--layout", choices=layout_keys, required=True, help="Save layout to check against")
+    audit_parser.add_argument("--name", help="Character name to check (the top discovered name when omitted)")
+    audit_parser.add_argument("--auto-name", action="store_true", help="Ignore --name and use each save's top name")
+    audit_parser.add_argument("--workers", type=int, help="Processes auditing files (defaults to all cores)")
+    audit_parser.add_argument("--stale-days", type=int, default=30,
+                              help="Flag backups this many days older than the save's last write")
+    audit_parser.add_argument("--report", metavar="CSV", help="Write per-file findings to a CSV file")
+    audit_parser.add_argument("--verbose", action="store_true", help="Also list saves with stale backups")
+    audit_parser.set_defaults(func=cmd_audit)
+
+    # serve
+    serve_parser = subparsers.add_parser("serve", help="Run a local HTTP API for scanning and patching saves")
+    serve_parser.add_argument("--host", default="127.0.0.1", help="Interface to bind (default: localhost only)")
+    serve_parser.add_argument("--port", type=int, default=8765, help="Port to listen on")
+    serve_parser.add_argument("--workers", type=int, default=4, help="Size of the request worker pool")
+    serve_parser.add_argument("--cache-size", type=int, default=64, help="Number of parsed saves kept in memory")
+    serve_parser.add_argument("--root", help="Only allow loading saves by path from inside this folder")
+    serve_parser.add_argument("--quiet", action="store_true", help="Do not log every request")
+    serve_parser.set_defaults(func=cmd_serve)
+
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,6 +2,7 @@ import tkinter as tk
 from tkinter import ttk, filedialog, colorchooser, messagebox
 import os
 import re
+import palette
 
 class BorderlandsTheme:
     """Common Borderlands theme and styling utilities"""
@@ -211,6 +212,12 @@ class ColorPicker:
                              font=('Impact', 14), bd=3, width=15)
         custom_btn.pack(side=tk.LEFT)
         
+        # Image button - proposes a full three-color scheme from artwork or a logo
+        image_btn = tk.Button(button_frame, text="FROM IMAGE", command=lambda: image_scheme_dialog(),
+                            bg=colors['button_bg'], fg=colors['button_fg'], 
+                            font=('Impact', 14), bd=3, width=12)
+        image_btn.pack(side=tk.LEFT, padx=(10, 0))
+        
         # Cancel button
         cancel_btn = tk.Button(button_frame, text="CANCEL", command=dialog.destroy,
                              bg=colors['button_bg'], fg=colors['button_fg'], 
@@ -227,6 +234,23 @@ class ColorPicker:
                 hex_color = color_result[1].upper()
                 select_color(hex_color)
         
+        def image_scheme_dialog():
+            image_path = filedialog.askopenfilename(
+                parent=dialog,
+                title="Select Image To Match",
+                filetypes=[("Images", "*.png *.gif *.ppm *.pgm"), ("All Files", "*.*")]
+            )
+            if not image_path:
+                return
+            try:
+                scheme = palette.extract_scheme(image_path, master=dialog)
+            except (OSError, ValueError, tk.TclError) as e:
+                messagebox.showerror("ERROR", f"Failed to read image: {str(e)}", parent=dialog)
+                return
+            # Most dominant color goes to color1, then color2 and color3
+            result[0] = dict(zip(("color1", "color2", "color3"), scheme))
+            dialog.destroy()
+        
         # Center the dialog on the parent window
         dialog.update_idletasks()
         width = dialog.winfo_width()
@@ -238,5 +262,256 @@ class ColorPicker:
         # Wait for the dialog to be closed
         parent.wait_window(dialog)
         
-        # Return the selected color or None if cancelled
+        # Return the selected color, a dict of all three slots for an image scheme,
+        # or None if cancelled
         return result[0]
+
+class ReportViewer:
+    """Scrollable read-only text report dialog with Borderlands styling"""
+    
+    @staticmethod
+    def show(parent, title, lines, colors, highlight=None):
+        """Show report lines in a dialog; lines containing highlight are drawn in orange"""
+        dialog = tk.Toplevel(parent)
+        dialog.title(title.upper())
+        dialog.transient(parent)
+        dialog.configure(bg=colors['background'], highlightbackground=colors['yellow'], highlightthickness=3)
+        
+        # Title section with Borderlands styling
+        title_label = tk.Label(dialog, text=title.upper(), bg=colors['background'], fg=colors['yellow'],
+                            font=('Impact', 20), pady=10)
+        title_label.pack(fill=tk.X)
+        
+        # Text area with scrollbar
+        text_frame = tk.Frame(dialog, bg=colors['background'], padx=15)
+        text_frame.pack(fill=tk.BOTH, expand=True)
+        
+        scrollbar = ttk.Scrollbar(text_frame, orient=tk.VERTICAL)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        
+        text = tk.Text(text_frame, width=80, height=24, bg=colors['input_bg'], fg=colors['foreground'],
+                     font=('Courier New', 11), yscrollcommand=scrollbar.set, wrap=tk.NONE, bd=2)
+        text.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar.config(command=text.yview)
+        text.tag_configure('highlight', foreground=colors['orange'])
+        
+        for line in lines:
+            tag = ('highlight',) if highlight and highlight in line else ()
+            text.insert(tk.END, line + "\n", tag)
+        text.config(state=tk.DISABLED)
+        
+        # Close button
+        close_btn = tk.Button(dialog, text="CLOSE", command=dialog.destroy,
+                            bg=colors['button_bg'], fg=colors['button_fg'],
+                            font=('Impact', 14), bd=3, width=15)
+        close_btn.pack(pady=15)
+        
+        return dialog
+
+class HexInspector:
+    """Virtualized hex view of a save buffer that only draws the rows currently on screen"""
+    
+    BYTES_PER_ROW = 16
+    
+    def __init__(self, parent, data, colors, highlights=(), focus_offset=0, title="HEX INSPECTOR"):
+        # highlights is a list of (start, end, kind, fill) tuples; kind is shown in the legend
+        self.data = data
+        self.colors = colors
+        self.highlights = sorted(highlights)
+        self.total_rows = max(1, (len(data) + self.BYTES_PER_ROW - 1) // self.BYTES_PER_ROW)
+        self.top_row = 0
+        
+        self.dialog = tk.Toplevel(parent)
+        self.dialog.title(title)
+        self.dialog.transient(parent)
+        self.dialog.configure(bg=colors['background'], highlightbackground=colors['yellow'], highlightthickness=3)
+        self.dialog.geometry("860x600")
+        
+        # Toolbar with offset jump and legend
+        toolbar = tk.Frame(self.dialog, bg=colors['background'], padx=10, pady=8)
+        toolbar.pack(fill=tk.X)
+        
+        tk.Label(toolbar, text="GO TO OFFSET:", bg=colors['background'], fg=colors['yellow'],
+               font=('Impact', 14)).pack(side=tk.LEFT)
+        self.goto_var = tk.StringVar()
+        goto_entry = tk.Entry(toolbar, textvariable=self.goto_var, width=12, bg=colors['input_bg'],
+                            fg=colors['foreground'], insertbackground=colors['foreground'], font=('Courier New', 12))
+        goto_entry.pack(side=tk.LEFT, padx=8)
+        goto_entry.bind("<Return>", lambda e: self.goto_entered())
+        
+        # Legend: one swatch per highlight kind, in first-seen order
+        seen = []
+        for start, end, kind, fill in self.highlights:
+            if kind not in [k for k, f in seen]:
+                seen.append((kind, fill))
+        for kind, fill in reversed(seen):
+            tk.Label(toolbar, text=kind.upper(), bg=colors['background'], fg=colors['foreground'],
+                   font=('Impact', 12)).pack(side=tk.RIGHT, padx=(2, 10))
+            tk.Label(toolbar, bg=fill, width=2, relief="solid", bd=1).pack(side=tk.RIGHT)
+        
+        # Canvas plus scrollbar; the scrollbar is driven manually in row units
+        body = tk.Frame(self.dialog, bg=colors['background'], padx=10)
+        body.pack(fill=tk.BOTH, expand=True)
+        self.scrollbar = ttk.Scrollbar(body, orient=tk.VERTICAL, command=self.on_scrollbar)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.canvas = tk.Canvas(body, bg=colors['input_bg'], highlightthickness=0)
+        self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        
+        self.font = ('Courier New', 11)
+        probe = self.canvas.create_text(0, 0, text="0", font=self.font, anchor=tk.NW)
+        x1, y1, x2, y2 = self.canvas.bbox(probe)
+        self.canvas.delete(probe)
+        self.char_w = x2 - x1
+        self.row_h = (y2 - y1) + 2
+        
+        self.canvas.bind("<Configure>", lambda e: self.redraw())
+        self.canvas.bind("<MouseWheel>", self.on_wheel)
+        self.canvas.bind("<Button-4>", lambda e: self.scroll_rows(-3))
+        self.canvas.bind("<Button-5>", lambda e: self.scroll_rows(3))
+        self.dialog.bind("<Prior>", lambda e: self.scroll_rows(-self.visible_rows()))
+        self.dialog.bind("<Next>", lambda e: self.scroll_rows(self.visible_rows()))
+        
+        self.goto(focus_offset)
+    
+    def visible_rows(self):
+        return max(1, self.canvas.winfo_height() // self.row_h)
+    
+    def goto(self, offset):
+        """Scroll so that offset sits a few rows below the top of the view"""
+        row = max(0, min(offset, len(self.data) - 1)) // self.BYTES_PER_ROW
+        self.top_row = row
+        self.scroll_rows(-4)
+    
+    def goto_entered(self):
+        try:
+            self.goto(int(self.goto_var.get().strip(), 16))
+        except ValueError:
+            messagebox.showerror("ERROR", "Enter the offset in hexadecimal", parent=self.dialog)
+    
+    def scroll_rows(self, delta):
+        max_top = max(0, self.total_rows - self.visible_rows())
+        self.top_row = max(0, min(self.top_row + delta, max_top))
+        self.redraw()
+    
+    def on_wheel(self, event):
+        self.scroll_rows(-3 if event.delta > 0 else 3)
+    
+    def on_scrollbar(self, action, *args):
+        if action == "moveto":
+            self.top_row = int(float(args[0]) * self.total_rows)
+            self.scroll_rows(0)
+        elif action == "scroll":
+            amount = int(args[0])
+            self.scroll_rows(amount * self.visible_rows() if args[1] == "pages" else amount)
+    
+    def _highlights_between(self, start, end):
+        """Yield highlight ranges overlapping [start, end)"""
+        for h_start, h_end, kind, fill in self.highlights:
+            if h_start >= end:
+                break
+            if h_end > start:
+                yield h_start, h_end, kind, fill
+    
+    def redraw(self):
+        """Draw only the rows that fit in the canvas"""
+        canvas = self.canvas
+        canvas.delete("all")
+        rows = self.visible_rows()
+        bpr = self.BYTES_PER_ROW
+        first = self.top_row * bpr
+        last = min(len(self.data), (self.top_row + rows) * bpr)
+        
+        offset_x = 6
+        hex_x = offset_x + self.char_w * 10
+        ascii_x = hex_x + self.char_w * (bpr * 3 + 2)
+        
+        # Highlight boxes first so the text draws on top
+        for h_start, h_end, kind, fill in self._highlights_between(first, last):
+            for pos in range(max(h_start, first), min(h_end, last)):
+                row = (pos - first) // bpr
+                col = pos % bpr
+                y = row * self.row_h
+                x = hex_x + col * 3 * self.char_w
+                canvas.create_rectangle(x - 2, y, x + self.char_w * 2 + 2, y + self.row_h - 1,
+                                      fill=fill, outline=self.colors['border'])
+                ax = ascii_x + col * self.char_w
+                canvas.create_rectangle(ax, y, ax + self.char_w, y + self.row_h - 1, fill=fill, outline="")
+        
+        view = memoryview(self.data)
+        for row in range(rows):
+            start = first + row * bpr
+            if start >= len(self.data):
+                break
+            chunk = bytes(view[start:start + bpr])
+            y = row * self.row_h + 1
+            canvas.create_text(offset_x, y, text=f"{start:08X}", anchor=tk.NW, font=self.font,
+                             fill=self.colors['yellow'])
+            canvas.create_text(hex_x, y, text=chunk.hex(' ').upper(), anchor=tk.NW, font=self.font,
+                             fill=self.colors['foreground'])
+            canvas.create_text(ascii_x, y, text="".join(chr(b) if 32 <= b < 127 else "." for b in chunk),
+                             anchor=tk.NW, font=self.font, fill=self.colors['foreground'])
+        
+        # Scrollbar thumb reflects the visible slice of the file
+        self.scrollbar.set(self.top_row / self.total_rows, min(1.0, (self.top_row + rows) / self.total_rows))
+
+class SessionTabBar:
+    """Row of tabs for the saves open in an editor, scrolling sideways when there are many"""
+    
+    def __init__(self, parent, colors, on_select, on_close):
+        self.colors = colors
+        self.on_select = on_select
+        self.on_close = on_close
+        
+        self.frame = tk.Frame(parent, bg=colors['background'])
+        self.canvas = tk.Canvas(self.frame, bg=colors['background'], height=34, highlightthickness=0)
+        self.scrollbar = ttk.Scrollbar(self.frame, orient=tk.HORIZONTAL, command=self.canvas.xview)
+        self.canvas.configure(xscrollcommand=self.scrollbar.set)
+        self.canvas.pack(fill=tk.X)
+        self.scrollbar.pack(fill=tk.X)
+        
+        # Tabs live in a frame inside the canvas so the row can be wider than the window
+        self.inner = tk.Frame(self.canvas, bg=colors['background'])
+        self.canvas.create_window(0, 0, window=self.inner, anchor=tk.NW)
+        self.inner.bind("<Configure>", lambda e: self.canvas.configure(scrollregion=self.canvas.bbox("all")))
+        self.set_tabs([], None)
+    
+    def pack(self, **kwargs):
+        self.frame.pack(**kwargs)
+    
+    def set_tabs(self, tabs, active):
+        """Redraw the row; the active tab is yellow and scrolled into view"""
+        for child in self.inner.winfo_children():
+            child.destroy()
+        
+        if not tabs:
+            tk.Label(self.inner, text="NO SAVES OPEN - LOAD SAVE OPENS EACH FILE IN A NEW TAB",
+                   bg=self.colors['background'], fg=self.colors['foreground'], font=('Impact', 11)).pack(side=tk.LEFT)
+            return
+        
+        active_frame = None
+        for tab in tabs:
+            bg = self.colors['yellow'] if tab is active else self.colors['button_bg']
+            # Black frame around each tab for the cell-shaded look
+            tab_frame = tk.Frame(self.inner, bg="black", bd=2)
+            tab_frame.pack(side=tk.LEFT, padx=(0, 6))
+            tk.Button(tab_frame, text=tab.title.upper(), bg=bg, fg=self.colors['button_fg'],
+                    font=('Impact', 11), relief="flat", bd=0, padx=8,
+                    command=lambda t=tab: self.on_select(t)).pack(side=tk.LEFT)
+            tk.Button(tab_frame, text="X", bg=bg, fg=self.colors['button_fg'],
+                    font=('Impact', 11), relief="flat", bd=0, padx=4,
+                    command=lambda t=tab: self.on_close(t)).pack(side=tk.LEFT)
+            if tab is active:
+                active_frame = tab_frame
+        
+        if active_frame is not None:
+            self.frame.after_idle(lambda: self.scroll_into_view(active_frame))
+    
+    def scroll_into_view(self, widget):
+        if not widget.winfo_exists():
+            return
+        total = max(1, self.inner.winfo_width())
+        left = widget.winfo_x()
+        right = left + widget.winfo_width()
+        first, last = self.canvas.xview()
+        if left < first * total or right > last * total:
+            self.canvas.xview_moveto(max(0.0, (right - (last - first) * total) / total))
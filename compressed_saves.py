@@ -0,0 +1,427 @@
+import hashlib
+import struct
+import zlib
+
+from save_formats import get_layout
+
+# Registered container codecs, keyed by codec key
+_CODECS = {}
+
+# Bytes decompressed per step while searching a payload lazily
+LAZY_CHUNK_SIZE = 64 * 1024
+
+# Farthest back each LZO1X match instruction can reach
+LZO_M2_MAX_OFFSET = 0x0800
+LZO_M3_MAX_OFFSET = 0x4000
+LZO_M4_MAX_OFFSET = 0xBFFF
+
+
+class ContainerError(Exception):
+    """Raised when a container fails its hash check or its payload cannot be decoded"""
+
+
+class ZlibCompression:
+    """Stdlib zlib compressor with incremental decompression"""
+
+    name = "zlib"
+
+    def __init__(self, level=9):
+        self.level = level
+
+    def compress(self, data):
+        return zlib.compress(bytes(data), self.level)
+
+    def decompressor(self):
+        """Return an object with decompress(chunk, max_length) and unconsumed_tail like zlib's"""
+        return zlib.decompressobj()
+
+
+class Lzo1xCompression:
+    """Pure-Python LZO1X, the compressor of Borderlands 2 and The Pre-Sequel saves
+
+    Streams are compatible with liblzo's lzo1x_decompress; compression is a greedy
+    LZO1X-1 style match search, so output is close to but not byte-identical with the game's.
+    """
+
+    name = "lzo1x"
+
+    # Bytes hashed to find match candidates; shorter matches are left as literals
+    MIN_MATCH = 4
+    # Longest match searched for; longer runs just continue with a new match
+    MAX_MATCH = 2048
+
+    def compress(self, data):
+        data = bytes(data)
+        size = len(data)
+        out = bytearray()
+        table = {}
+        literal_start = 0
+        pos = 0
+        last = size - self.MIN_MATCH
+        while pos <= last:
+            key = data[pos:pos + self.MIN_MATCH]
+            candidate = table.get(key)
+            table[key] = pos
+            if candidate is None or pos - candidate > LZO_M4_MAX_OFFSET:
+                pos += 1
+                continue
+            length = self._match_length(data, candidate, pos)
+            self._literals(out, data[literal_start:pos])
+            self._match(out, pos - candidate, length)
+            pos += length
+            literal_start = pos
+        self._literals(out, data[literal_start:])
+        # End of stream: an M4 match of distance 0
+        out += b"\x11\x00\x00"
+        return bytes(out)
+
+    def _match_length(self, data, candidate, pos):
+        limit = min(len(data) - pos, self.MAX_MATCH)
+        length = self.MIN_MATCH
+        # Compare 16 bytes at a time before settling the tail byte by byte
+        while length + 16 <= limit and data[candidate + length:candidate + length + 16] == data[pos + length:pos + length + 16]:
+            length += 16
+        while length < limit and data[candidate + length] == data[pos + length]:
+            length += 1
+        return length
+
+    @staticmethod
+    def _extended(out, count):
+        # Lengths past an instruction's own bits: one zero byte per 255, then the rest
+        while count > 255:
+            out.append(0)
+            count -= 255
+        out.append(count)
+
+    def _literals(self, out, literals):
+        count = len(literals)
+        if not count:
+            return
+        if not out and count <= 238:
+            out.append(17 + count)
+        elif count <= 3:
+            # Up to three literals ride in the low bits of the previous match instruction
+            out[-2] |= count
+        elif count <= 18:
+            out.append(count - 3)
+        else:
+            out.append(0)
+            self._extended(out, count - 18)
+        out += literals
+
+    def _match(self, out, distance, length):
+        if length <= 8 and distance <= LZO_M2_MAX_OFFSET:
+            distance -= 1
+            out.append(((length - 1) << 5) | ((distance & 7) << 2))
+            out.append(distance >> 3)
+            return
+        if distance <= LZO_M3_MAX_OFFSET:
+            distance -= 1
+            if length <= 33:
+                out.append(32 | (length - 2))
+            else:
+                out.append(32)
+                self._extended(out, length - 33)
+        else:
+            distance -= 0x4000
+            high = (distance & 0x4000) >> 11
+            if length <= 9:
+                out.append(16 | high | (length - 2))
+            else:
+                out.append(16 | high)
+                self._extended(out, length - 9)
+        out.append((distance << 2) & 0xFF)
+        out.append((distance >> 6) & 0xFF)
+
+    def decompressor(self):
+        return _Lzo1xDecompressor()
+
+
+class _Lzo1xDecompressor:
+    """Resumable LZO1X decoder with the decompress(chunk, max_length) interface of zlib's"""
+
+    def __init__(self):
+        self.out = bytearray()
+        self.state = 0          # Literals copied after the last instruction: 0-3, or 4 for a long run
+        self.started = False
+        self.finished = False
+        self.unconsumed_tail = b""
+
+    def decompress(self, data, max_length=0):
+        """Decode whole instructions until max_length new bytes exist; the input left over is kept
+        in unconsumed_tail, which the caller passes back in"""
+        if self.finished:
+            return b""
+        src = bytes(data)
+        start = len(self.out)
+        ip = 0
+        try:
+            if not self.started:
+                self.started = True
+                if src[0] > 17:
+                    count = src[0] - 17
+                    ip = self._copy_literals(src, 1, count)
+                    self.state = count if count < 4 else 4
+            while not self.finished and (not max_length or len(self.out) - start < max_length):
+                ip = self._instruction(src, ip)
+        except IndexError:
+            raise ContainerError("LZO stream ends in the middle of an instruction")
+        self.unconsumed_tail = src[ip:] if not self.finished else b""
+        return bytes(self.out[start:])
+
+    def _copy_literals(self, src, ip, count):
+        if ip + count > len(src):
+            raise IndexError
+        self.out += src[ip:ip + count]
+        return ip + count
+
+    @staticmethod
+    def _long_length(src, ip, base):
+        zeros = 0
+        while src[ip] == 0:
+            zeros += 1
+            ip += 1
+        return base + 255 * zeros + src[ip], ip + 1
+
+    def _instruction(self, src, ip):
+        t = src[ip]
+        ip += 1
+        if t < 16:
+            if self.state == 0:
+                # Literal run of 4 or more
+                count = t + 3
+                if t == 0:
+                    count, ip = self._long_length(src, ip, 18)
+                ip = self._copy_literals(src, ip, count)
+                self.state = 4
+                return ip
+            if self.state < 4:
+                distance, length = 1 + (t >> 2) + (src[ip] << 2), 2
+            else:
+                distance, length = 1 + LZO_M2_MAX_OFFSET + (t >> 2) + (src[ip] << 2), 3
+            after = t & 3
+            ip += 1
+        elif t >= 64:
+            distance = 1 + ((t >> 2) & 7) + (src[ip] << 3)
+            length = (t >> 5) + 1
+            after = t & 3
+            ip += 1
+        elif t >= 32:
+            length = (t & 31) + 2
+            if length == 2:
+                length, ip = self._long_length(src, ip, 33)
+            word = src[ip] | (src[ip + 1] << 8)
+            ip += 2
+            distance, after = 1 + (word >> 2), word & 3
+        else:
+            length = (t & 7) + 2
+            if length == 2:
+                length, ip = self._long_length(src, ip, 9)
+            word = src[ip] | (src[ip + 1] << 8)
+            ip += 2
+            distance, after = ((t & 8) << 11) + (word >> 2), word & 3
+            if distance == 0:
+                self.finished = True
+                return ip
+            distance += 0x4000
+        self._copy_match(distance, length)
+        ip = self._copy_literals(src, ip, after)
+        self.state = after
+        return ip
+
+    def _copy_match(self, distance, length):
+        out = self.out
+        begin = len(out) - distance
+        if begin < 0:
+            raise ContainerError("LZO match reaches back before the start of the payload")
+        if distance >= length:
+            out += out[begin:begin + length]
+        else:
+            # Overlapping copy repeats the last distance bytes
+            pattern = out[begin:]
+            out += (pattern * (length // distance + 1))[:length]
+
+
+class LazyPayload:
+    """Decompressed payload that only inflates as far as a caller actually reads"""
+
+    def __init__(self, compressed, compression, expected_size=None):
+        self._source = memoryview(compressed)
+        self._decomp = compression.decompressor()
+        self._pending = self._source
+        self.expected_size = expected_size
+        self.buffer = bytearray()
+        self.complete = False
+
+    def _inflate(self, max_length=LAZY_CHUNK_SIZE):
+        """Decompress up to max_length more bytes; returns False once the stream is exhausted"""
+        if self.complete:
+            return False
+        try:
+            chunk = self._decomp.decompress(self._pending, max_length)
+        except zlib.error as e:
+            raise ContainerError(f"Corrupt compressed payload: {e}")
+        self._pending = self._decomp.unconsumed_tail
+        self.buffer += chunk
+        if not chunk and not self._pending:
+            self.complete = True
+            if self.expected_size is not None and len(self.buffer) != self.expected_size:
+                raise ContainerError(
+                    f"Payload inflated to {len(self.buffer)} bytes, header says {self.expected_size}")
+            return False
+        return True
+
+    def ensure(self, size):
+        """Inflate until at least size bytes are available (or the payload ends)"""
+        while len(self.buffer) < size and self._inflate():
+            pass
+        return len(self.buffer) >= size
+
+    def find(self, pattern, start=0):
+        """Search the payload, inflating only until pattern is found; returns the offset or -1"""
+        while True:
+            pos = self.buffer.find(pattern, start)
+            if pos != -1:
+                return pos
+            # Next time only rescan the tail that might hold a match straddling the new chunk
+            start = max(start, len(self.buffer) - len(pattern) + 1)
+            if not self._inflate():
+                return -1
+
+    def read_all(self):
+        """Inflate the remainder and return the full payload"""
+        while self._inflate():
+            pass
+        return self.buffer
+
+    @property
+    def inflated(self):
+        return len(self.buffer)
+
+
+class HashedContainerCodec:
+    """Save container: hash of everything after it, uncompressed size, compressed payload"""
+
+    def __init__(self, key, label, hash_name="sha1", compression=None):
+        self.key = key
+        self.label = label
+        self.hash_name = hash_name
+        self.compression = compression or ZlibCompression()
+        self.digest_size = hashlib.new(hash_name).digest_size
+        # Header after the digest: big-endian uncompressed payload size
+        self.size_struct = struct.Struct(">I")
+        self.header_size = self.digest_size + self.size_struct.size
+
+    def __repr__(self):
+        return f"HashedContainerCodec({self.key!r})"
+
+    def _digest(self, data):
+        return hashlib.new(self.hash_name, data).digest()
+
+    def verify(self, raw):
+        """Return True if raw is long enough and its stored hash matches its body"""
+        if len(raw) < self.header_size:
+            return False
+        view = memoryview(raw)
+        return bytes(view[:self.digest_size]) == self._digest(view[self.digest_size:])
+
+    def open(self, raw, check_hash=True):
+        """Check the hash and return a LazyPayload over the compressed data"""
+        if len(raw) < self.header_size:
+            raise ContainerError("File is too short to be a compressed save")
+        if check_hash and not self.verify(raw):
+            raise ContainerError(f"{self.hash_name.upper()} hash mismatch; the save is corrupt or not a {self.label} save")
+        (size,) = self.size_struct.unpack_from(raw, self.digest_size)
+        return LazyPayload(memoryview(raw)[self.header_size:], self.compression, size)
+
+    def pack(self, payload):
+        """Compress and hash a payload into a full container"""
+        body = self.size_struct.pack(len(payload)) + self.compression.compress(payload)
+        return self._digest(body) + body
+
+    def repack_validated(self, payload):
+        """Pack a payload and prove it round-trips before anyone writes it"""
+        raw = self.pack(payload)
+        if not self.verify(raw) or self.open(raw).read_all() != payload:
+            raise ContainerError("Repacked save failed round-trip validation")
+        return raw
+
+    def scan(self, raw, layout, player_name):
+        """Locate the color block inside the payload; returns (payload, color_start)
+
+        Every occurrence of the name is ranked with best_name_hit, as the editors do, so the
+        whole payload is inflated. A tie between valid blocks raises AmbiguousNameError.
+        """
+        if isinstance(layout, str):
+            layout = get_layout(layout)
+        payload = self.open(raw)
+        hit = layout.best_name_hit(payload.read_all(), player_name)
+        if hit is None:
+            raise ValueError(f"Could not find character name '{player_name}' in save file")
+        if hit.color_start == -1 or not hit.separators_ok:
+            raise ValueError(f"Found character name '{player_name}' but couldn't locate the color block")
+        return payload, hit.color_start
+
+    def recolor(self, raw, layout, player_name, hex_colors):
+        """Return a new, validated container with hex_colors written into the character's block"""
+        if isinstance(layout, str):
+            layout = get_layout(layout)
+        payload, color_start = self.scan(raw, layout, player_name)
+        data = bytearray(payload.read_all())
+        for offset, new in layout.encode_patches(color_start, hex_colors):
+            data[offset:offset + len(new)] = new
+        return self.repack_validated(bytes(data)), color_start
+
+
+def register_codec(codec):
+    """Add a container codec to the registry, replacing any codec with the same key"""
+    _CODECS[codec.key] = codec
+    return codec
+
+
+def get_codec(key):
+    """Return the registered codec for key"""
+    try:
+        return _CODECS[key]
+    except KeyError:
+        raise ValueError(f"Unknown container codec '{key}'. Known codecs: {', '.join(sorted(_CODECS))}")
+
+
+def available_codecs():
+    """Return all registered codecs in registration order"""
+    return list(_CODECS.values())
+
+
+def detect_codec(raw):
+    """Return the first registered codec whose hash check passes and whose payload decodes, or None
+
+    Codecs sharing a hash differ only in their compressor, so the first chunk is decoded too.
+    """
+    for codec in _CODECS.values():
+        if not codec.verify(raw):
+            continue
+        try:
+            codec.open(raw, check_hash=False).ensure(1)
+        except ContainerError:
+            continue
+        return codec
+    return None
+
+
+# This tool's own container: SHA-1 of the body, big-endian payload size, zlib payload.
+# Registered first because zlib rejects other streams at once, which makes detection reliable
+SHA1_ZLIB = register_codec(HashedContainerCodec(
+    key="sha1-zlib",
+    label="SHA-1 + zlib (custom container)",
+    hash_name="sha1",
+))
+
+# Borderlands 2 and The Pre-Sequel: the same header around an LZO1X payload. The games encode
+# that payload further (Huffman-coded protobuf), so their saves open, verify and unpack, but
+# only payloads holding a raw color block can be scanned or recolored
+SHA1_LZO = register_codec(HashedContainerCodec(
+    key="sha1-lzo",
+    label="SHA-1 + LZO1X (Borderlands 2 / Pre-Sequel)",
+    hash_name="sha1",
+    compression=Lzo1xCompression(),
+))
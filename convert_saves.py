@@ -0,0 +1,100 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from save_formats import get_layout
+import batch_tools
+import save_io
+
+
+class ConversionPair:
+    """A source save on one platform and the save on the other platform that receives its colors"""
+
+    def __init__(self, source, target):
+        self.source = source
+        self.target = target
+
+    def __repr__(self):
+        return f"ConversionPair({self.source!r} -> {self.target!r})"
+
+
+def read_source_colors(path, layout, player_name=None):
+    """Read one save and return (character name, colors) from its color block"""
+    data, _ = save_io.read_save(path)
+    if player_name:
+        color_start = layout.scan(data, player_name)
+        return player_name, layout.decode_block(data, color_start)
+
+    # Without a name, use the name the editors and --auto-name would discover
+    candidate = layout.discover_name(data)
+    return candidate.name, layout.decode_block(data, candidate.color_start)
+
+
+def plan_conversion(pair, source_layout, target_layout, player_name=None):
+    """Read each file of a pair once and plan the patch that copies the colors across"""
+    name, colors = read_source_colors(pair.source, source_layout, player_name)
+    data, fingerprint = save_io.read_save(pair.target)
+    # Colors are decoded to '#RRGGBB' and re-encoded in the target's channel order
+    color_start = target_layout.scan(data, name)
+    return batch_tools.plan_from_buffer(pair.target, data, target_layout, color_start, colors, fingerprint)
+
+
+def pair_paths(source, target, pattern_ext=(".sav",)):
+    """Pair two files, or the saves in two folders by relative path (case-insensitive)
+
+    Returns (pairs, unpaired source paths).
+    """
+    if not os.path.isdir(source):
+        if os.path.isdir(target):
+            target = os.path.join(target, os.path.basename(source))
+        return [ConversionPair(source, target)], []
+
+    targets = {}
+    for path in batch_tools.expand_paths([target], pattern_ext):
+        targets[os.path.relpath(path, target).lower()] = path
+
+    pairs, unpaired = [], []
+    for path in batch_tools.expand_paths([source], pattern_ext):
+        match = targets.get(os.path.relpath(path, source).lower())
+        if match:
+            pairs.append(ConversionPair(path, match))
+        else:
+            unpaired.append(path)
+    return pairs, unpaired
+
+
+def convert_pairs(pairs, source_layout, target_layout, player_name=None, journal=None,
+                  backup=True, dry_run=False, workers=4, progress=None):
+    """Copy colors across every pair; returns a list of BatchResult for the target files"""
+    if isinstance(source_layout, str):
+        source_layout = get_layout(source_layout)
+    if isinstance(target_layout, str):
+        target_layout = get_layout(target_layout)
+
+    def plan(pair):
+        try:
+            return pair, plan_conversion(pair, source_layout, target_layout, player_name), None
+        except (OSError, ValueError) as e:
+            return pair, None, str(e)
+
+    # Plan everything first so scan failures are reported before anything is written
+    plans, results = [], []
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="convert") as executor:
+        for pair, file_plan, error in executor.map(plan, pairs):
+            if error:
+                result = batch_tools.BatchResult(pair.target, "failed", f"{pair.source}: {error}")
+                results.append(result)
+                if progress:
+                    progress(result)
+            else:
+                plans.append(file_plan)
+
+    if dry_run:
+        for file_plan in plans:
+            status = "would-change" if file_plan.deltas else "unchanged"
+            result = batch_tools.BatchResult(file_plan.path, status, f"{len(file_plan.deltas)} slot(s) would change")
+            results.append(result)
+            if progress:
+                progress(result)
+        return results
+
+    return results + batch_tools.apply_batch(plans, journal, backup=backup, progress=progress)
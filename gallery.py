@@ -0,0 +1,235 @@
+import tkinter as tk
+from tkinter import ttk
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from thumbnails import ThumbnailCache
+import batch_tools
+
+# How often the UI thread drains results from the background workers (ms)
+POLL_INTERVAL = 50
+
+# Paths handed from the discovery thread to the UI per batch
+DISCOVERY_BATCH = 256
+
+
+class SaveGallery:
+    """Virtualized grid of swatch thumbnails for every save in a folder"""
+
+    TILE_W = 210
+    TILE_H = 96
+    SWATCH = 36
+
+    def __init__(self, parent, colors, folder, on_open=None, cache=None, workers=4):
+        self.colors = colors
+        self.folder = folder
+        self.on_open = on_open
+        self.cache = cache or ThumbnailCache()
+        self.paths = []
+        self.thumbs = {}          # path -> Thumbnail, filled as workers finish
+        self.wanted = set()       # paths on or near the screen that still need a thumbnail
+        self.requested = set()
+        self.top_row = 0
+        self.discovering = True
+        self.closed = False
+
+        # Worker threads never touch Tk; they post into these queues for the UI thread
+        self.discovered = queue.Queue()
+        self.finished = queue.Queue()
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="thumbnails")
+
+        self.dialog = tk.Toplevel(parent)
+        self.dialog.title(f"SAVE GALLERY - {folder}")
+        self.dialog.configure(bg=colors['background'], highlightbackground=colors['yellow'], highlightthickness=3)
+        self.dialog.geometry("920x640")
+        self.dialog.protocol("WM_DELETE_WINDOW", self.close)
+
+        header = tk.Frame(self.dialog, bg=colors['background'], padx=10, pady=8)
+        header.pack(fill=tk.X)
+        self.status_var = tk.StringVar(value="SCANNING FOLDER...")
+        tk.Label(header, textvariable=self.status_var, bg=colors['background'], fg=colors['orange'],
+               font=('Impact', 14), anchor=tk.W).pack(side=tk.LEFT, fill=tk.X, expand=True)
+        if on_open:
+            tk.Label(header, text="DOUBLE-CLICK A SAVE TO EDIT IT", bg=colors['background'],
+                   fg=colors['yellow'], font=('Impact', 12)).pack(side=tk.RIGHT)
+
+        body = tk.Frame(self.dialog, bg=colors['background'], padx=10)
+        body.pack(fill=tk.BOTH, expand=True, pady=(0, 10))
+        self.scrollbar = ttk.Scrollbar(body, orient=tk.VERTICAL, command=self.on_scrollbar)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.canvas = tk.Canvas(body, bg=colors['input_bg'], highlightthickness=0)
+        self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+        self.canvas.bind("<Configure>", lambda e: self.redraw())
+        self.canvas.bind("<MouseWheel>", lambda e: self.scroll_rows(-1 if e.delta > 0 else 1))
+        self.canvas.bind("<Button-4>", lambda e: self.scroll_rows(-1))
+        self.canvas.bind("<Button-5>", lambda e: self.scroll_rows(1))
+        self.canvas.bind("<Double-Button-1>", self.on_double_click)
+        self.dialog.bind("<Prior>", lambda e: self.scroll_rows(-self.visible_rows()))
+        self.dialog.bind("<Next>", lambda e: self.scroll_rows(self.visible_rows()))
+
+        threading.Thread(target=self._discover, daemon=True).start()
+        self.dialog.after(POLL_INTERVAL, self.poll)
+
+    # Background work -------------------------------------------------------
+
+    def _discover(self):
+        """Walk the folder and hand paths to the UI in batches so the first screen shows early"""
+        batch = []
+        for path in batch_tools.expand_paths([self.folder]):
+            if self.closed:
+                return
+            batch.append(path)
+            if len(batch) >= DISCOVERY_BATCH:
+                self.discovered.put(batch)
+                batch = []
+        self.discovered.put(batch)
+        self.discovered.put(None)
+
+    def _load_thumbnail(self, path):
+        """Worker: skip paths scrolled away from while queued, otherwise hit the cache"""
+        if self.closed or path not in self.wanted:
+            self.finished.put((path, None))
+            return
+        self.finished.put((path, self.cache.get_or_compute(path)))
+
+    def poll(self):
+        """Drain worker results on the UI thread and redraw if anything changed"""
+        if self.closed:
+            return
+        changed = False
+        while True:
+            try:
+                batch = self.discovered.get_nowait()
+            except queue.Empty:
+                break
+            if batch is None:
+                self.discovering = False
+            else:
+                self.paths.extend(batch)
+            changed = True
+        while True:
+            try:
+                path, thumb = self.finished.get_nowait()
+            except queue.Empty:
+                break
+            self.requested.discard(path)
+            if thumb is not None:
+                self.thumbs[path] = thumb
+                self.wanted.discard(path)
+            changed = True
+        if changed:
+            self.redraw()
+            self.update_status()
+        self.dialog.after(POLL_INTERVAL, self.poll)
+
+    def update_status(self):
+        found = len(self.paths)
+        suffix = " (SCANNING...)" if self.discovering else ""
+        self.status_var.set(f"{found} SAVES{suffix} - {len(self.thumbs)} THUMBNAILS READY")
+
+    # Layout and scrolling --------------------------------------------------
+
+    def columns(self):
+        return max(1, self.canvas.winfo_width() // self.TILE_W)
+
+    def visible_rows(self):
+        return max(1, self.canvas.winfo_height() // self.TILE_H + 1)
+
+    def total_rows(self):
+        return max(1, -(-len(self.paths) // self.columns()))
+
+    def scroll_rows(self, delta):
+        max_top = max(0, self.total_rows() - self.visible_rows() + 1)
+        self.top_row = max(0, min(self.top_row + delta, max_top))
+        self.redraw()
+
+    def on_scrollbar(self, action, *args):
+        if action == "moveto":
+            self.top_row = int(float(args[0]) * self.total_rows())
+            self.scroll_rows(0)
+        elif action == "scroll":
+            amount = int(args[0])
+            self.scroll_rows(amount * self.visible_rows() if args[1] == "pages" else amount)
+
+    def index_at(self, x, y):
+        col = x // self.TILE_W
+        if col >= self.columns():
+            return None
+        index = (self.top_row + y // self.TILE_H) * self.columns() + col
+        return index if index < len(self.paths) else None
+
+    # Drawing ---------------------------------------------------------------
+
+    def redraw(self):
+        """Draw only the tiles on screen and queue thumbnails for them and the next screen"""
+        canvas = self.canvas
+        canvas.delete("all")
+        cols = self.columns()
+        rows = self.visible_rows()
+        first = self.top_row * cols
+        last = min(len(self.paths), first + rows * cols)
+
+        for index in range(first, last):
+            row, col = divmod(index - first, cols)
+            self.draw_tile(index, col * self.TILE_W, row * self.TILE_H)
+
+        # Only the current and next screen are wanted; anything queued for rows the user
+        # scrolled past is skipped by the workers
+        ahead = self.paths[first:last + rows * cols]
+        self.wanted = {path for path in ahead if path not in self.thumbs}
+        for path in ahead:
+            if path in self.wanted and path not in self.requested:
+                self.requested.add(path)
+                self.executor.submit(self._load_thumbnail, path)
+
+        total = self.total_rows()
+        self.scrollbar.set(self.top_row / total, min(1.0, (self.top_row + rows) / total))
+
+    def draw_tile(self, index, x, y):
+        canvas = self.canvas
+        path = self.paths[index]
+        thumb = self.thumbs.get(path)
+        canvas.create_rectangle(x + 4, y + 4, x + self.TILE_W - 4, y + self.TILE_H - 4,
+                                outline=self.colors['border'], fill=self.colors['background'], width=2)
+        canvas.create_text(x + 12, y + 10, text=os.path.basename(path), anchor=tk.NW,
+                           fill=self.colors['yellow'], font=('Impact', 11), width=self.TILE_W - 24)
+        swatch_y = y + 40
+        if thumb is None:
+            canvas.create_text(x + 12, swatch_y + 8, text="LOADING...", anchor=tk.NW,
+                               fill=self.colors['foreground'], font=('Impact', 11))
+        elif thumb.error:
+            canvas.create_text(x + 12, swatch_y + 8, text=thumb.error.upper(), anchor=tk.NW,
+                               fill=self.colors['orange'], font=('Impact', 10), width=self.TILE_W - 24)
+        else:
+            for i, color in enumerate(thumb.colors):
+                sx = x + 12 + i * (self.SWATCH + 8)
+                canvas.create_rectangle(sx, swatch_y, sx + self.SWATCH, swatch_y + self.SWATCH,
+                                        fill=color, outline=self.colors['border'], width=2)
+            canvas.create_text(x + self.TILE_W - 12, swatch_y + self.SWATCH, text=thumb.layout_key.upper(),
+                               anchor=tk.SE, fill=self.colors['foreground'], font=('Impact', 10))
+
+    # Events ----------------------------------------------------------------
+
+    def on_double_click(self, event):
+        index = self.index_at(event.x, event.y)
+        if index is None or not self.on_open:
+            return
+        path = self.paths[index]
+        thumb = self.thumbs.get(path)
+        # Opening an editor replaces the launcher window, so stop the workers first
+        self.close()
+        self.on_open(path, thumb.layout_key if thumb and not thumb.error else None)
+
+    def close(self):
+        """Stop the workers and close the cache without blocking the UI"""
+        self.closed = True
+        self.dialog.destroy()
+
+        def shutdown():
+            self.executor.shutdown(wait=True, cancel_futures=True)
+            self.cache.close()
+
+        threading.Thread(target=shutdown, daemon=True).start()
@@ -0,0 +1,423 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from save_formats import get_layout
+import save_io
+
+# Largest save accepted by upload, in bytes
+MAX_UPLOAD_SIZE = 64 * 1024 * 1024
+
+
+class HTTPError(Exception):
+    """Error that maps directly to an HTTP status code and JSON message"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class CachedSave:
+    """A parsed save held by the service, addressed by the SHA-256 of its content and path
+
+    Files with identical bytes get separate ids, so writing one back never patches the other.
+    """
+
+    def __init__(self, data, path=None, fingerprint=None):
+        self.data = bytes(data)
+        self.content_hash = save_io.content_hash(self.data)
+        if path:
+            self.id = hashlib.sha256(f"{self.content_hash}:{path}".encode('utf-8')).hexdigest()
+        else:
+            self.id = self.content_hash
+        self.path = path
+        self.fingerprint = fingerprint
+        self.scans = {}        # (layout key, name or None) -> scan result dict
+        self.lock = threading.Lock()
+
+
+class SaveCache:
+    """Thread-safe LRU cache of CachedSave objects keyed by content hash and path"""
+
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def add(self, save):
+        """Insert a save, returning the already cached copy if this content at this path is known"""
+        with self.lock:
+            existing = self.entries.get(save.id)
+            if existing is not None:
+                self.entries.move_to_end(save.id)
+                self.hits += 1
+                if save.path:
+                    # Same bytes, but the file may have been rewritten since it was cached
+                    existing.fingerprint = save.fingerprint
+                return existing
+            self.misses += 1
+            self.entries[save.id] = save
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+            return save
+
+    def get(self, save_id):
+        """Return a cached save or raise a 404"""
+        with self.lock:
+            save = self.entries.get(save_id)
+            if save is None:
+                raise HTTPError(404, f"Unknown save id '{save_id}'")
+            self.entries.move_to_end(save_id)
+            return save
+
+    def stats(self):
+        with self.lock:
+            return {"entries": len(self.entries), "max_entries": self.max_entries,
+                    "hits": self.hits, "misses": self.misses}
+
+
+class LatencyMetrics:
+    """Per-route request counts and latency percentiles over a sliding window"""
+
+    def __init__(self, window=1024):
+        self.window = window
+        self.routes = {}
+        self.lock = threading.Lock()
+
+    def record(self, route, status, seconds):
+        with self.lock:
+            entry = self.routes.setdefault(route, {"count": 0, "errors": 0, "samples": deque(maxlen=self.window)})
+            entry["count"] += 1
+            if status >= 400:
+                entry["errors"] += 1
+            entry["samples"].append(seconds)
+
+    def snapshot(self):
+        """Return the metrics as a JSON-serialisable dict with latencies in milliseconds"""
+        with self.lock:
+            result = {}
+            for route, entry in self.routes.items():
+                samples = sorted(entry["samples"])
+                pick = lambda q: samples[min(len(samples) - 1, int(q * len(samples)))] * 1000 if samples else 0.0
+                result[route] = {
+                    "count": entry["count"],
+                    "errors": entry["errors"],
+                    "p50_ms": round(pick(0.50), 3),
+                    "p95_ms": round(pick(0.95), 3),
+                    "max_ms": round(samples[-1] * 1000, 3) if samples else 0.0,
+                }
+            return result
+
+
+class SaveService:
+    """Request handling logic, independent of the HTTP transport"""
+
+    def __init__(self, cache_size=64, allowed_root=None):
+        self.cache = SaveCache(cache_size)
+        self.metrics = LatencyMetrics()
+        self.allowed_root = os.path.realpath(allowed_root) if allowed_root else None
+
+    # Loading ---------------------------------------------------------------
+
+    def load_path(self, path):
+        """Load a save from disk into the cache"""
+        real_path = os.path.realpath(path)
+        if self.allowed_root and os.path.commonpath([real_path, self.allowed_root]) != self.allowed_root:
+            raise HTTPError(403, f"Path '{path}' is outside the served folder")
+        try:
+            data, fp = save_io.read_save(real_path)
+        except OSError as e:
+            raise HTTPError(404, f"Cannot read '{path}': {e.strerror}")
+        return self.cache.add(CachedSave(data, real_path, fp))
+
+    def load_upload(self, data):
+        """Load an uploaded save body into the cache"""
+        if not data:
+            raise HTTPError(400, "Empty upload")
+        return self.cache.add(CachedSave(data))
+
+    # Queries ---------------------------------------------------------------
+
+    @staticmethod
+    def _layout(params):
+        key = params.get("layout")
+        if not key:
+            raise HTTPError(400, "Missing 'layout' parameter")
+        try:
+            return get_layout(key)
+        except ValueError as e:
+            raise HTTPError(400, str(e))
+
+    def scan(self, save, params):
+        """Scan a save by character name, or by block structure when no name is given"""
+        layout = self._layout(params)
+        name = params.get("name") or None
+        key = (layout.key, name.lower() if name else None)
+
+        with save.lock:
+            cached = save.scans.get(key)
+        if cached is not None:
+            return cached
+
+        if name:
+            try:
+                color_start = layout.scan(save.data, name)
+            except ValueError as e:
+                raise HTTPError(422, str(e))
+            result = {
+                "layout": layout.key,
+                "name": name,
+                "color_start": color_start,
+                "offsets": layout.slot_positions(color_start),
+                "colors": layout.decode_block(save.data, color_start),
+            }
+        else:
+            # The structural pattern only matches complete blocks, so every start decodes
+            starts = layout.find_blocks(save.data)
+            decoded = layout.decode_blocks(save.data, starts)
+            result = {
+                "layout": layout.key,
+                "blocks": [{"color_start": start, "offsets": layout.slot_positions(start), "colors": colors}
+                           for start, (colors, _) in zip(starts, decoded)],
+            }
+
+        with save.lock:
+            save.scans[key] = result
+        return result
+
+    def colors(self, save, params):
+        """Decode the color block at an explicit offset"""
+        layout = self._layout(params)
+        try:
+            color_start = int(params.get("color_start", ""), 0)
+        except ValueError:
+            raise HTTPError(400, "Missing or invalid 'color_start' parameter")
+        if color_start < 0 or color_start + layout.block_size > len(save.data):
+            raise HTTPError(422, f"Color block at {color_start:X} lies outside the save")
+        return {
+            "layout": layout.key,
+            "color_start": color_start,
+            "offsets": layout.slot_positions(color_start),
+            "colors": layout.decode_block(save.data, color_start),
+            "separators_ok": layout.check_separators(save.data, color_start),
+        }
+
+    @staticmethod
+    def _color_start(value, layout, save):
+        """Parse a block offset given as a number or a string such as "0x1A2B" and check it fits"""
+        try:
+            if isinstance(value, bool) or not isinstance(value, (int, str)):
+                raise ValueError
+            color_start = value if isinstance(value, int) else int(value, 0)
+        except ValueError:
+            raise HTTPError(400, "'color_start' must be a non-negative integer")
+        if color_start < 0 or color_start + layout.block_size > len(save.data):
+            raise HTTPError(400, f"Color block at {color_start:X} lies outside the save")
+        return color_start
+
+    def patch(self, save, body):
+        """Apply new colors to a save, returning the patched copy and optionally writing it to disk"""
+        layout = self._layout(body)
+        hex_colors = body.get("colors") or {}
+        if not hex_colors:
+            raise HTTPError(400, "Missing 'colors' object")
+
+        if "color_start" in body:
+            color_start = self._color_start(body["color_start"], layout, save)
+        elif body.get("name"):
+            color_start = self.scan(save, {"layout": layout.key, "name": body["name"]})["color_start"]
+        else:
+            raise HTTPError(400, "Give either 'name' or 'color_start'")
+
+        try:
+            patches = layout.encode_patches(color_start, hex_colors)
+        except (KeyError, ValueError) as e:
+            raise HTTPError(400, f"Invalid colors: {e}")
+        if not patches or color_start + layout.block_size > len(save.data):
+            raise HTTPError(422, "Nothing to patch at that offset")
+
+        patched = bytearray(save.data)
+        expected = save_io.expected_bytes(patched, patches)
+        for offset, new in patches:
+            patched[offset:offset + len(new)] = new
+
+        written = False
+        if body.get("write"):
+            if not save.path:
+                raise HTTPError(409, "Only saves loaded by path can be written back")
+            try:
+                fp = save_io.patch_file(save.path, patches, expected, save.fingerprint)
+            except save_io.ConflictError as e:
+                raise HTTPError(409, str(e))
+            written = True
+            result_save = self.cache.add(CachedSave(patched, save.path, fp))
+        else:
+            result_save = self.cache.add(CachedSave(patched))
+
+        return {
+            "id": result_save.id,
+            "written": written,
+            "patches": [{"offset": offset, "bytes": new.hex().upper()} for offset, new in patches],
+        }
+
+    def describe(self, save):
+        return {"id": save.id, "size": len(save.data), "path": save.path}
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    """Routes HTTP requests to the SaveService attached to the server"""
+
+    server_version = "BorderlandsColorEditor/1.5"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_bytes(self, data):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_body(self):
+        # Digits only: a negative length would make rfile.read wait for the client to hang up
+        value = (self.headers.get("Content-Length") or "0").strip()
+        if not (value.isascii() and value.isdigit()):
+            raise HTTPError(400, "Invalid Content-Length header")
+        length = int(value)
+        if length > MAX_UPLOAD_SIZE:
+            raise HTTPError(413, "Upload too large")
+        return self.rfile.read(length) if length else b""
+
+    def _read_json(self):
+        try:
+            return json.loads(self._read_body() or b"{}")
+        except json.JSONDecodeError as e:
+            raise HTTPError(400, f"Invalid JSON body: {e}")
+
+    def _dispatch(self, method):
+        service = self.server.service
+        url = urlparse(self.path)
+        parts = [p for p in url.path.split("/") if p]
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        route = f"{method} /" + "/".join(parts[:1] + (["{id}"] + parts[2:] if len(parts) > 1 else []))
+        started = time.perf_counter()
+        status = 200
+        try:
+            if method == "GET" and parts == ["health"]:
+                result = {"status": "ok"}
+            elif method == "GET" and parts == ["metrics"]:
+                result = {"routes": service.metrics.snapshot(), "cache": service.cache.stats(),
+                          "workers": self.server.max_workers}
+            elif method == "POST" and parts == ["saves"]:
+                if (self.headers.get("Content-Type") or "").startswith("application/json"):
+                    body = self._read_json()
+                    if not body.get("path"):
+                        raise HTTPError(400, "JSON body needs a 'path'")
+                    save = service.load_path(body["path"])
+                else:
+                    save = service.load_upload(self._read_body())
+                status = 201
+                result = service.describe(save)
+            elif len(parts) >= 2 and parts[0] == "saves":
+                save = service.cache.get(parts[1])
+                action = parts[2] if len(parts) > 2 else None
+                if method == "GET" and action is None:
+                    result = service.describe(save)
+                elif method == "GET" and action == "data":
+                    self._send_bytes(save.data)
+                    return
+                elif method == "GET" and action == "scan":
+                    result = service.scan(save, params)
+                elif method == "GET" and action == "colors":
+                    result = service.colors(save, params)
+                elif method == "POST" and action == "patch":
+                    result = service.patch(save, self._read_json())
+                else:
+                    raise HTTPError(404, "Unknown endpoint")
+            else:
+                raise HTTPError(404, "Unknown endpoint")
+            self._send_json(status, result)
+        except HTTPError as e:
+            status = e.status
+            self._send_json(e.status, {"error": e.message})
+        except Exception as e:
+            status = 500
+            self._send_json(500, {"error": str(e)})
+        finally:
+            service.metrics.record(route, status, time.perf_counter() - started)
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+
+class SaveHTTPServer(HTTPServer):
+    """HTTP server that hands each connection to a bounded worker pool"""
+
+    daemon_threads = True
+
+    def __init__(self, address, service, max_workers=4, backlog=16, verbose=False):
+        super().__init__(address, _RequestHandler)
+        self.service = service
+        self.verbose = verbose
+        self.max_workers = max_workers
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="save-http")
+        # Accepting blocks once this many requests are running or queued, pushing back on clients
+        self.slots = threading.BoundedSemaphore(max_workers + backlog)
+
+    def process_request(self, request, client_address):
+        self.slots.acquire()
+        self.executor.submit(self._process, request, client_address)
+
+    def _process(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            self.slots.release()
+
+    def server_close(self):
+        super().server_close()
+        self.executor.shutdown(wait=True)
+
+
+def create_server(host="127.0.0.1", port=8765, workers=4, cache_size=64, allowed_root=None, verbose=False):
+    """Create a SaveHTTPServer; use port 0 to pick a free port (see server.server_address)"""
+    service = SaveService(cache_size=cache_size, allowed_root=allowed_root)
+    return SaveHTTPServer((host, port), service, max_workers=workers, verbose=verbose)
+
+
+def serve_forever(host="127.0.0.1", port=8765, workers=4, cache_size=64, allowed_root=None, verbose=True):
+    """Run the service until interrupted"""
+    server = create_server(host, port, workers, cache_size, allowed_root, verbose)
+    print(f"Serving save API on http://{server.server_address[0]}:{server.server_address[1]} "
+          f"with {workers} worker(s)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -1,14 +1,16 @@
 import tkinter as tk
-from tkinter import ttk
+from tkinter import ttk, filedialog
 import os
 import importlib
 import sys
+import session_restore
+import single_instance
 
 class BorderlandsLauncher:
     def __init__(self, root):
         self.root = root
         self.root.title("Borderlands Color Editor | Made by: Jasper_Zebra | Version 1.5")
-        self.root.geometry("600x350")
+        self.root.geometry("600x440")
         self.root.resizable(False, False)
         
         # Set application icon
@@ -19,11 +21,17 @@ class BorderlandsLauncher:
         except Exception as e:
             print(f"Failed to load icon: {e}")
         
+        # Read the last session's save in the background while the window draws
+        session_restore.start_prefetch()
+        
         # Setup theme
         self.setup_theme(root)
         
         # Create UI
         self.create_ui()
+        
+        # Files opened by later launches come to this window while it is showing
+        single_instance.attach(self.root, self.open_paths)
     
     def setup_theme(self, root):
         """Setup Borderlands-inspired theme"""
@@ -147,36 +155,97 @@ class BorderlandsLauncher:
                            style='Platform.TButton',
                            command=self.launch_pc_editor)
         pc_button.pack(side=tk.RIGHT, expand=True, fill=tk.X, padx=10, pady=10)
+        
+        # Library gallery button
+        gallery_button = ttk.Button(main_frame, 
+                                text="BROWSE SAVE LIBRARY", 
+                                command=self.open_gallery)
+        gallery_button.pack(fill=tk.X, padx=50, pady=(10, 0))
+    
+    def open_gallery(self):
+        """Show swatch thumbnails for every save in a folder"""
+        folder = filedialog.askdirectory(title="Select Folder Of Borderlands Saves")
+        if not folder:
+            return
+        import gallery
+        gallery.SaveGallery(self.root, self.colors, folder, on_open=self.open_from_gallery)
+    
+    def open_from_gallery(self, file_path, layout_key):
+        """Open a gallery save in the editor matching its detected layout"""
+        if layout_key == "pc":
+            self.launch_pc_editor([file_path])
+        else:
+            self.launch_xbox_editor([file_path])
     
-    def launch_xbox_editor(self):
+    def open_paths(self, file_paths):
+        """Open saves passed on the command line or handed over by a later launch"""
+        if not file_paths:
+            single_instance.bring_to_front(self.root)
+            return
+        if self.detect_layout_key(file_paths[0]) == "pc":
+            self.launch_pc_editor(file_paths)
+        else:
+            self.launch_xbox_editor(file_paths)
+    
+    def detect_layout_key(self, file_path):
+        """Guess a save's platform from the first layout that finds a color block"""
+        import save_session
+        layout_keys = save_session.matching_layouts(file_path)
+        return layout_keys[0] if layout_keys else None
+    
+    def launch_xbox_editor(self, file_paths=()):
         """Launch the Xbox 360 version of the color editor"""
         self.root.destroy()  # Close launcher
         
+        # Without files to open, pick up the last save this editor worked on
+        if not file_paths:
+            file_paths = session_restore.resume_paths("xbox360")
+        
         # Import and run the Xbox editor
         try:
             import xbox_editor
             root = tk.Tk()
             app = xbox_editor.XboxColorEditor(root)
+            single_instance.attach(root, app.open_paths)
+            if file_paths:
+                root.after_idle(app.open_paths, list(file_paths))
             root.mainloop()
         except ImportError:
             print("Error: Could not import xbox_editor.py")
             sys.exit(1)
     
-    def launch_pc_editor(self):
+    def launch_pc_editor(self, file_paths=()):
         """Launch the PC version of the color editor"""
         self.root.destroy()  # Close launcher
         
+        # Without files to open, pick up the last save this editor worked on
+        if not file_paths:
+            file_paths = session_restore.resume_paths("pc")
+        
         # Import and run the PC editor
         try:
             import pc_editor
             root = tk.Tk()
             app = pc_editor.PCColorEditor(root)
+            single_instance.attach(root, app.open_paths)
+            if file_paths:
+                root.after_idle(app.open_paths, list(file_paths))
             root.mainloop()
         except ImportError:
             print("Error: Could not import pc_editor.py")
             sys.exit(1)
 
 if __name__ == "__main__":
+    # A second launch hands its files to the running editor and exits before creating a window
+    paths = [os.path.abspath(path) for path in sys.argv[1:]]
+    if single_instance.hand_off(paths):
+        sys.exit(0)
+    if single_instance.start_server() is None and single_instance.hand_off(paths):
+        # Another launch became the running editor while this one was starting
+        sys.exit(0)
+    
     root = tk.Tk()
     app = BorderlandsLauncher(root)
+    if paths:
+        root.after_idle(app.open_paths, paths)
     root.mainloop()
\ No newline at end of file
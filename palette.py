@@ -0,0 +1,216 @@
+import hashlib
+import json
+import os
+import random
+from collections import Counter, OrderedDict
+
+import save_io
+
+# Pixels sampled from an image on an even grid; enough for three dominant colors
+SAMPLE_PIXELS = 4096
+
+KMEANS_ITERATIONS = 25
+
+# Most distinct points clustered; busier images are merged into coarser RGB bins first,
+# since pure-Python k-means costs roughly 0.1 ms per point
+MAX_POINTS = 512
+
+# In-memory schemes kept per image hash; the disk cache keeps all of them
+MEMORY_ENTRIES = 64
+
+CACHE_FILENAME = "palettes.json"
+
+_memory_cache = OrderedDict()
+
+# sRGB byte -> linear light, computed once so conversion is a table lookup per channel
+_LINEAR = [(c / 255 / 12.92) if c <= 10 else ((c / 255 + 0.055) / 1.055) ** 2.4 for c in range(256)]
+
+# D65 white point
+_XN, _YN, _ZN = 0.95047, 1.0, 1.08883
+
+
+def _f(t):
+    return t ** (1 / 3) if t > 0.008856 else 7.787 * t + 16 / 116
+
+
+def _f_inv(t):
+    return t ** 3 if t > 0.206893 else (t - 16 / 116) / 7.787
+
+
+def rgb_to_lab(rgb):
+    """Convert an (r, g, b) byte tuple to CIE L*a*b*"""
+    r, g, b = (_LINEAR[c] for c in rgb)
+    x = _f((0.4124 * r + 0.3576 * g + 0.1805 * b) / _XN)
+    y = _f((0.2126 * r + 0.7152 * g + 0.0722 * b) / _YN)
+    z = _f((0.0193 * r + 0.1192 * g + 0.9505 * b) / _ZN)
+    return (116 * y - 16, 500 * (x - y), 200 * (y - z))
+
+
+def lab_to_hex(lab):
+    """Convert CIE L*a*b* back to '#RRGGBB', clamping out-of-gamut values"""
+    l, a, b = lab
+    fy = (l + 16) / 116
+    x = _XN * _f_inv(fy + a / 500)
+    y = _YN * _f_inv(fy)
+    z = _ZN * _f_inv(fy - b / 200)
+    linear = (3.2406 * x - 1.5372 * y - 0.4986 * z,
+              -0.9689 * x + 1.8758 * y + 0.0415 * z,
+              0.0557 * x - 0.2040 * y + 1.0570 * z)
+    channels = []
+    for c in linear:
+        c = max(0.0, min(1.0, c))
+        c = 12.92 * c if c <= 0.0031308 else 1.055 * c ** (1 / 2.4) - 0.055
+        channels.append(round(c * 255))
+    return "#{:02X}{:02X}{:02X}".format(*channels)
+
+
+def kmeans(points, weights, k=3, iterations=KMEANS_ITERATIONS, seed=0):
+    """Weighted k-means over 3-D points; returns [(centroid, total weight)] by weight, largest first"""
+    if not points:
+        return []
+    k = min(k, len(points))
+    rng = random.Random(seed)
+
+    def dist2(p, c):
+        return (p[0] - c[0]) ** 2 + (p[1] - c[1]) ** 2 + (p[2] - c[2]) ** 2
+
+    # k-means++ seeding: each new centroid is drawn in proportion to its distance from the others
+    centroids = [points[rng.choices(range(len(points)), weights)[0]]]
+    nearest = [dist2(p, centroids[0]) for p in points]
+    while len(centroids) < k:
+        scores = [d * w for d, w in zip(nearest, weights)]
+        if not any(scores):
+            break
+        centroids.append(points[rng.choices(range(len(points)), scores)[0]])
+        nearest = [min(d, dist2(p, centroids[-1])) for d, p in zip(nearest, points)]
+
+    assignment = None
+    for _ in range(iterations):
+        # One distance column per centroid, then the nearest centroid per point
+        columns = [[(p[0] - c[0]) ** 2 + (p[1] - c[1]) ** 2 + (p[2] - c[2]) ** 2 for p in points]
+                   for c in centroids]
+        new_assignment = [row.index(min(row)) for row in zip(*columns)]
+        if new_assignment == assignment:
+            break
+        assignment = new_assignment
+        sums = [[0.0, 0.0, 0.0, 0.0] for _ in centroids]
+        for p, w, i in zip(points, weights, assignment):
+            s = sums[i]
+            s[0] += p[0] * w
+            s[1] += p[1] * w
+            s[2] += p[2] * w
+            s[3] += w
+        centroids = [(s[0] / s[3], s[1] / s[3], s[2] / s[3]) if s[3] else c
+                     for s, c in zip(sums, centroids)]
+
+    totals = [0] * len(centroids)
+    for w, i in zip(weights, assignment):
+        totals[i] += w
+    return sorted(zip(centroids, totals), key=lambda item: -item[1])
+
+
+def sample_photo(photo, samples=SAMPLE_PIXELS):
+    """Read about samples opaque pixels from a tk.PhotoImage on an even grid"""
+    width, height = photo.width(), photo.height()
+    step = max(1, int((width * height / samples) ** 0.5))
+    pixels = []
+    for y in range(step // 2, height, step):
+        for x in range(step // 2, width, step):
+            if photo.transparency_get(x, y):
+                continue
+            pixels.append(tuple(photo.get(x, y)))
+    return pixels
+
+
+def merge_pixels(pixels, max_points=MAX_POINTS):
+    """Merge pixels into weighted colors: identical ones first, then coarser RGB bins
+
+    Returns a Counter of (r, g, b) to pixel count with at most max_points entries; each
+    binned color is the mean of the pixels in its bin, not the bin's corner.
+    """
+    counts = Counter(pixels)
+    shift = 0
+    merged = counts
+    while len(merged) > max_points and shift < 7:
+        shift += 1
+        sums = {}
+        for (r, g, b), n in counts.items():
+            s = sums.setdefault((r >> shift, g >> shift, b >> shift), [0, 0, 0, 0])
+            s[0] += r * n
+            s[1] += g * n
+            s[2] += b * n
+            s[3] += n
+        merged = Counter()
+        for r, g, b, n in sums.values():
+            merged[(round(r / n), round(g / n), round(b / n))] += n
+    return merged
+
+
+def scheme_from_pixels(pixels, k=3, seed=0):
+    """Cluster pixels in L*a*b* space and return k '#RRGGBB' colors, most dominant first"""
+    # Identical pixels are clustered once with a weight; flat artwork collapses to a few points
+    counts = merge_pixels(pixels)
+    points = [rgb_to_lab(rgb) for rgb in counts]
+    clusters = kmeans(points, list(counts.values()), k, seed=seed)
+    scheme = [lab_to_hex(centroid) for centroid, _ in clusters]
+    # Images with fewer distinct colors than slots repeat the dominant color
+    while scheme and len(scheme) < k:
+        scheme.append(scheme[0])
+    return scheme
+
+
+def _cache_path():
+    return os.path.join(save_io.app_data_dir(), CACHE_FILENAME)
+
+
+def _load_disk_cache():
+    try:
+        with open(_cache_path(), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _remember(key, scheme, persist):
+    _memory_cache[key] = scheme
+    _memory_cache.move_to_end(key)
+    while len(_memory_cache) > MEMORY_ENTRIES:
+        _memory_cache.popitem(last=False)
+    if persist:
+        disk = _load_disk_cache()
+        disk[key] = scheme
+        try:
+            with open(_cache_path(), 'w', encoding='utf-8') as f:
+                json.dump(disk, f)
+        except OSError as e:
+            print(f"Failed to write palette cache: {e}")
+
+
+def extract_scheme(image_path, master=None, k=3, samples=SAMPLE_PIXELS):
+    """Return k dominant '#RRGGBB' colors of an image file, cached by the image's SHA-256"""
+    with open(image_path, 'rb') as f:
+        digest = hashlib.sha256(f.read()).hexdigest()
+    key = f"{digest}:{k}:{samples}"
+
+    if key in _memory_cache:
+        _memory_cache.move_to_end(key)
+        return list(_memory_cache[key])
+    disk = _load_disk_cache()
+    if key in disk:
+        _remember(key, disk[key], persist=False)
+        return list(disk[key])
+
+    # Tk decodes PNG, GIF and PPM natively, so no imaging library is needed
+    import tkinter as tk
+    photo = tk.PhotoImage(file=image_path, master=master)
+    try:
+        pixels = sample_photo(photo, samples)
+    finally:
+        photo.blank()
+        del photo
+    if not pixels:
+        raise ValueError("The image has no opaque pixels")
+
+    scheme = scheme_from_pixels(pixels, k)
+    _remember(key, scheme, persist=True)
+    return list(scheme)
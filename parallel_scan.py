@@ -0,0 +1,120 @@
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+from save_formats import get_layout
+
+# Buffers smaller than this are scanned in-process; worker start-up would dominate
+MIN_PARALLEL_SIZE = 4 * 1024 * 1024
+
+# Segments per worker, so a slow segment doesn't leave other cores idle
+SEGMENTS_PER_WORKER = 4
+
+
+class ScanSpec:
+    """Picklable description of what to search for: name occurrences and structural blocks"""
+
+    def __init__(self, layout, player_name=None, ignore_case=True):
+        if isinstance(layout, str):
+            layout = get_layout(layout)
+        self.layout_key = layout.key
+        self.block_pattern = layout.block_regex.pattern
+        self.name_pattern = None
+        if player_name:
+            # Lookahead so overlapping occurrences are all reported, like repeated find(pos + 1)
+            name_bytes = re.escape(player_name.encode('utf-8', errors='replace'))
+            self.name_pattern = b"(?=" + name_bytes + b")"
+            self.name_length = len(player_name.encode('utf-8', errors='replace'))
+        else:
+            self.name_length = 0
+        self.flags = re.DOTALL | (re.IGNORECASE if ignore_case else 0)
+
+        # Hits are owned by the segment containing their offset. A segment reads this far
+        # past its end so matches starting near the end still see the whole name / block...
+        self.forward_overlap = max(self.name_length, layout.block_size)
+        # ...and this far before its start so a block opener straddling the boundary is whole
+        self.backward_overlap = len(layout.marker) + len(layout.name_terminator) + 2 * self.name_length + 8
+
+
+def _scan_range(view, spec, start, end):
+    """Scan view and return (name_hits, block_hits) whose offsets fall in [start, end)"""
+    length = len(view)
+    window_start = max(0, start - spec.backward_overlap)
+    window_end = min(length, end + spec.forward_overlap)
+
+    name_hits = []
+    if spec.name_pattern:
+        name_regex = re.compile(spec.name_pattern, spec.flags)
+        for match in name_regex.finditer(view, start, window_end):
+            pos = match.start()
+            if pos >= end:
+                break
+            name_hits.append(pos)
+
+    # The structural pattern is case sensitive; it matches raw marker and separator bytes
+    block_regex = re.compile(spec.block_pattern, re.DOTALL)
+    block_hits = []
+    for match in block_regex.finditer(view, window_start, window_end):
+        color_start = match.end()
+        if color_start >= end:
+            break
+        if color_start >= start:
+            block_hits.append(color_start)
+    return name_hits, block_hits
+
+
+def scan_hits(data, layout, player_name=None, ignore_case=True):
+    """Single-threaded reference scan; returns {'names': [...], 'blocks': [...]} in file order"""
+    spec = ScanSpec(layout, player_name, ignore_case)
+    names, blocks = _scan_range(memoryview(data), spec, 0, len(data))
+    return {"names": names, "blocks": blocks}
+
+
+def _scan_shared_segment(shm_name, length, spec, start, end):
+    """Worker entry point: attach to the shared buffer and scan one segment"""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        view = shm.buf[:length]
+        try:
+            return _scan_range(view, spec, start, end)
+        finally:
+            view.release()
+    finally:
+        shm.close()
+
+
+def plan_segments(length, workers, segment_size=None):
+    """Split [0, length) into contiguous (start, end) segments"""
+    if segment_size is None:
+        segment_size = max(1024 * 1024, -(-length // (workers * SEGMENTS_PER_WORKER)))
+    return [(start, min(start + segment_size, length)) for start in range(0, length, segment_size)]
+
+
+def parallel_scan_hits(data, layout, player_name=None, ignore_case=True, workers=None,
+                       segment_size=None, min_parallel_size=MIN_PARALLEL_SIZE):
+    """Scan one large buffer across processes; results match scan_hits exactly"""
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(data) < min_parallel_size:
+        return scan_hits(data, layout, player_name, ignore_case)
+
+    spec = ScanSpec(layout, player_name, ignore_case)
+    segments = plan_segments(len(data), workers, segment_size)
+
+    # One copy into shared memory; every worker maps the same pages
+    shm = shared_memory.SharedMemory(create=True, size=len(data))
+    try:
+        shm.buf[:len(data)] = data
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(_scan_shared_segment, shm.name, len(data), spec, start, end)
+                       for start, end in segments]
+            names, blocks = [], []
+            # Segments are disjoint and ordered, so concatenating keeps file order
+            for future in futures:
+                seg_names, seg_blocks = future.result()
+                names.extend(seg_names)
+                blocks.extend(seg_blocks)
+    finally:
+        shm.close()
+        shm.unlink()
+    return {"names": names, "blocks": blocks}
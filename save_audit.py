@@ -0,0 +1,190 @@
+import csv
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from save_formats import AmbiguousNameError, get_layout
+import batch_tools
+import save_io
+
+# A backup taken this long before the save's last write would roll back that much play
+STALE_BACKUP_DAYS = 30
+
+# How far past the name XboxColorEditor's extended search looks for the 00 FF marker,
+# and how far past the marker it collects FF bytes for its alternative extraction
+EXTENDED_SEARCH = 50
+ALTERNATIVE_WINDOW = 40
+
+# Status of a save, most serious last
+STATUSES = ("ok", "alternative", "ambiguous", "no-name", "no-block", "truncated", "write-risk", "unreadable")
+
+REPORT_FIELDS = ("path", "status", "message", "size", "name", "color_start", "backup")
+
+
+class AuditResult:
+    """Findings for one save"""
+
+    def __init__(self, path, status, message="", size=0, name=None, color_start=-1, backup="none"):
+        self.path = path
+        self.status = status
+        self.message = message
+        self.size = size
+        self.name = name
+        self.color_start = color_start
+        self.backup = backup          # "none", "ok" or "stale"
+
+    def row(self):
+        return {field: getattr(self, field) for field in REPORT_FIELDS}
+
+    def __repr__(self):
+        return f"AuditResult({self.path!r}, {self.status!r})"
+
+
+def alternative_positions(data, layout, name_pos, name_len):
+    """Slot positions XboxColorEditor's fallback would use, or None if it would give up
+
+    Returns (positions, how) where how says which fallback was needed. A slot the fallback
+    cannot place keeps position 0, so a save would write color bytes over the file header.
+    """
+    name_end = name_pos + name_len
+    color_start = layout.locate_block(data, name_pos, name_len)
+    how = "alternative extraction"
+    if color_start == -1:
+        marker_pos = data.find(layout.marker, name_end, min(name_end + EXTENDED_SEARCH, len(data) - 15))
+        if marker_pos == -1:
+            return None, None
+        color_start = marker_pos + len(layout.marker)
+        if layout.check_separators(data, color_start):
+            return layout.slot_positions(color_start), "marker found only by the extended search"
+        how = "extended search and alternative extraction"
+
+    marker_pos = color_start - len(layout.marker)
+    window_end = min(marker_pos + ALTERNATIVE_WINDOW, len(data))
+    ff_positions = [i for i in range(color_start, window_end) if data[i] == 0xFF]
+    if len(ff_positions) < 2:
+        return None, None
+    positions = {}
+    for slot, pos in zip(layout.slot_names, (color_start, ff_positions[0] + 1, ff_positions[1] + 1)):
+        positions[slot] = pos if pos + 3 <= len(data) else 0
+    return positions, how
+
+
+def backup_status(path, save_mtime_ns, stale_days=STALE_BACKUP_DAYS):
+    try:
+        backup_mtime_ns = os.stat(f"{path}.bak").st_mtime_ns
+    except OSError:
+        return "none"
+    return "stale" if save_mtime_ns - backup_mtime_ns > stale_days * 86400 * 10 ** 9 else "ok"
+
+
+def audit_file(path, layout_key, player_name=None, stale_days=STALE_BACKUP_DAYS):
+    """Check one save the way the editors would scan it; returns an AuditResult"""
+    layout = get_layout(layout_key)
+    try:
+        data, (size, mtime_ns) = save_io.read_save(path)
+    except OSError as e:
+        return AuditResult(path, "unreadable", e.strerror or str(e))
+    backup = backup_status(path, mtime_ns, stale_days)
+
+    name = player_name
+    if name is None:
+        candidates = layout.name_candidates(data)
+        if not candidates:
+            return AuditResult(path, "no-name", "No character name candidates", size, backup=backup)
+        name = candidates[0].name
+
+    try:
+        hit = layout.best_name_hit(data, name)
+    except AmbiguousNameError as e:
+        return AuditResult(path, "ambiguous", str(e), size, name, backup=backup)
+    if hit is None:
+        return AuditResult(path, "no-name", f"'{name}' not found", size, name, backup=backup)
+    if hit.valid:
+        return AuditResult(path, "ok", "", size, name, hit.color_start, backup)
+    # Only the Xbox editor has a fallback; without a marker there is nothing more to try
+    if layout.marker:
+        positions, how = alternative_positions(data, layout, hit.name_pos, hit.name_len)
+        if positions is not None:
+            start = positions[layout.slot_names[0]]
+            if not all(positions.values()):
+                missing = ", ".join(slot for slot, pos in positions.items() if not pos)
+                return AuditResult(path, "write-risk",
+                                   f"Fallback leaves {missing} at offset 0; saving would overwrite the file header",
+                                   size, name, start, backup)
+            return AuditResult(path, "alternative", how.capitalize(), size, name, start, backup)
+    if hit.color_start != -1 and hit.color_start + layout.block_size > len(data):
+        return AuditResult(path, "truncated", f"Color block at {hit.color_start:X} runs past the end of the file",
+                           size, name, hit.color_start, backup)
+    if hit.color_start == -1:
+        return AuditResult(path, "no-block", f"No color block after '{name}'", size, name, backup=backup)
+    return AuditResult(path, "no-block", f"Block at {hit.color_start:X} is missing its separators",
+                       size, name, hit.color_start, backup)
+
+
+def _audit_args(args):
+    return audit_file(*args)
+
+
+def leftover_files(paths):
+    """Backups whose save is gone and unfinished archive rebuilds under the given folders"""
+    leftovers = []
+    for root in paths:
+        if not os.path.isdir(root):
+            continue
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames.sort()
+            names = set(filenames)
+            for filename in sorted(filenames):
+                if filename.lower().endswith(".bak") and filename[:-4] not in names:
+                    leftovers.append((os.path.join(dirpath, filename), "backup without its save"))
+                elif filename.startswith(".rebuild-"):
+                    leftovers.append((os.path.join(dirpath, filename), "unfinished archive rebuild"))
+    return leftovers
+
+
+def audit_library(paths, layout_key, player_name=None, workers=None, stale_days=STALE_BACKUP_DAYS,
+                  progress=None):
+    """Audit every save under paths on all cores; returns (results, leftovers, elapsed seconds)"""
+    started = time.perf_counter()
+    files = list(batch_tools.expand_paths(paths))
+    jobs = [(path, layout_key, player_name, stale_days) for path in files]
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # Small saves are scanned in batches so process hand-offs don't dominate
+        chunksize = max(1, min(64, len(jobs) // ((workers or os.cpu_count() or 1) * 4)))
+        for result in executor.map(_audit_args, jobs, chunksize=chunksize):
+            results.append(result)
+            if progress:
+                progress(result)
+    leftovers = leftover_files(paths)
+    return results, leftovers, time.perf_counter() - started
+
+
+def write_report(results, report_path):
+    """Write the per-file findings as CSV"""
+    with open(report_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=REPORT_FIELDS)
+        writer.writeheader()
+        for result in results:
+            writer.writerow(result.row())
+
+
+def summary_lines(results, leftovers, elapsed):
+    """Counts by status and backup state, leftovers and throughput"""
+    lines = []
+    counts = {status: 0 for status in STATUSES}
+    backups = {"none": 0, "ok": 0, "stale": 0}
+    total_bytes = 0
+    for result in results:
+        counts[result.status] += 1
+        backups[result.backup] += 1
+        total_bytes += result.size
+    lines.append("Saves: " + ", ".join(f"{count} {status}" for status, count in counts.items() if count))
+    lines.append(f"Backups: {backups['ok']} current, {backups['stale']} stale, {backups['none']} missing")
+    if leftovers:
+        lines.append(f"Leftover files: {len(leftovers)}")
+    rate = len(results) / elapsed if elapsed > 0 else 0.0
+    mib_rate = total_bytes / elapsed / (1024 * 1024) if elapsed > 0 else 0.0
+    lines.append(f"Audited {len(results)} file(s), {total_bytes / (1024 * 1024):.1f} MiB in {elapsed:.2f}s "
+                 f"({rate:.0f} files/s, {mib_rate:.1f} MiB/s)")
+    return lines
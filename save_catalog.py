@@ -0,0 +1,287 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from save_formats import COLOR_SLOTS, available_layouts
+import batch_tools
+import save_io
+
+CATALOG_FILENAME = "catalog.sqlite3"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    sha256 TEXT,
+    error TEXT,
+    scanned_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS blocks (
+    path TEXT NOT NULL REFERENCES files(path) ON DELETE CASCADE,
+    layout TEXT NOT NULL,
+    name TEXT NOT NULL,
+    name_pos INTEGER NOT NULL,
+    color_start INTEGER NOT NULL,
+    color1 TEXT NOT NULL,
+    color2 TEXT NOT NULL,
+    color3 TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS blocks_path ON blocks(path);
+CREATE INDEX IF NOT EXISTS blocks_name ON blocks(name COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS blocks_color1 ON blocks(color1);
+CREATE INDEX IF NOT EXISTS blocks_color2 ON blocks(color2);
+CREATE INDEX IF NOT EXISTS blocks_color3 ON blocks(color3);
+"""
+
+
+def default_catalog_path():
+    return os.path.join(save_io.app_data_dir(), CATALOG_FILENAME)
+
+
+class CatalogEntry:
+    """One character color block recorded in the catalog"""
+
+    def __init__(self, path, layout_key, name, name_pos, color_start, colors):
+        self.path = path
+        self.layout_key = layout_key
+        self.name = name
+        self.name_pos = name_pos
+        self.color_start = color_start
+        self.colors = colors      # dict of slot name to '#RRGGBB'
+
+    @classmethod
+    def from_row(cls, row):
+        path, layout_key, name, name_pos, color_start, c1, c2, c3 = row
+        return cls(path, layout_key, name, name_pos, color_start,
+                   {"color1": c1, "color2": c2, "color3": c3})
+
+    def __repr__(self):
+        return f"CatalogEntry({self.path!r}, {self.layout_key!r}, {self.name!r}, 0x{self.color_start:X})"
+
+
+class ScannedFile:
+    """Result of scanning one save for the catalog"""
+
+    def __init__(self, path, size, mtime_ns, sha256=None, entries=(), error=None):
+        self.path = path
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.sha256 = sha256
+        self.entries = list(entries)
+        self.error = error
+
+
+def scan_file(path, layouts=None):
+    """Read one save and find every named color block in it, for every layout"""
+    try:
+        data, (size, mtime_ns) = save_io.read_save(path)
+    except OSError as e:
+        return ScannedFile(path, 0, 0, error=e.strerror or str(e))
+    entries = []
+    for layout in layouts or available_layouts():
+        starts = layout.find_blocks(data)
+        for color_start, (colors, _) in zip(starts, layout.decode_blocks(data, starts)):
+            try:
+                name_pos, name = layout.name_before_block(data, color_start)
+            except ValueError:
+                continue
+            entries.append(CatalogEntry(path, layout.key, name, name_pos, color_start, colors))
+    return ScannedFile(path, size, mtime_ns, hashlib.sha256(data).hexdigest(), entries)
+
+
+class SaveCatalog:
+    """SQLite index of a save library: which characters and colors live in which files"""
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or default_catalog_path()
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.db.execute("PRAGMA foreign_keys = ON")
+        self.db.executescript(_SCHEMA)
+        self.db.commit()
+
+    @classmethod
+    def open_default(cls, create=False):
+        """Open the per-user catalog; returns None if it doesn't exist and create is False"""
+        path = default_catalog_path()
+        if not create and not os.path.exists(path):
+            return None
+        return cls(path)
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    # Refreshing --------------------------------------------------------------
+
+    def _known_fingerprints(self):
+        with self.lock:
+            return {path: (size, mtime_ns) for path, size, mtime_ns in
+                    self.db.execute("SELECT path, size, mtime_ns FROM files")}
+
+    def _store(self, scanned):
+        """Replace a file's rows; caller holds the lock and commits"""
+        self.db.execute("DELETE FROM files WHERE path = ?", (scanned.path,))
+        self.db.execute("INSERT INTO files (path, size, mtime_ns, sha256, error, scanned_at) VALUES (?, ?, ?, ?, ?, ?)",
+                        (scanned.path, scanned.size, scanned.mtime_ns, scanned.sha256, scanned.error, time.time()))
+        self.db.executemany(
+            "INSERT INTO blocks (path, layout, name, name_pos, color_start, color1, color2, color3) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [(scanned.path, e.layout_key, e.name, e.name_pos, e.color_start,
+              e.colors["color1"], e.colors["color2"], e.colors["color3"]) for e in scanned.entries])
+
+    def refresh(self, paths, workers=4, progress=None, files=None):
+        """Bring the catalog up to date for paths (files or folders), rescanning only changed files
+
+        files, if given, streams the saves under paths (e.g. from the crawler) instead of
+        expanding them here; each changed file starts scanning as soon as it arrives.
+        """
+        known = self._known_fingerprints()
+        stats = {"scanned": 0, "unchanged": 0, "removed": 0, "failed": 0}
+        seen = set()
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="catalog") as executor:
+            scans = []
+            for path in (files if files is not None else batch_tools.expand_paths(paths)):
+                path = os.path.abspath(path)
+                seen.add(path)
+                try:
+                    fp = save_io.fingerprint(path)
+                except OSError:
+                    continue
+                if known.get(path) == fp:
+                    stats["unchanged"] += 1
+                else:
+                    scans.append(executor.submit(scan_file, path))
+
+            # One transaction per refresh; reads and scans overlap on the pool
+            with self.lock:
+                for future in scans:
+                    scanned = future.result()
+                    self._store(scanned)
+                    stats["failed" if scanned.error else "scanned"] += 1
+                    if progress:
+                        progress(scanned)
+
+                # Forget files that disappeared from the folders that were refreshed
+                roots = [os.path.abspath(p) + os.sep for p in paths if os.path.isdir(p)]
+                gone = [(path,) for path in known
+                        if path not in seen and any(path.startswith(root) for root in roots)]
+                self.db.executemany("DELETE FROM files WHERE path = ?", gone)
+                stats["removed"] = len(gone)
+                self.db.commit()
+        return stats
+
+    # Queries -----------------------------------------------------------------
+
+    _SELECT = "SELECT path, layout, name, name_pos, color_start, color1, color2, color3 FROM blocks"
+
+    def _query(self, where, params):
+        with self.lock:
+            rows = self.db.execute(f"{self._SELECT} WHERE {where} ORDER BY path, color_start", params).fetchall()
+        return [CatalogEntry.from_row(row) for row in rows]
+
+    def find_name(self, name, layout_key=None, exact=True):
+        """Entries whose character name matches (case-insensitive); exact=False matches substrings"""
+        where = "name = ? COLLATE NOCASE" if exact else "name LIKE ?"
+        params = [name if exact else f"%{name}%"]
+        if layout_key:
+            where += " AND layout = ?"
+            params.append(layout_key)
+        return self._query(where, params)
+
+    def find_color(self, hex_color, slot=None, layout_key=None):
+        """Entries using hex_color in the given slot, or in any slot"""
+        hex_color = "#" + hex_color.lstrip('#').upper()
+        if slot and slot not in COLOR_SLOTS:
+            raise ValueError(f"Unknown color slot '{slot}'")
+        slots = [slot] if slot else list(COLOR_SLOTS)
+        where = "(" + " OR ".join(f"{s} = ?" for s in slots) + ")"
+        params = [hex_color] * len(slots)
+        if layout_key:
+            where += " AND layout = ?"
+            params.append(layout_key)
+        return self._query(where, params)
+
+    def all_entries(self, layout_key=None):
+        """Every catalogued block, optionally only those of one layout"""
+        if layout_key:
+            return self._query("layout = ?", (layout_key,))
+        return self._query("1", ())
+
+    def lookup(self, path, layout_key, name, fingerprint=None):
+        """Return the entry for name in path if the catalog has the file's current version, else None"""
+        path = os.path.abspath(path)
+        try:
+            current = fingerprint or save_io.fingerprint(path)
+        except OSError:
+            return None
+        with self.lock:
+            row = self.db.execute("SELECT size, mtime_ns FROM files WHERE path = ?", (path,)).fetchone()
+        if row is None or tuple(row) != tuple(current):
+            return None
+        entries = self._query("path = ? AND layout = ? AND name = ? COLLATE NOCASE", (path, layout_key, name))
+        # The same name before several blocks is ambiguous; callers rescan and report it
+        if len({entry.color_start for entry in entries}) != 1:
+            return None
+        return entries[0]
+
+    def summary(self):
+        """Return (files, blocks, failed files) counts"""
+        with self.lock:
+            files = self.db.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+            blocks = self.db.execute("SELECT COUNT(*) FROM blocks").fetchone()[0]
+            failed = self.db.execute("SELECT COUNT(*) FROM files WHERE error IS NOT NULL").fetchone()[0]
+        return files, blocks, failed
+
+
+def cached_color_start(catalog, path, layout, player_name, data, fingerprint):
+    """Color start for player_name from the catalog, checked against data; returns -1 on a miss"""
+    if catalog is None:
+        return -1
+    entry = catalog.lookup(path, layout.key, player_name, fingerprint)
+    if entry is None or not layout.check_separators(data, entry.color_start):
+        return -1
+    return entry.color_start
+
+
+def catalog_name_pos(path, layout, player_name, data, fingerprint):
+    """Name offset from the per-user catalog for this exact file version; -1 on a miss"""
+    try:
+        catalog = SaveCatalog.open_default()
+        if catalog is None:
+            return -1
+        with catalog:
+            entry = catalog.lookup(path, layout.key, player_name, fingerprint)
+    except sqlite3.Error as e:
+        print(f"Catalog lookup failed: {e}")
+        return -1
+    if entry is None:
+        return -1
+    # The catalog may hold a longer stored name; only trust it if the typed name is there
+    name_bytes = player_name.encode('utf-8', errors='replace').lower()
+    if bytes(data[entry.name_pos:entry.name_pos + len(name_bytes)]).lower() != name_bytes:
+        return -1
+    return entry.name_pos
+
+
+def update_catalog(path):
+    """Rescan one file into the per-user catalog after it was written, if a catalog exists"""
+    try:
+        catalog = SaveCatalog.open_default()
+        if catalog is not None:
+            with catalog:
+                catalog.refresh([path], workers=1)
+    except sqlite3.Error as e:
+        print(f"Catalog update failed: {e}")
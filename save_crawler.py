@@ -0,0 +1,241 @@
+import os
+import queue
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from save_formats import available_layouts
+
+# Files this large are never saves (disk images, videos) and are not opened
+MAX_SAVE_BYTES = 8 * 1024 * 1024
+MIN_SAVE_BYTES = 32
+
+# Bytes read to classify a file by its magic number
+HEADER_BYTES = 16
+
+# Files classified per pool task; directories are always one task each
+CLASSIFY_BATCH = 64
+
+# Magic numbers of Xbox 360 STFS packages: console-signed, Xbox LIVE and PIRS
+STFS_MAGIC = (b"CON ", b"LIVE", b"PIRS")
+
+# Borderlands "WillowSaveGame" files
+WSG_MAGIC = b"WSG"
+
+# Headers of common formats that are certainly not saves; these files are dropped unread
+FOREIGN_MAGIC = (b"MZ", b"\x7fELF", b"\x89PNG", b"\xff\xd8\xff", b"GIF8", b"%PDF", b"PK\x03\x04",
+                 b"\x1f\x8b", b"7z\xbc\xaf", b"Rar!", b"OggS", b"fLaC", b"ID3", b"RIFF", b"SQLite format")
+
+# Directory names never worth descending into (compared in lower case)
+PRUNE_DIRS = {".git", ".svn", "__pycache__", "node_modules", "$recycle.bin", "system volume information",
+              "windows", "program files", "program files (x86)", "programdata", "appdata"}
+
+# Extensions of files skipped without being opened; .bak files are this tool's own backups
+SKIP_EXTENSIONS = (".bak", ".exe", ".dll", ".sys", ".png", ".jpg", ".jpeg", ".gif", ".bmp", ".mp3",
+                   ".mp4", ".avi", ".mkv", ".wav", ".ogg", ".txt", ".log", ".ini", ".xml", ".json",
+                   ".pdf", ".zip", ".7z", ".rar", ".iso", ".pak", ".upk", ".bik", ".tfc")
+
+_HEX8 = re.compile(r"[0-9A-Fa-f]{8}\Z")
+
+
+def prune_dir(parent_name, name):
+    """True if a directory cannot hold saves"""
+    if name.lower() in PRUNE_DIRS or name.startswith(".rebuild-"):
+        return True
+    # Xbox 360 Content/<profile>/<title id>/<content type>: only type 00000001 holds saved
+    # games; marketplace content, title updates and installs are skipped whole
+    return bool(_HEX8.match(parent_name) and _HEX8.match(name) and name != "00000001")
+
+
+class CrawlHit:
+    """A file the crawler classified as a save"""
+
+    def __init__(self, path, kind, layout_keys, size):
+        self.path = path
+        self.kind = kind                      # "stfs", "save" or "container"
+        self.layout_keys = tuple(layout_keys)  # layouts (or the container codec) that fit; may be empty
+        self.size = size
+
+    @property
+    def layout_key(self):
+        return self.layout_keys[0] if self.layout_keys else None
+
+    def __repr__(self):
+        return f"CrawlHit({self.path!r}, {self.kind!r}, {self.layout_keys!r})"
+
+
+class CrawlStats:
+    """Counters updated by the crawler threads"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.directories = 0
+        self.files = 0
+        self.pruned = 0
+        self.opened = 0
+        self.hits = 0
+        self.errors = 0
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    def add(self, **counts):
+        with self.lock:
+            for name, count in counts.items():
+                setattr(self, name, getattr(self, name) + count)
+
+    def summary(self):
+        elapsed = self.elapsed or (time.perf_counter() - self.started)
+        rate = self.files / elapsed if elapsed > 0 else 0.0
+        return (f"{self.hits} save(s) in {self.files:,} file(s) and {self.directories:,} folder(s), "
+                f"{self.pruned:,} pruned, {self.opened:,} opened, {self.errors} error(s) "
+                f"in {elapsed:.2f}s ({rate:,.0f} files/s)")
+
+
+def classify(path, size, confirm=False):
+    """Return a CrawlHit if path looks like a save, judging by its header bytes first
+
+    Unknown headers are read whole and checked for a color block or a hashed container.
+    With confirm, magic-number hits must also contain a color block.
+    """
+    with open(path, 'rb') as f:
+        header = f.read(HEADER_BYTES)
+        if header.startswith(FOREIGN_MAGIC):
+            return None
+        if header.startswith(STFS_MAGIC):
+            kind, layout_keys = "stfs", ("xbox360",)
+        elif header.startswith(WSG_MAGIC):
+            kind, layout_keys = "save", ()
+        else:
+            kind, layout_keys = None, ()
+        if kind and not confirm:
+            return CrawlHit(path, kind, layout_keys, size)
+        data = header + f.read()
+
+    # Synthetic or unusual saves can fit more than one layout, so every match is kept
+    matches = [layout.key for layout in available_layouts() if layout.find_blocks(data)]
+    if matches:
+        return CrawlHit(path, kind or "save", matches, size)
+    if kind:
+        return None
+    import compressed_saves
+    codec = compressed_saves.detect_codec(data)
+    if codec is not None:
+        return CrawlHit(path, "container", [codec.key], size)
+    return None
+
+
+def crawl(roots, workers=8, confirm=False, stats=None, pattern_ext=None):
+    """Yield a CrawlHit for every save under roots as soon as it is classified
+
+    Folders are listed with os.scandir on a thread pool, so deep device trees and slow
+    drives are walked in parallel. Hits arrive in no particular order. pattern_ext, if
+    given, limits classification to files with those extensions.
+    """
+    stats = stats or CrawlStats()
+    results = queue.Queue()
+    done = object()
+    pending = [0]
+    lock = threading.Lock()
+    stopped = threading.Event()
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="crawl")
+
+    def submit(task, *args):
+        with lock:
+            pending[0] += 1
+        executor.submit(run, task, args)
+
+    def run(task, args):
+        try:
+            if not stopped.is_set():
+                task(*args)
+        except Exception as e:
+            stats.add(errors=1)
+            print(f"Crawler error: {e}")
+        finally:
+            release()
+
+    def release():
+        with lock:
+            pending[0] -= 1
+            finished = pending[0] == 0
+        # Children are submitted before a task ends, so zero means the walk is complete
+        if finished:
+            results.put(done)
+
+    def walk(directory):
+        candidates = []
+        parent_name = os.path.basename(directory.rstrip("\\/"))
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if prune_dir(parent_name, entry.name):
+                                stats.add(pruned=1)
+                            else:
+                                submit(walk, entry.path)
+                        elif entry.is_file(follow_symlinks=False):
+                            stats.add(files=1)
+                            name = entry.name.lower()
+                            if name.endswith(SKIP_EXTENSIONS) or (pattern_ext and not name.endswith(pattern_ext)):
+                                continue
+                            size = entry.stat(follow_symlinks=False).st_size
+                            if MIN_SAVE_BYTES <= size <= MAX_SAVE_BYTES:
+                                candidates.append((entry.path, size))
+                    except OSError:
+                        stats.add(errors=1)
+        except OSError:
+            # Unreadable folders (permissions, vanished drives) are counted and skipped
+            stats.add(errors=1)
+            return
+        stats.add(directories=1)
+        for start in range(0, len(candidates), CLASSIFY_BATCH):
+            submit(classify_batch, candidates[start:start + CLASSIFY_BATCH])
+
+    def classify_batch(candidates):
+        for path, size in candidates:
+            if stopped.is_set():
+                return
+            try:
+                stats.add(opened=1)
+                hit = classify(path, size, confirm)
+            except OSError:
+                stats.add(errors=1)
+                continue
+            if hit is not None:
+                stats.add(hits=1)
+                results.put(hit)
+
+    # Held while the roots are submitted, so an early root finishing can't end the walk
+    # before the later ones are queued
+    with lock:
+        pending[0] += 1
+    files = []
+    for root in roots:
+        if os.path.isdir(root):
+            submit(walk, root)
+        elif os.path.isfile(root):
+            files.append((root, os.path.getsize(root)))
+    if files:
+        submit(classify_batch, files)
+    release()
+
+    try:
+        while True:
+            hit = results.get()
+            if hit is done:
+                break
+            yield hit
+    finally:
+        # Also reached when the caller stops early; queued tasks see the flag and return
+        stopped.set()
+        executor.shutdown(wait=True)
+        stats.elapsed = time.perf_counter() - stats.started
+
+
+def crawl_paths(roots, layout_key=None, workers=8, stats=None):
+    """Stream the paths of confirmed saves (optionally of one layout) for the batch tools"""
+    for hit in crawl(roots, workers, confirm=True, stats=stats):
+        if hit.kind != "container" and (layout_key is None or layout_key in hit.layout_keys):
+            yield hit.path
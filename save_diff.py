@@ -0,0 +1,127 @@
+import os
+import time
+
+# Size of the blocks compared with memoryview equality before dropping to byte level
+DEFAULT_BLOCK_SIZE = 64 * 1024
+
+# Below this size a differing region is walked byte by byte instead of bisected further
+_BYTE_SCAN_SIZE = 64
+
+
+class DiffRange:
+    """A run of differing bytes [start, end) and the color slots it touches"""
+
+    def __init__(self, start, end, color_slots=()):
+        self.start = start
+        self.end = end
+        self.color_slots = tuple(color_slots)
+
+    @property
+    def length(self):
+        return self.end - self.start
+
+    @property
+    def in_color_slot(self):
+        return bool(self.color_slots)
+
+    def __repr__(self):
+        return f"DiffRange(0x{self.start:X}, 0x{self.end:X}, {self.color_slots!r})"
+
+    def describe(self):
+        """Return a one-line human readable description of the range"""
+        text = f"0x{self.start:08X}-0x{self.end - 1:08X} ({self.length} byte{'s' if self.length != 1 else ''})"
+        if self.color_slots:
+            text += f"  [{', '.join(s.upper() for s in self.color_slots)}]"
+        return text
+
+
+def _byte_ranges(va, vb, start, end, out):
+    """Append the differing byte runs between start and end to out"""
+    run_start = -1
+    for i in range(start, end):
+        if va[i] != vb[i]:
+            if run_start == -1:
+                run_start = i
+        elif run_start != -1:
+            out.append([run_start, i])
+            run_start = -1
+    if run_start != -1:
+        out.append([run_start, end])
+
+
+def _refine(va, vb, start, end, out):
+    """Bisect a differing region until the pieces are small enough to walk byte by byte"""
+    if end - start <= _BYTE_SCAN_SIZE:
+        _byte_ranges(va, vb, start, end, out)
+        return
+    mid = (start + end) // 2
+    if va[start:mid] != vb[start:mid]:
+        _refine(va, vb, start, mid, out)
+    if va[mid:end] != vb[mid:end]:
+        _refine(va, vb, mid, end, out)
+
+
+def diff_buffers(data_a, data_b, block_size=DEFAULT_BLOCK_SIZE, color_positions=None):
+    """Compare two save buffers and return a list of DiffRange objects in file order"""
+    # color_positions maps slot names to their first color byte; overlapping ranges get tagged
+    va = memoryview(data_a).cast('B')
+    vb = memoryview(data_b).cast('B')
+    common = min(len(va), len(vb))
+
+    raw_ranges = []
+    for block_start in range(0, common, block_size):
+        block_end = min(block_start + block_size, common)
+        # Identical blocks are skipped with a single C-level comparison
+        if va[block_start:block_end] != vb[block_start:block_end]:
+            _refine(va, vb, block_start, block_end, raw_ranges)
+
+    # Anything past the end of the shorter file counts as changed
+    if len(va) != len(vb):
+        raw_ranges.append([common, max(len(va), len(vb))])
+
+    # Merge runs that touch across block or bisection boundaries
+    merged = []
+    for start, end in raw_ranges:
+        if merged and merged[-1][1] == start:
+            merged[-1][1] = end
+        else:
+            merged.append([start, end])
+
+    slots = sorted((pos, name) for name, pos in (color_positions or {}).items())
+    result = []
+    for start, end in merged:
+        touched = [name for pos, name in slots if pos < end and pos + 3 > start]
+        result.append(DiffRange(start, end, touched))
+    return result
+
+
+def diff_files(path_a, path_b, block_size=DEFAULT_BLOCK_SIZE, color_positions=None):
+    """Compare two save files on disk; returns (ranges, elapsed_seconds)"""
+    started = time.perf_counter()
+    with open(path_a, 'rb') as f:
+        data_a = f.read()
+    with open(path_b, 'rb') as f:
+        data_b = f.read()
+    ranges = diff_buffers(data_a, data_b, block_size, color_positions)
+    return ranges, time.perf_counter() - started
+
+
+def backup_path_for(file_path):
+    """Return the path of the .bak file the editors create next to a save"""
+    return f"{file_path}.bak"
+
+
+def format_report(path_a, path_b, ranges, elapsed=None):
+    """Format a diff result as plain text lines"""
+    lines = [f"--- {path_a}", f"+++ {path_b}"]
+    if not ranges:
+        lines.append("Files are identical")
+    else:
+        total = sum(r.length for r in ranges)
+        in_slots = sum(1 for r in ranges if r.in_color_slot)
+        lines.append(f"{len(ranges)} changed range(s), {total} byte(s), {in_slots} inside color slots")
+        lines.extend(r.describe() for r in ranges)
+    if elapsed is not None:
+        size = max(os.path.getsize(path_a), os.path.getsize(path_b))
+        lines.append(f"Compared {size:,} bytes in {elapsed * 1000:.1f} ms")
+    return lines
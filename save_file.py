@@ -0,0 +1,142 @@
+from save_formats import get_layout
+import save_io
+
+
+class SaveFile:
+    """Scriptable view of one save: lazily located colors over an in-memory buffer"""
+
+    def __init__(self, buffer, layout, name=None, path=None, fingerprint=None):
+        self.layout = get_layout(layout) if isinstance(layout, str) else layout
+        self.path = path
+        self.fingerprint = fingerprint
+        self._wanted_name = name
+        self._buffer = buffer
+        self._view = memoryview(buffer)
+        self._color_start = None
+        self._name_pos = None
+        self._dirty = {}          # offset -> (original bytes, new bytes)
+
+    @classmethod
+    def open(cls, path, layout, name=None):
+        """Read a save file into memory; edits stay there until flush()
+
+        The bytes are copied rather than mapped, so a game or another tool writing or
+        truncating the file meanwhile can't change what was loaded; flush() then compares
+        the loaded bytes with the file and refuses to overwrite the other writer's changes.
+        """
+        data, fingerprint = save_io.read_save(path)
+        return cls(data, layout, name, path, fingerprint)
+
+    @classmethod
+    def from_buffer(cls, buffer, layout, name=None):
+        """Wrap an in-memory buffer (bytes, bytearray, mmap or memoryview) without copying it"""
+        return cls(buffer, layout, name)
+
+    def __repr__(self):
+        return f"SaveFile({self.path or '<buffer>'!r}, {self.layout.key!r})"
+
+    # Lazy fields -----------------------------------------------------------
+
+    @property
+    def buffer(self):
+        """Read-only memoryview of the whole save"""
+        return self._view.toreadonly()
+
+    @property
+    def color_start(self):
+        """Offset of the first color byte, located on first access"""
+        if self._color_start is None:
+            if self._wanted_name:
+                self._name_pos, self._color_start = self.layout.locate(self._buffer, self._wanted_name)
+            else:
+                # Without a name, take the first block that matches the layout's structure
+                starts = self.layout.find_blocks(self._buffer)
+                if not starts:
+                    raise ValueError(f"No {self.layout.label} color block found in {self.path or 'buffer'}")
+                self._color_start = starts[0]
+        return self._color_start
+
+    @property
+    def offsets(self):
+        """Dict of slot name to the absolute offset of its first byte"""
+        return self.layout.slot_positions(self.color_start)
+
+    @property
+    def raw_colors(self):
+        """Dict of slot name to a 3-byte memoryview slice in the layout's channel order"""
+        return {slot: self._view[pos:pos + 3] for slot, pos in self.offsets.items()}
+
+    @property
+    def colors(self):
+        """Dict of slot name to '#RRGGBB'"""
+        return self.layout.decode_block(self._buffer, self.color_start)
+
+    @property
+    def name(self):
+        """Character name stored in front of the color block"""
+        if self._name_pos is None:
+            self._name_pos = self.layout.name_before_block(self._view, self.color_start)[0]
+        end = self._name_pos
+        while end < self.color_start and 32 <= self._view[end] < 127:
+            end += 1
+        return bytes(self._view[self._name_pos:end]).decode('latin-1')
+
+    # Editing ---------------------------------------------------------------
+
+    def _ensure_writable(self):
+        if self._view.readonly:
+            # Immutable inputs are copied once, on the first edit only
+            self._buffer = bytearray(self._view)
+            self._view = memoryview(self._buffer)
+
+    def set_color(self, slot, hex_color):
+        """Set one slot to '#RRGGBB' in memory and remember the range as dirty"""
+        offset = self.offsets[slot]
+        new = self.layout.encode_slot(hex_color)
+        old = bytes(self._view[offset:offset + 3])
+        if old == new:
+            return
+        self._ensure_writable()
+        original = self._dirty.get(offset, (old, None))[0]
+        self._view[offset:offset + 3] = new
+        if new == original:
+            self._dirty.pop(offset, None)
+        else:
+            self._dirty[offset] = (original, new)
+
+    def set_colors(self, hex_colors):
+        """Set several slots from a dict of slot name to '#RRGGBB'"""
+        for slot, hex_color in hex_colors.items():
+            self.set_color(slot, hex_color)
+
+    @property
+    def dirty(self):
+        return bool(self._dirty)
+
+    def flush(self, backup=True):
+        """Write only the dirty ranges back to the file; returns the number of ranges written"""
+        if not self._dirty:
+            return 0
+        if not self.path:
+            raise ValueError("This SaveFile was created from a buffer and has no file to flush to")
+        offsets = sorted(self._dirty)
+        patches = [(offset, self._dirty[offset][1]) for offset in offsets]
+        expected = [(offset, self._dirty[offset][0]) for offset in offsets]
+        self.fingerprint = save_io.patch_file(self.path, patches, expected, self.fingerprint, backup=backup)
+        self._dirty.clear()
+        return len(patches)
+
+    def close(self):
+        """Release the buffer"""
+        self._view.release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self.flush()
+        finally:
+            self.close()
+        return False
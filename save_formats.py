@@ -0,0 +1,381 @@
+import re
+import struct
+
+# Names of the three character color slots, in save order
+COLOR_SLOTS = ("color1", "color2", "color3")
+
+# Registered save layouts, keyed by layout key
+_LAYOUTS = {}
+
+# Shortest run of printable bytes treated as a character name by structural scans
+MIN_NAME_LENGTH = 2
+
+# Longest printable string considered by name discovery
+MAX_NAME_LENGTH = 40
+
+
+class NameCandidate:
+    """A printable, null-terminated string in a save that may be the character name"""
+
+    def __init__(self, name, name_pos, color_start=-1, block_ok=False):
+        self.name = name
+        self.name_pos = name_pos            # First occurrence with the best score
+        self.color_start = color_start      # Block located after that occurrence, or -1
+        self.block_ok = block_ok            # True if the block has all of its separators
+        self.occurrences = 1
+
+    @property
+    def score(self):
+        """2 for a valid color block after the name, 1 for a block without separators, 0 for none"""
+        return 2 if self.block_ok else 1 if self.color_start != -1 else 0
+
+    def __repr__(self):
+        return f"NameCandidate({self.name!r}, 0x{self.name_pos:X}, score={self.score})"
+
+
+class AmbiguousNameError(ValueError):
+    """Raised when a name occurs more than once with equally good color blocks after it"""
+
+    def __init__(self, player_name, hits):
+        self.hits = hits
+        offsets = ", ".join(f"{hit.color_start:X}" for hit in hits)
+        super().__init__(f"'{player_name}' is followed by {len(hits)} equally valid color blocks "
+                         f"(at {offsets}); refusing to guess which one is the character")
+
+
+class NameHit:
+    """One occurrence of a character name, checked against the layout's full block structure"""
+
+    def __init__(self, name_pos, name_len, color_start=-1, terminated=False, whole=False,
+                 exact_case=False, separators_ok=False):
+        self.name_pos = name_pos
+        self.name_len = name_len
+        self.color_start = color_start      # Block located after the name, or -1
+        self.terminated = terminated        # A NUL follows the name directly
+        self.whole = whole                  # Not the tail of a longer printable string
+        self.exact_case = exact_case
+        self.separators_ok = separators_ok  # Block fits in the data with every separator in place
+
+    @property
+    def valid(self):
+        return self.color_start != -1 and self.separators_ok
+
+    @property
+    def score(self):
+        """Sort key: a valid block first, then a terminated, whole, exactly cased name"""
+        return (self.valid, self.color_start != -1, self.terminated, self.whole, self.exact_case)
+
+    def __repr__(self):
+        return f"NameHit(0x{self.name_pos:X}, block=0x{self.color_start:X}, valid={self.valid})"
+
+
+class SaveLayout:
+    """Declarative description of where and how a save stores the character colors"""
+
+    def __init__(self, key, label, channel_order, marker=b"", name_terminator=b"",
+                 separator=0xFF, slot_count=3, search_window=20):
+        self.key = key
+        self.label = label
+        self.channel_order = channel_order.upper()   # Byte order of one slot, e.g. "RGB" or "BGR"
+        self.marker = bytes(marker)                   # Bytes that open the color block (Xbox: 00 FF)
+        self.name_terminator = bytes(name_terminator) # Bytes that close the name (PC: 00)
+        self.separator = separator                    # Byte between two color slots
+        self.slot_count = slot_count
+        self.search_window = search_window            # How far past the name to look for the marker
+
+        if sorted(self.channel_order) != sorted("RGB"):
+            raise ValueError(f"Invalid channel order '{channel_order}' for layout '{key}'")
+
+        self.slot_names = COLOR_SLOTS[:slot_count] if slot_count <= len(COLOR_SLOTS) else \
+            tuple(f"color{i + 1}" for i in range(slot_count))
+
+        self._compile()
+
+    def _compile(self):
+        """Precompile the struct layouts and slice tables used by the decoders and encoders"""
+        # One slot is three unsigned channel bytes followed (except for the last) by a separator
+        self.slot_stride = 4
+        self.block_size = self.slot_count * 3 + (self.slot_count - 1)
+
+        # Offset of each slot inside the block, relative to the first color byte
+        self.slot_offsets = tuple(i * self.slot_stride for i in range(self.slot_count))
+        # Offset of each separator inside the block
+        self.separator_offsets = tuple(off + 3 for off in self.slot_offsets[:-1])
+
+        # Whole block as one struct: 3B x B 3B x B 3B ... so a single unpack yields every channel
+        block_format = "B".join(["3B"] * self.slot_count)
+        self.block_struct = struct.Struct(">" + block_format)
+
+        # Indexes into the unpacked tuple that put the channels back into R, G, B order
+        fields_per_slot = 4
+        self._rgb_index = []
+        for slot in range(self.slot_count):
+            base = slot * fields_per_slot
+            self._rgb_index.append(tuple(base + self.channel_order.index(ch) for ch in "RGB"))
+        self._sep_index = tuple(slot * fields_per_slot + 3 for slot in range(self.slot_count - 1))
+
+        # Slot encoder: maps an RGB triple back into this layout's channel order
+        self._to_layout = tuple("RGB".index(ch) for ch in self.channel_order)
+
+        # Structural pattern: whatever opens the block, then slots joined by separators.
+        # The block itself sits in a lookahead so overlapping candidates are all reported.
+        sep = re.escape(bytes([self.separator]))
+        block_pattern = sep.join([b"..."] * self.slot_count)
+        if self.marker:
+            opener = re.escape(self.marker)
+        else:
+            # Without a marker the block follows a printable, terminated name
+            opener = rb"[\x20-\x7E]{%d,}" % MIN_NAME_LENGTH + re.escape(self.name_terminator)
+        self.block_regex = re.compile(opener + b"(?=" + block_pattern + b")", re.DOTALL)
+
+        # Name discovery: a whole printable run (not the tail of a longer one) ending at a NUL.
+        # Xbox names run into the 00 of the 00 FF marker, PC names into their terminator.
+        self.name_regex = re.compile(rb"(?<![\x20-\x7E])[\x20-\x7E]{%d,%d}(?=\x00)"
+                                     % (MIN_NAME_LENGTH, MAX_NAME_LENGTH))
+
+    def __repr__(self):
+        return f"SaveLayout({self.key!r})"
+
+    # ------------------------------------------------------------------
+    # Decoding and encoding
+    # ------------------------------------------------------------------
+
+    def slot_positions(self, color_start):
+        """Return the absolute offset of every color slot for a block starting at color_start"""
+        return {name: color_start + off for name, off in zip(self.slot_names, self.slot_offsets)}
+
+    def decode_slot(self, raw):
+        """Decode three slot bytes into an '#RRGGBB' string"""
+        rgb = [raw[self.channel_order.index(ch)] for ch in "RGB"]
+        return "#{:02X}{:02X}{:02X}".format(*rgb)
+
+    def encode_slot(self, hex_color):
+        """Encode an '#RRGGBB' string into three slot bytes in this layout's channel order"""
+        hex_color = hex_color.lstrip('#')
+        if len(hex_color) != 6:
+            raise ValueError(f"Invalid color value '#{hex_color}'")
+        rgb = bytes.fromhex(hex_color)
+        return bytes(rgb[i] for i in self._to_layout)
+
+    def _decode_fields(self, fields):
+        """Turn one unpacked block tuple into a (colors, separators_ok) pair"""
+        colors = {}
+        for name, (ri, gi, bi) in zip(self.slot_names, self._rgb_index):
+            colors[name] = f"#{fields[ri]:02X}{fields[gi]:02X}{fields[bi]:02X}"
+        separators_ok = all(fields[i] == self.separator for i in self._sep_index)
+        return colors, separators_ok
+
+    def decode_block(self, data, color_start):
+        """Decode the color block at color_start into a dict of slot name to '#RRGGBB'"""
+        fields = self.block_struct.unpack_from(data, color_start)
+        return self._decode_fields(fields)[0]
+
+    def decode_blocks(self, data, color_starts):
+        """Decode many blocks at once; returns a list of (colors, separators_ok) pairs"""
+        if not color_starts:
+            return []
+        # Gather every block into one contiguous buffer and unpack it in a single pass
+        view = memoryview(data)
+        size = self.block_size
+        joined = b"".join(view[start:start + size] for start in color_starts)
+        if len(joined) != size * len(color_starts):
+            raise ValueError("Color block extends past the end of the save data")
+        return [self._decode_fields(fields) for fields in self.block_struct.iter_unpack(joined)]
+
+    def encode_block(self, hex_colors):
+        """Encode a dict of slot name to '#RRGGBB' into a full block including separators"""
+        block = bytearray()
+        for idx, name in enumerate(self.slot_names):
+            if idx:
+                block.append(self.separator)
+            block += self.encode_slot(hex_colors[name])
+        return bytes(block)
+
+    def encode_patches(self, color_start, hex_colors):
+        """Return (offset, bytes) patches for the given slot colors, leaving separators untouched"""
+        positions = self.slot_positions(color_start)
+        return [(positions[name], self.encode_slot(hex_colors[name]))
+                for name in self.slot_names if name in hex_colors]
+
+    def check_separators(self, data, color_start):
+        """Return True if every separator byte of the block at color_start is in place"""
+        if color_start < 0 or color_start + self.block_size > len(data):
+            return False
+        return all(data[color_start + off] == self.separator for off in self.separator_offsets)
+
+    # ------------------------------------------------------------------
+    # Locating the block
+    # ------------------------------------------------------------------
+
+    def find_name(self, data, player_name):
+        """Find the character name in the save data; returns the offset or -1"""
+        name_bytes = player_name.encode('utf-8', errors='replace')
+        found_pos = data.find(name_bytes)
+        if found_pos == -1:
+            # Case-insensitive fallback; latin-1 keeps byte offsets identical
+            save_str = bytes(data).decode('latin-1').lower()
+            found_pos = save_str.find(player_name.lower())
+        return found_pos
+
+    def locate_block(self, data, name_pos, name_len):
+        """Return the offset of the first color byte for a name found at name_pos, or -1"""
+        name_end_pos = name_pos + name_len
+
+        if self.name_terminator:
+            # Skip to the end of the (possibly longer) stored name and past its terminator
+            term = data.find(self.name_terminator, name_end_pos)
+            if term == -1:
+                return -1
+            name_end_pos = term + len(self.name_terminator)
+
+        if self.marker:
+            # The block opens with a marker somewhere shortly after the name
+            search_end = min(name_end_pos + self.search_window - 1 + len(self.marker), len(data))
+            marker_pos = data.find(self.marker, name_end_pos, search_end)
+            if marker_pos == -1:
+                return -1
+            return marker_pos + len(self.marker)
+
+        return name_end_pos
+
+    def evaluate_name_hit(self, data, name_pos, name_len, exact_case=True):
+        """Check one occurrence of a name against the whole block layout; returns a NameHit"""
+        name_end = name_pos + name_len
+        color_start = self.locate_block(data, name_pos, name_len)
+        return NameHit(
+            name_pos, name_len, color_start,
+            terminated=name_end < len(data) and data[name_end] == 0,
+            whole=name_pos == 0 or not 32 <= data[name_pos - 1] < 127,
+            exact_case=exact_case,
+            separators_ok=color_start != -1 and self.check_separators(data, color_start),
+        )
+
+    def name_hits(self, data, player_name):
+        """Evaluate every occurrence of player_name (any case) in one pass; returns NameHits in file order"""
+        name_bytes = player_name.encode('utf-8', errors='replace')
+        if not name_bytes:
+            return []
+        pattern = re.compile(re.escape(name_bytes), re.IGNORECASE)
+        return [self.evaluate_name_hit(data, match.start(), len(name_bytes), match.group() == name_bytes)
+                for match in pattern.finditer(data)]
+
+    def best_name_hit(self, data, player_name):
+        """Return the best-scoring NameHit for player_name, or None if the name is absent
+
+        Raises AmbiguousNameError if several valid hits tie for best with different blocks,
+        since writing to the wrong one would corrupt unrelated data.
+        """
+        hits = self.name_hits(data, player_name)
+        if not hits:
+            return None
+        best_score = max(hit.score for hit in hits)
+        best = [hit for hit in hits if hit.score == best_score]
+        if best[0].valid and len({hit.color_start for hit in best}) > 1:
+            raise AmbiguousNameError(player_name, best)
+        return best[0]
+
+    def name_before_block(self, data, color_start):
+        """Walk back from a block to the printable name in front of it; returns (name_pos, name)"""
+        pos = color_start - len(self.marker) - len(self.name_terminator)
+        # Skip any padding between the name and the marker
+        limit = max(0, pos - self.search_window)
+        while pos > limit and not 32 <= data[pos - 1] < 127:
+            pos -= 1
+        end = pos
+        while pos > 0 and 32 <= data[pos - 1] < 127:
+            pos -= 1
+        if end - pos < MIN_NAME_LENGTH:
+            raise ValueError("No character name found in front of the color block")
+        return pos, bytes(data[pos:end]).decode('latin-1')
+
+    def find_blocks(self, data):
+        """Find every color block by structure alone; returns the color start offsets in file order"""
+        return [match.end() for match in self.block_regex.finditer(data)]
+
+    def name_candidates(self, data):
+        """List the strings that could be character names in one pass, best first
+
+        Candidates followed by a valid color block come first, then by position in the file.
+        """
+        best = {}
+        for match in self.name_regex.finditer(data):
+            name = match.group().decode('latin-1')
+            name_pos = match.start()
+            color_start = self.locate_block(data, name_pos, len(name))
+            block_ok = color_start != -1 and self.check_separators(data, color_start)
+            candidate = NameCandidate(name, name_pos, color_start, block_ok)
+
+            current = best.get(name)
+            if current is None:
+                best[name] = candidate
+            else:
+                current.occurrences += 1
+                if candidate.score > current.score:
+                    candidate.occurrences = current.occurrences
+                    best[name] = candidate
+        return sorted(best.values(), key=lambda c: (-c.score, c.name_pos))
+
+    def discover_name(self, data):
+        """Return the top NameCandidate with a valid color block, or raise ValueError"""
+        candidates = self.name_candidates(data)
+        if not candidates or not candidates[0].block_ok:
+            raise ValueError(f"No name followed by a valid {self.label} color block found")
+        return candidates[0]
+
+    def locate(self, data, player_name):
+        """Locate player_name and its color block; returns (name_pos, color_start) or raises ValueError
+
+        With player_name None the best discovered name is used.
+        """
+        if player_name is None:
+            candidate = self.discover_name(data)
+            return candidate.name_pos, candidate.color_start
+        hit = self.best_name_hit(data, player_name)
+        if hit is None:
+            raise ValueError(f"Could not find character name '{player_name}' in save file")
+        if hit.color_start == -1:
+            raise ValueError(f"Found character name '{player_name}' but couldn't locate the color block")
+        if not hit.separators_ok:
+            raise ValueError(f"Color block for '{player_name}' at {hit.color_start:X} is missing its separators")
+        return hit.name_pos, hit.color_start
+
+    def scan(self, data, player_name):
+        """Locate the color block for player_name; returns the color start offset or raises ValueError"""
+        return self.locate(data, player_name)[1]
+
+
+def register_layout(layout):
+    """Add a save layout to the registry, replacing any layout with the same key"""
+    _LAYOUTS[layout.key] = layout
+    return layout
+
+
+def get_layout(key):
+    """Return the registered layout for key"""
+    try:
+        return _LAYOUTS[key]
+    except KeyError:
+        raise ValueError(f"Unknown save layout '{key}'. Known layouts: {', '.join(sorted(_LAYOUTS))}")
+
+
+def available_layouts():
+    """Return all registered layouts in registration order"""
+    return list(_LAYOUTS.values())
+
+
+# Xbox 360: name, then 00 FF, then RGB FF RGB FF RGB
+XBOX_360 = register_layout(SaveLayout(
+    key="xbox360",
+    label="Xbox 360",
+    channel_order="RGB",
+    marker=b"\x00\xFF",
+    search_window=20,
+))
+
+# PC: null-terminated name immediately followed by BGR FF BGR FF BGR
+PC = register_layout(SaveLayout(
+    key="pc",
+    label="PC",
+    channel_order="BGR",
+    name_terminator=b"\x00",
+))
@@ -0,0 +1,189 @@
+import hashlib
+import os
+import shutil
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class ConflictError(Exception):
+    """Raised when the bytes a write would replace changed on disk since they were loaded"""
+
+
+class LockTimeout(Exception):
+    """Raised when an advisory lock could not be acquired in time"""
+
+
+class FileLock:
+    """Advisory exclusive lock on an open file, usable as a context manager"""
+
+    def __init__(self, f, timeout=10.0, poll_interval=0.05):
+        self.f = f
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self.locked = False
+
+    def acquire(self):
+        """Block until the lock is held or raise LockTimeout"""
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                self._try_lock()
+                self.locked = True
+                return
+            except OSError:
+                if time.monotonic() >= deadline:
+                    raise LockTimeout(f"Timed out waiting for a lock on {getattr(self.f, 'name', self.f)}")
+                time.sleep(self.poll_interval)
+
+    def release(self):
+        """Release the lock if held"""
+        if not self.locked:
+            return
+        if fcntl:
+            fcntl.flock(self.f.fileno(), fcntl.LOCK_UN)
+        else:
+            self.f.seek(0)
+            msvcrt.locking(self.f.fileno(), msvcrt.LK_UNLCK, 1)
+        self.locked = False
+
+    def _try_lock(self):
+        if fcntl:
+            fcntl.flock(self.f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            # Windows locks byte ranges; locking the first byte is enough between cooperating writers
+            self.f.seek(0)
+            msvcrt.locking(self.f.fileno(), msvcrt.LK_NBLCK, 1)
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+        return False
+
+
+def app_data_dir():
+    """Return (and create) the per-user folder for caches and session files"""
+    base = os.environ.get("APPDATA") or os.path.join(os.path.expanduser("~"), ".config")
+    path = os.path.join(base, "BorderlandsColorEditor")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def fingerprint(path=None, stat_result=None):
+    """Return a cheap (size, mtime_ns) fingerprint for a file path or an os.stat result"""
+    st = stat_result if stat_result is not None else os.stat(path)
+    return (st.st_size, st.st_mtime_ns)
+
+
+def content_hash(data):
+    """Return the SHA-256 hex digest of a save buffer"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def read_save(path):
+    """Read a save file; returns (bytearray, fingerprint) taken from the same open handle"""
+    with open(path, 'rb') as f:
+        st = os.fstat(f.fileno())
+        data = bytearray(f.read())
+    return data, fingerprint(stat_result=st)
+
+
+def expected_bytes(data, patches):
+    """Return the (offset, old_bytes) pairs currently in data at each patch target"""
+    return [(offset, bytes(data[offset:offset + len(new)])) for offset, new in patches]
+
+
+def ensure_backup(path, backup_path=None, src=None):
+    """Copy path to <path>.bak if no backup exists yet; returns the backup path
+
+    Callers holding a FileLock pass their open handle as src. Windows locks are mandatory,
+    so reading the locked file through a second handle would fail.
+    """
+    backup_path = backup_path or f"{path}.bak"
+    if not os.path.exists(backup_path):
+        if src is None:
+            shutil.copyfile(path, backup_path)
+        else:
+            src.seek(0)
+            with open(backup_path, 'wb') as dst:
+                shutil.copyfileobj(src, dst)
+    return backup_path
+
+
+def _find_conflicts(f, expected):
+    """Return the (offset, old, on_disk) triples whose bytes no longer match what was loaded"""
+    conflicts = []
+    for offset, old in expected:
+        f.seek(offset)
+        on_disk = f.read(len(old))
+        if on_disk != old:
+            conflicts.append((offset, old, on_disk))
+    return conflicts
+
+
+def patch_file(path, patches, expected=None, loaded_fingerprint=None, retries=3,
+               retry_delay=0.1, backup=True, lock_timeout=10.0):
+    """Write only the patched (offset, bytes) ranges into path; returns the new fingerprint"""
+    # expected lists the (offset, old_bytes) the caller loaded. If the file changed since
+    # loaded_fingerprint, the write is rebased onto the current contents as long as those
+    # target bytes are untouched, so progress written by the game in between is kept.
+    for offset, new in patches:
+        if offset < 0 or not new:
+            raise ValueError(f"Invalid patch at offset {offset}")
+
+    for attempt in range(retries + 1):
+        with open(path, 'r+b') as f, FileLock(f, timeout=lock_timeout):
+            current = fingerprint(stat_result=os.fstat(f.fileno()))
+
+            # Someone else wrote the file: verify our target bytes before rebasing onto it
+            conflicts = []
+            if expected and current != loaded_fingerprint:
+                conflicts = _find_conflicts(f, expected)
+
+            if not conflicts:
+                for offset, new in patches:
+                    if offset + len(new) > current[0]:
+                        raise ValueError(f"Patch at {offset:X} lies past the end of {path}")
+                if backup:
+                    ensure_backup(path, src=f)
+                for offset, new in patches:
+                    f.seek(offset)
+                    f.write(new)
+                f.flush()
+                os.fsync(f.fileno())
+                return fingerprint(stat_result=os.fstat(f.fileno()))
+
+        # The other writer may still be mid-write; release the lock and look again
+        if attempt < retries:
+            time.sleep(retry_delay)
+
+    offset, old, on_disk = conflicts[0]
+    raise ConflictError(
+        f"{path} changed on disk since it was loaded: bytes at {offset:X} are "
+        f"{on_disk.hex().upper()}, expected {old.hex().upper()}"
+    )
+
+
+def replace_file(path, data, loaded_fingerprint=None, backup=True, lock_timeout=10.0):
+    """Rewrite a whole file under an advisory lock; returns the new fingerprint"""
+    # Used for containers whose bytes all change on every edit (e.g. recompressed saves),
+    # so there are no target bytes to rebase onto and any concurrent write is a conflict
+    with open(path, 'r+b') as f, FileLock(f, timeout=lock_timeout):
+        current = fingerprint(stat_result=os.fstat(f.fileno()))
+        if loaded_fingerprint is not None and current != loaded_fingerprint:
+            raise ConflictError(f"{path} changed on disk since it was loaded")
+        if backup:
+            ensure_backup(path, src=f)
+        f.seek(0)
+        f.write(data)
+        f.truncate()
+        f.flush()
+        os.fsync(f.fileno())
+        return fingerprint(stat_result=os.fstat(f.fileno()))
@@ -0,0 +1,120 @@
+import itertools
+import os
+from collections import OrderedDict
+
+from save_formats import available_layouts
+import archive_saves
+import save_io
+
+# Default cap on the save bytes held by all open tabs together; override in megabytes
+# with the BL_COLOR_EDITOR_POOL_MB environment variable
+DEFAULT_POOL_BYTES = int(os.environ.get("BL_COLOR_EDITOR_POOL_MB", "256")) * 1024 * 1024
+
+_tab_ids = itertools.count(1)
+
+
+class SaveTab:
+    """One open save in a session; holds offsets, colors and edits but not the file bytes"""
+
+    def __init__(self, path):
+        self.key = next(_tab_ids)
+        self.path = path
+        self.state = {}       # editor fields captured when the tab is switched away from
+
+    @property
+    def title(self):
+        return os.path.basename(self.path)
+
+    @property
+    def modified(self):
+        return bool(self.state.get("modified"))
+
+    def __repr__(self):
+        return f"SaveTab({self.key}, {self.path!r})"
+
+
+def read_save(path):
+    """Read a save into memory; returns (bytearray, fingerprint)
+
+    The bytes are a private copy rather than a mapping: pages of a mapped file would show
+    a game's later writes, which would defeat the conflict check when saving, and a
+    truncated file would crash the editor on the next access.
+    """
+    if archive_saves.is_member_path(path):
+        # Archive members are read out of the archive; the fingerprint is the archive's
+        return archive_saves.read_member(path)
+    return save_io.read_save(path)
+
+
+def matching_layouts(path):
+    """Keys of the layouts whose color block appears in a save, or in an archive's first save
+
+    A save can fit more than one layout, so every match is returned; the list is empty if
+    the file can't be read or no layout finds a block.
+    """
+    try:
+        if archive_saves.is_archive(path):
+            member = next(archive_saves.iter_members(path), None)
+            data = member[1] if member else b""
+        else:
+            data = read_save(path)[0]
+    except (OSError, archive_saves.ArchiveError) as e:
+        print(f"Could not read {path}: {e}")
+        return []
+    return [layout.key for layout in available_layouts() if layout.find_blocks(data)]
+
+
+class BufferPool:
+    """LRU pool of save buffers with a byte cap; evicted tabs are reread when used again"""
+
+    def __init__(self, max_bytes=DEFAULT_POOL_BYTES):
+        self.max_bytes = max_bytes
+        self.buffers = OrderedDict()     # tab key -> buffer, least recently used first
+        self.used_bytes = 0
+        self.loads = 0
+        self.evictions = 0
+
+    def load(self, tab):
+        """(Re)read a tab's file, replacing any buffer it had; returns (buffer, fingerprint)"""
+        self.release(tab)
+        buffer, fp = read_save(tab.path)
+        self.loads += 1
+        self.buffers[tab.key] = buffer
+        self.used_bytes += len(buffer)
+        self._evict(keep=tab.key)
+        return buffer, fp
+
+    def get(self, tab):
+        """Return (buffer, fingerprint) for a tab, rereading it if it was evicted
+
+        The fingerprint is None for a buffer still in the pool; callers compare a reread
+        file's fingerprint with the one they loaded to detect changes made on disk meanwhile.
+        """
+        buffer = self.buffers.get(tab.key)
+        if buffer is None:
+            return self.load(tab)
+        self.buffers.move_to_end(tab.key)
+        return buffer, None
+
+    def release(self, tab):
+        """Drop a tab's buffer; its copy is freed once nothing else references it"""
+        buffer = self.buffers.pop(tab.key, None)
+        if buffer is not None:
+            self.used_bytes -= len(buffer)
+
+    def _evict(self, keep):
+        # Dropping a reference is enough: buffers are clean copies of the file, since
+        # pending colors live in the tab state until they are saved
+        for key in list(self.buffers):
+            if self.used_bytes <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            self.used_bytes -= len(self.buffers.pop(key))
+            self.evictions += 1
+
+    def __contains__(self, tab):
+        return tab.key in self.buffers
+
+    def __len__(self):
+        return len(self.buffers)
@@ -0,0 +1,159 @@
+import json
+import os
+import threading
+
+from save_formats import get_layout
+import archive_saves
+import save_io
+
+SESSION_FILENAME = "session.json"
+
+# Saves remembered across launches, most recent first
+MAX_ENTRIES = 10
+
+_prefetch_lock = threading.Lock()
+_prefetched = None      # (entry, fingerprint, colors) of the save read ahead at startup
+
+
+def _session_path():
+    return os.path.join(save_io.app_data_dir(), SESSION_FILENAME)
+
+
+def _normalize(path):
+    if archive_saves.is_member_path(path):
+        archive_path, member = archive_saves.split_member_path(path)
+        return archive_saves.member_path(os.path.abspath(archive_path), member)
+    return os.path.abspath(path)
+
+
+def _exists(path):
+    if archive_saves.is_member_path(path):
+        path = archive_saves.split_member_path(path)[0]
+    return os.path.isfile(path)
+
+
+def load_session():
+    """Remembered saves, most recent first; an unreadable session file is treated as empty"""
+    try:
+        with open(_session_path(), 'r', encoding='utf-8') as f:
+            entries = json.load(f)
+    except (OSError, ValueError):
+        return []
+    return [entry for entry in entries if isinstance(entry, dict) and "path" in entry]
+
+
+def remember(path, layout_key, fingerprint, player_name, name_pos, color_positions):
+    """Record where a save's character and colors were found, moving it to the front"""
+    path = _normalize(path)
+    entry = {
+        "path": path,
+        "layout": layout_key,
+        "fingerprint": list(fingerprint) if fingerprint else None,
+        "name": player_name,
+        "name_pos": name_pos,
+        "color_positions": dict(color_positions),
+    }
+    entries = [entry] + [e for e in load_session() if e["path"] != path]
+    # Written beside the old file and swapped in, so a crash never leaves half a session
+    session_path = _session_path()
+    temp_path = session_path + ".tmp"
+    try:
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(entries[:MAX_ENTRIES], f, indent=1)
+        os.replace(temp_path, session_path)
+    except OSError as e:
+        print(f"Failed to write session file: {e}")
+
+
+def most_recent(layout_key=None):
+    """The most recent remembered save that still exists, optionally of one layout"""
+    for entry in load_session():
+        if (layout_key is None or entry.get("layout") == layout_key) and _exists(entry["path"]):
+            return entry
+    return None
+
+
+def resume_paths(layout_key):
+    """Paths an editor of this layout should reopen when started without files"""
+    entry = most_recent(layout_key)
+    return [entry["path"]] if entry else []
+
+
+def entry_for(path, layout_key):
+    path = _normalize(path)
+    for entry in load_session():
+        if entry["path"] == path and entry.get("layout") == layout_key:
+            return entry
+    return None
+
+
+def restored_colors(entry, layout, data, fingerprint):
+    """Decode the colors at an entry's offsets, or None if the save changed since it was recorded
+
+    The fingerprint must match, the name must still be where it was, and the slots must
+    form one block with its separators in place, as a scan would have found it.
+    """
+    if not entry.get("fingerprint") or tuple(entry["fingerprint"]) != tuple(fingerprint or ()):
+        return None
+    try:
+        name_bytes = entry["name"].encode('utf-8', errors='replace')
+        name_pos = int(entry["name_pos"])
+        positions = {slot: int(entry["color_positions"][slot]) for slot in layout.slot_names}
+    except (AttributeError, KeyError, TypeError, ValueError):
+        return None
+    if bytes(data[name_pos:name_pos + len(name_bytes)]).lower() != name_bytes.lower():
+        return None
+    # Offset 0 is the file header, never a color slot
+    color_start = positions[layout.slot_names[0]] - layout.slot_offsets[0]
+    if (color_start <= 0 or positions != layout.slot_positions(color_start)
+            or not layout.check_separators(data, color_start)):
+        return None
+    return {slot: layout.decode_slot(data[pos:pos + 3]) for slot, pos in positions.items()}
+
+
+def restore(path, layout, data, fingerprint):
+    """(entry, colors) for a save opened unchanged since it was last scanned or saved, else None"""
+    entry = entry_for(path, layout.key)
+    if entry is None:
+        return None
+    with _prefetch_lock:
+        prefetched = _prefetched
+    # The startup read already checked this exact version of the file at these offsets; a
+    # later remember() with other offsets or name makes its entry differ
+    if prefetched and prefetched[0] == entry and prefetched[1] == tuple(fingerprint or ()):
+        colors = prefetched[2]
+    else:
+        colors = restored_colors(entry, layout, data, fingerprint)
+    return (entry, colors) if colors else None
+
+
+def _prefetch(entry):
+    global _prefetched
+    try:
+        layout = get_layout(entry["layout"])
+        if archive_saves.is_member_path(entry["path"]):
+            data, fingerprint = archive_saves.read_member(entry["path"])
+        else:
+            data, fingerprint = save_io.read_save(entry["path"])
+        colors = restored_colors(entry, layout, data, fingerprint)
+    except (OSError, KeyError, ValueError, archive_saves.ArchiveError) as e:
+        print(f"Session prefetch skipped: {e}")
+        return
+    if colors:
+        with _prefetch_lock:
+            _prefetched = (entry, tuple(fingerprint), colors)
+        print(f"Prefetched {entry['path']} from the last session")
+
+
+def start_prefetch():
+    """Read the most recent save on a background thread while the launcher draws
+
+    This warms the OS file cache and checks the remembered offsets ahead of time, so
+    reopening the save in its editor needs neither a disk wait nor a rescan.
+    """
+    entry = most_recent()
+    if entry is None:
+        return None
+    thread = threading.Thread(target=_prefetch, args=(entry,), name="session-prefetch", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,119 @@
+from collections import defaultdict
+
+from save_formats import COLOR_SLOTS
+from palette import rgb_to_lab
+
+# Largest CIE76 delta E per slot still treated as the same color; about 2.3 is just noticeable
+DEFAULT_THRESHOLD = 5.0
+
+
+class SchemeGroup:
+    """Entries whose three colors are all within the threshold of another entry in the group"""
+
+    def __init__(self, entries):
+        self.entries = entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __repr__(self):
+        return f"SchemeGroup({len(self.entries)} entries)"
+
+
+def signature(colors):
+    """The 9-byte color signature of a scheme: R, G, B of each slot in slot order"""
+    return b"".join(bytes.fromhex(colors[slot].lstrip('#')) for slot in COLOR_SLOTS)
+
+
+def _lab_vector(sig):
+    """Signature -> three L*a*b* triples"""
+    return tuple(rgb_to_lab(sig[i:i + 3]) for i in range(0, 9, 3))
+
+
+def _within(a, b, threshold2):
+    """True if every slot of two Lab vectors is within the threshold"""
+    for (l1, a1, b1), (l2, a2, b2) in zip(a, b):
+        if (l1 - l2) ** 2 + (a1 - a2) ** 2 + (b1 - b2) ** 2 > threshold2:
+            return False
+    return True
+
+
+class _UnionFind:
+    def __init__(self, size):
+        self.parent = list(range(size))
+
+    def find(self, i):
+        parent = self.parent
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def union(self, i, j):
+        ri, rj = self.find(i), self.find(j)
+        if ri != rj:
+            self.parent[rj] = ri
+
+
+def _cell(lab, threshold):
+    l, a, b = lab
+    return (int(l // threshold), int(a // threshold), int(b // threshold))
+
+
+# A cell and its 26 neighbours
+_NEIGHBOURS = [(dl, da, db) for dl in (-1, 0, 1) for da in (-1, 0, 1) for db in (-1, 0, 1)]
+
+
+def find_similar(entries, threshold=DEFAULT_THRESHOLD, colors_of=lambda entry: entry.colors):
+    """Group entries whose schemes are near-duplicates; returns SchemeGroups of two or more, largest first
+
+    Identical signatures are merged first. Each slot of the rest is bucketed on its own grid
+    of threshold-sized L*a*b* cells. A similar scheme must sit in a neighbouring cell in every
+    slot, so each scheme is compared only with the neighbours in whichever slot's grid is
+    least crowded around it; libraries sharing a preset color1 stay fast.
+    """
+    by_signature = defaultdict(list)
+    for entry in entries:
+        by_signature[signature(colors_of(entry))].append(entry)
+    signatures = list(by_signature)
+    vectors = [_lab_vector(sig) for sig in signatures]
+
+    # One grid per slot. Entries carry the next slot's L*a*b* too, which is checked inline
+    # since most candidates already fail on it
+    slots = len(COLOR_SLOTS)
+    grids = [defaultdict(list) for _ in COLOR_SLOTS]
+    cells = []
+    for index, vector in enumerate(vectors):
+        key = tuple(_cell(lab, threshold) for lab in vector)
+        cells.append(key)
+        for slot, (grid, cell) in enumerate(zip(grids, key)):
+            grid[cell].append((index,) + vector[(slot + 1) % slots])
+
+    # Each scheme is probed through the slot whose own cell is least crowded; schemes
+    # probing the same cell share one walk over its neighbourhood
+    probes = defaultdict(list)
+    for index, key in enumerate(cells):
+        slot = min(range(slots), key=lambda slot: len(grids[slot][key[slot]]))
+        probes[(slot, key[slot])].append((index,) + vectors[index][(slot + 1) % slots])
+
+    threshold2 = threshold * threshold
+    groups = _UnionFind(len(signatures))
+    for (slot, (cl, ca, cb)), members in probes.items():
+        grid = grids[slot]
+        for dl, da, db in _NEIGHBOURS:
+            bucket = grid.get((cl + dl, ca + da, cb + db))
+            if not bucket:
+                continue
+            for j, l2, a2, b2 in bucket:
+                for i, l1, a1, b1 in members:
+                    # Each pair is checked once, from its lower index
+                    if (j > i and (l1 - l2) ** 2 + (a1 - a2) ** 2 + (b1 - b2) ** 2 <= threshold2
+                            and _within(vectors[i], vectors[j], threshold2)):
+                        groups.union(i, j)
+
+    merged = defaultdict(list)
+    for index, sig in enumerate(signatures):
+        merged[groups.find(index)].extend(by_signature[sig])
+    result = [SchemeGroup(members) for members in merged.values() if len(members) > 1]
+    result.sort(key=lambda group: -len(group))
+    return result
@@ -0,0 +1,191 @@
+import atexit
+import getpass
+import json
+import multiprocessing
+import os
+import queue
+import secrets
+import socket
+import sys
+import threading
+import tkinter as tk
+from multiprocessing.connection import Client, Listener
+
+import save_io
+
+# How often the Tk window checks for paths handed over by a second launch
+POLL_MS = 150
+
+KEY_FILENAME = "instance.key"
+
+# Held while a launch claims the address, so two launches never both clear and claim it
+LOCK_FILENAME = "instance.lock"
+
+_server = None
+
+
+def _address():
+    """Per-user endpoint: a named pipe on Windows, a Unix socket in the app data folder elsewhere"""
+    if sys.platform == "win32":
+        return r"\\.\pipe\BorderlandsColorEditor-" + getpass.getuser()
+    return os.path.join(save_io.app_data_dir(), "instance.sock")
+
+
+def _key_path():
+    return os.path.join(save_io.app_data_dir(), KEY_FILENAME)
+
+
+def hand_off(paths):
+    """Send paths to a running editor; True if one accepted them and this process can exit"""
+    try:
+        with open(_key_path(), 'rb') as f:
+            authkey = f.read()
+        conn = Client(_address(), authkey=authkey)
+    except (OSError, EOFError, multiprocessing.AuthenticationError):
+        # Nothing listening, a stale socket from a crashed run, or a key from an older run
+        return False
+    try:
+        with conn:
+            conn.send_bytes(json.dumps({"open": list(paths)}).encode('utf-8'))
+            return conn.recv_bytes() == b"ok"
+    except (OSError, EOFError):
+        return False
+
+
+class InstanceServer:
+    """Accepts paths from later launches on a background thread and hands them to the Tk window"""
+
+    def __init__(self, address, authkey):
+        self.listener = Listener(address, authkey=authkey)
+        self.requests = queue.Queue()
+        self.root = None
+        self.handler = None
+        self.closed = False
+        threading.Thread(target=self._serve, name="single-instance", daemon=True).start()
+
+    def _serve(self):
+        while not self.closed:
+            try:
+                conn = self.listener.accept()
+            except multiprocessing.AuthenticationError:
+                continue
+            except (OSError, EOFError):
+                if self.closed:
+                    return
+                continue
+            try:
+                with conn:
+                    message = json.loads(conn.recv_bytes(64 * 1024).decode('utf-8'))
+                    paths = [str(p) for p in message.get("open", [])]
+                    self.requests.put(paths)
+                    # Answered from this thread, so a busy or modal window never stalls the sender
+                    conn.send_bytes(b"ok")
+            except (OSError, EOFError, ValueError, AttributeError) as e:
+                print(f"Ignored a malformed hand-off: {e}")
+
+    def attach(self, root, handler):
+        """Deliver handed-over paths to handler(paths) on root's event loop from now on"""
+        self.root = root
+        self.handler = handler
+        self._poll(root)
+
+    def _poll(self, root):
+        # A newer window took over; let this loop end with its root
+        if root is not self.root:
+            return
+        while True:
+            try:
+                paths = self.requests.get_nowait()
+            except queue.Empty:
+                break
+            self.handler(paths)
+            if root is not self.root:
+                return
+        try:
+            root.after(POLL_MS, self._poll, root)
+        except tk.TclError:
+            pass
+
+    def close(self):
+        self.closed = True
+        self.listener.close()
+
+
+def _socket_alive(address):
+    """True if something accepts connections on a Unix socket path"""
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(address)
+        return True
+    except OSError:
+        return False
+    finally:
+        probe.close()
+
+
+def _publish_key(authkey):
+    """Swap in the key file whole, so hand_off never reads a half-written key"""
+    key_path = _key_path()
+    temp_path = f"{key_path}.{os.getpid()}.tmp"
+    # Readable by this user only; anyone who can read it can open files in the editor
+    fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(authkey)
+        os.replace(temp_path, key_path)
+    except OSError:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def start_server():
+    """Become the running instance; returns the InstanceServer or None if that is not possible
+
+    The key is published only once the address is ours, so a launch that loses the race
+    never replaces the running instance's key. None may mean another launch just became
+    the running instance, so callers should try hand_off again.
+    """
+    global _server
+    address = _address()
+    authkey = secrets.token_bytes(32)
+    try:
+        with open(os.path.join(save_io.app_data_dir(), LOCK_FILENAME), 'a+b') as lock_file, \
+                save_io.FileLock(lock_file):
+            if sys.platform != "win32" and os.path.exists(address):
+                if _socket_alive(address):
+                    print("Another editor is already running")
+                    return None
+                # Left behind by a crashed run; nothing is listening on it
+                os.remove(address)
+            # A second listener on a live named pipe fails here, before any key is written
+            server = InstanceServer(address, authkey)
+            try:
+                _publish_key(authkey)
+            except OSError:
+                server.close()
+                raise
+    except (OSError, save_io.LockTimeout) as e:
+        print(f"Single-instance server unavailable: {e}")
+        return None
+    _server = server
+    atexit.register(_server.close)
+    return _server
+
+
+def attach(root, handler):
+    """Route paths from later launches to handler while root is the current window"""
+    if _server is not None:
+        _server.attach(root, handler)
+
+
+def bring_to_front(root):
+    """Raise a window above others so a hand-off is visible"""
+    try:
+        root.deiconify()
+        root.lift()
+        root.attributes('-topmost', True)
+        root.after_idle(root.attributes, '-topmost', False)
+        root.focus_force()
+    except tk.TclError:
+        pass
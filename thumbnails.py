@@ -0,0 +1,162 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from save_formats import available_layouts
+import save_io
+
+# Rows kept in thumbnails.sqlite3; the least recently used are evicted beyond this
+MAX_DB_ENTRIES = 20000
+
+
+class Thumbnail:
+    """The three colors of one save, as shown in the gallery"""
+
+    def __init__(self, path, layout_key=None, colors=None, error=None):
+        self.path = path
+        self.layout_key = layout_key
+        self.colors = colors or []     # list of '#RRGGBB' in slot order
+        self.error = error
+
+    def to_json(self):
+        return json.dumps({"layout": self.layout_key, "colors": self.colors, "error": self.error})
+
+    @classmethod
+    def from_json(cls, path, text):
+        data = json.loads(text)
+        return cls(path, data.get("layout"), data.get("colors"), data.get("error"))
+
+
+def compute_thumbnail(path, layouts=None):
+    """Read a save and take the colors of its character's block, as detect_block picks it"""
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except OSError as e:
+        return Thumbnail(path, error=e.strerror)
+    layout, start = detect_block(data, layouts)
+    if layout is None:
+        return Thumbnail(path, error="No color block found")
+    colors = layout.decode_block(data, start)
+    return Thumbnail(path, layout.key, [colors[slot] for slot in layout.slot_names])
+
+
+def detect_block(data, layouts=None):
+    """Return (layout, color_start) of the save's character block, or (None, -1)
+
+    Each layout's discovered name (the top candidate followed by a valid block) is ranked
+    by position the way name_candidates ranks names, and when two layouts find the same
+    name the block that starts closest to it wins. Saves with no such name fall back to
+    the first block any layout finds by structure.
+    """
+    layouts = layouts or available_layouts()
+    best = None
+    for order, layout in enumerate(layouts):
+        try:
+            candidate = layout.discover_name(data)
+        except ValueError:
+            continue
+        rank = (candidate.name_pos, candidate.color_start, order)
+        if best is None or rank < best[0]:
+            best = (rank, layout, candidate.color_start)
+    if best is not None:
+        return best[1], best[2]
+    for layout in layouts:
+        starts = layout.find_blocks(data)
+        if starts:
+            return layout, starts[0]
+    return None, -1
+
+
+class ThumbnailCache:
+    """Two-level thumbnail cache: in-memory LRU in front of a SQLite LRU keyed by fingerprint"""
+
+    def __init__(self, db_path=None, memory_entries=4096, db_entries=MAX_DB_ENTRIES):
+        self.db_path = db_path or os.path.join(save_io.app_data_dir(), "thumbnails.sqlite3")
+        self.memory_entries = memory_entries
+        self.db_entries = db_entries
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.db.execute("CREATE TABLE IF NOT EXISTS thumbnails (key TEXT PRIMARY KEY, payload TEXT NOT NULL, "
+                        "last_used REAL NOT NULL DEFAULT 0)")
+        # Caches written before rows were evicted have no last_used column yet
+        columns = [row[1] for row in self.db.execute("PRAGMA table_info(thumbnails)")]
+        if "last_used" not in columns:
+            self.db.execute("ALTER TABLE thumbnails ADD COLUMN last_used REAL NOT NULL DEFAULT 0")
+        self.db.execute("CREATE INDEX IF NOT EXISTS thumbnails_last_used ON thumbnails (last_used)")
+        self.db.commit()
+        self.db_count = self.db.execute("SELECT COUNT(*) FROM thumbnails").fetchone()[0]
+        self._evict()
+        self.db.commit()
+
+    @staticmethod
+    def key_for(path, stat_result=None):
+        """Cache key: absolute path plus (size, mtime) so edited saves get a new thumbnail"""
+        size, mtime_ns = save_io.fingerprint(path, stat_result)
+        return f"{os.path.abspath(path)}|{size}|{mtime_ns}"
+
+    def get(self, path):
+        """Return a cached Thumbnail for path's current fingerprint, or None"""
+        try:
+            key = self.key_for(path)
+        except OSError:
+            return None
+        with self.lock:
+            thumb = self.memory.get(key)
+            if thumb is not None:
+                self.memory.move_to_end(key)
+                return thumb
+            row = self.db.execute("SELECT payload FROM thumbnails WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            # Committed with the next put or on close, so hits don't each pay for a commit
+            self.db.execute("UPDATE thumbnails SET last_used = ? WHERE key = ?", (time.time(), key))
+            thumb = Thumbnail.from_json(path, row[0])
+            self._remember(key, thumb)
+            return thumb
+
+    def put(self, path, thumb):
+        try:
+            key = self.key_for(path)
+        except OSError:
+            return
+        with self.lock:
+            self._remember(key, thumb)
+            exists = self.db.execute("SELECT 1 FROM thumbnails WHERE key = ?", (key,)).fetchone()
+            self.db.execute("INSERT OR REPLACE INTO thumbnails (key, payload, last_used) VALUES (?, ?, ?)",
+                            (key, thumb.to_json(), time.time()))
+            if not exists:
+                self.db_count += 1
+                self._evict()
+            self.db.commit()
+
+    def _evict(self):
+        """Delete the least recently used rows beyond the entry cap"""
+        excess = self.db_count - self.db_entries
+        if excess > 0:
+            self.db.execute("DELETE FROM thumbnails WHERE key IN "
+                            "(SELECT key FROM thumbnails ORDER BY last_used LIMIT ?)", (excess,))
+            self.db_count -= excess
+
+    def _remember(self, key, thumb):
+        self.memory[key] = thumb
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_entries:
+            self.memory.popitem(last=False)
+
+    def get_or_compute(self, path):
+        """Return the cached thumbnail or compute and store it"""
+        thumb = self.get(path)
+        if thumb is None:
+            thumb = compute_thumbnail(path)
+            self.put(path, thumb)
+        return thumb
+
+    def close(self):
+        with self.lock:
+            self.db.commit()
+            self.db.close()
@@ -0,0 +1,205 @@
+import errno
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from save_formats import COLOR_SLOTS, get_layout
+import batch_tools
+import bulk_transforms
+import save_io
+
+# Linux ioctl that makes dst share src's blocks (btrfs, XFS, bcachefs, ...)
+FICLONE = 0x40049409
+
+DEFAULT_TEMPLATE = "{stem}_{index:04d}{ext}"
+
+# Errors meaning a copy method is not available here (other filesystem, old kernel), as
+# opposed to failures such as a full disk that every method would hit
+UNSUPPORTED_ERRNOS = {errno.EXDEV, errno.EOPNOTSUPP, errno.ENOTSUP, errno.EINVAL, errno.ENOSYS,
+                      errno.ENOTTY}
+
+
+def _reflink(fsrc, fdst):
+    import fcntl
+    fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+
+
+def _copy_range(fsrc, fdst, size):
+    # In-kernel copy; filesystems like NFS and ext4 on new kernels may share or offload it
+    offset = 0
+    while offset < size:
+        copied = os.copy_file_range(fsrc.fileno(), fdst.fileno(), size - offset, offset, offset)
+        if copied == 0:
+            raise OSError("copy_file_range stopped before the end of the file")
+        offset += copied
+
+
+class VariantWriter:
+    """Writes copies of one base save that differ only in a few patched ranges
+
+    The cheapest copy method that works is found on the first file and reused:
+    a reflink clone, then copy_file_range, then writing the shared base buffer.
+    Writes may come from several threads; only one probes while no method has worked yet.
+    """
+
+    def __init__(self, source, base):
+        self.source = source
+        self.base = memoryview(base)
+        self.lock = threading.Lock()
+        self.probed = False
+        self.methods = ["reflink", "copy_file_range", "buffer"]
+        if not hasattr(os, "copy_file_range"):
+            self.methods.remove("copy_file_range")
+        if os.name != "posix":
+            self.methods.remove("reflink")
+
+    def _clone(self, method, dst):
+        with open(self.source, 'rb') as fsrc, open(dst, 'wb') as fdst:
+            if method == "reflink":
+                _reflink(fsrc, fdst)
+            else:
+                _copy_range(fsrc, fdst, len(self.base))
+
+    def _write_from_buffer(self, dst, patches):
+        # The patched bytes are spliced between slices of the shared buffer; nothing is copied
+        with open(dst, 'wb') as f:
+            pos = 0
+            for offset, data in patches:
+                f.write(self.base[pos:offset])
+                f.write(data)
+                pos = offset + len(data)
+            f.write(self.base[pos:])
+
+    def write(self, dst, patches):
+        """Create dst as base with patches applied; returns the copy method used"""
+        patches = sorted(patches)
+        if not self.probed:
+            with self.lock:
+                # Re-checked under the lock: another thread may have settled the method meanwhile
+                if not self.probed:
+                    method = self._copy_probing(dst)
+                    self.probed = True
+                    return self._finish(method, dst, patches)
+        method = self.methods[0]
+        if method != "buffer":
+            self._clone(method, dst)
+        return self._finish(method, dst, patches)
+
+    def _copy_probing(self, dst):
+        """Clone dst with the first method that works here, dropping unsupported ones for good"""
+        while self.methods[0] != "buffer":
+            method = self.methods[0]
+            try:
+                self._clone(method, dst)
+                return method
+            except OSError as e:
+                if e.errno is not None and e.errno not in UNSUPPORTED_ERRNOS:
+                    raise
+                self.methods.pop(0)
+        return "buffer"
+
+    def _finish(self, method, dst, patches):
+        if method == "buffer":
+            self._write_from_buffer(dst, patches)
+            return method
+        with open(dst, 'r+b') as f:
+            for offset, data in patches:
+                f.seek(offset)
+                f.write(data)
+        return method
+
+
+def output_paths(source, out_dir, count, template=DEFAULT_TEMPLATE):
+    stem, ext = os.path.splitext(os.path.basename(source))
+    return [os.path.join(out_dir, template.format(stem=stem, index=i + 1, ext=ext)) for i in range(count)]
+
+
+def random_variants(base_colors, count, seed):
+    """count reproducible random schemes"""
+    tensor = bulk_transforms.ColorTensor.from_schemes(range(count), [base_colors] * count)
+    tensor = bulk_transforms.randomize(tensor, seed)
+    return [tensor.scheme(i) for i in range(count)]
+
+
+def hue_variants(base_colors, count):
+    """count schemes with the hue rotated in even steps around the color wheel"""
+    tensor = bulk_transforms.ColorTensor.from_schemes([0], [base_colors])
+    return [bulk_transforms.hue_rotate(tensor, 360.0 * (i + 1) / (count + 1)).scheme(0) for i in range(count)]
+
+
+def read_variants(path):
+    """Read one scheme per line: three RRGGBB (or #RRGGBB) values separated by commas or spaces"""
+    variants = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            values = line.replace(',', ' ').split()
+            if not values:
+                continue
+            if len(values) != 3:
+                raise ValueError(f"{path}:{line_number}: expected three colors, found {len(values)}")
+            variants.append({slot: "#" + value.lstrip('#').upper()
+                             for slot, value in zip(COLOR_SLOTS, values)})
+    return variants
+
+
+def _temp_path(dst):
+    directory, name = os.path.split(dst)
+    return os.path.join(directory, f".{name}.{os.getpid()}.fanout")
+
+
+def fan_out(source, layout, player_name, variants, out_dir, template=DEFAULT_TEMPLATE,
+            overwrite=False, workers=4):
+    """Write one copy of source per variant scheme; the source is read and scanned only once
+
+    Copies are written under temporary names and renamed into place only once the source
+    is confirmed unchanged, so a conflict leaves no outputs behind. Returns a list of
+    BatchResult whose message is the copy method used.
+    """
+    if isinstance(layout, str):
+        layout = get_layout(layout)
+    base, fingerprint = save_io.read_save(source)
+    color_start = layout.scan(base, player_name)
+
+    os.makedirs(out_dir, exist_ok=True)
+    targets = output_paths(source, out_dir, len(variants), template)
+    source_abs = os.path.abspath(source)
+    writer = VariantWriter(source, bytes(base))
+
+    def write(item):
+        dst, colors = item
+        if os.path.abspath(dst) == source_abs:
+            return batch_tools.BatchResult(dst, "skipped", "would overwrite the source save")
+        if not overwrite and os.path.exists(dst):
+            return batch_tools.BatchResult(dst, "skipped", "already exists")
+        temp = _temp_path(dst)
+        try:
+            method = writer.write(temp, layout.encode_patches(color_start, colors))
+            return batch_tools.BatchResult(dst, "written", method)
+        except (OSError, ValueError) as e:
+            _remove(temp)
+            return batch_tools.BatchResult(dst, "failed", str(e))
+
+    results = []
+    try:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fanout") as executor:
+            results += executor.map(write, zip(targets, variants))
+
+        # Clones read the source as it is now; if it changed mid-run the copies can't be trusted
+        if save_io.fingerprint(source) != fingerprint:
+            raise save_io.ConflictError(f"{source} changed while variants were being written; "
+                                        "no variants were kept, retry once it is unchanged")
+        for result in results:
+            if result.status == "written":
+                os.replace(_temp_path(result.path), result.path)
+    finally:
+        # Anything not renamed into place (a conflict, an interrupted run) is removed
+        for dst in targets:
+            _remove(_temp_path(dst))
+    return results
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
@@ -2,14 +2,25 @@ import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 import os
 import re
-import binascii
-from common_utils import BorderlandsTheme, ColorPicker
+from common_utils import BorderlandsTheme, ColorPicker, ReportViewer, HexInspector, SessionTabBar
+from save_formats import AmbiguousNameError, get_layout
+import archive_saves
+import save_catalog
+import save_diff
+import save_io
+import save_session
+import session_restore
+import single_instance
 
 class XboxColorEditor:
+    # Editor fields saved per tab when switching between open saves
+    TAB_FIELDS = ("file_path", "loaded_fingerprint", "modified", "scan_result_pos",
+                  "name_pos", "name_len", "marker_pos")
+    
     def __init__(self, root):
         self.root = root
         self.root.title("Borderlands Color Editor (Xbox 360) | Made by: Jasper_Zebra | Version 1.5")
-        self.root.geometry("900x800")  # Increased height for scan section
+        self.root.geometry("900x870")  # Increased height for scan section and tabs
         self.root.resizable(False, False)
         
         # Set application icon
@@ -26,8 +37,10 @@ class XboxColorEditor:
         self.style = style
         
         # Initialize variables
+        self.layout = get_layout("xbox360")
         self.file_path = None
         self.save_data = None
+        self.loaded_fingerprint = None
         self.modified = False
         self.color_values = {
             "color1": tk.StringVar(value="#CCCCCC"),
@@ -41,6 +54,14 @@ class XboxColorEditor:
         }
         self.player_name_var = tk.StringVar()
         self.scan_result_pos = 0
+        self.name_pos = None
+        self.name_len = 0
+        self.marker_pos = None
+        
+        # Open saves, one tab each; their bytes live in a memory-capped pool
+        self.pool = save_session.BufferPool()
+        self.tabs = []
+        self.active_tab = None
         
         # Create the UI
         self.create_ui()
@@ -75,6 +96,10 @@ class XboxColorEditor:
         browse_button = ttk.Button(file_frame, text="LOAD SAVE", command=self.browse_file, width=15)
         browse_button.pack(side=tk.LEFT)
         
+        # One tab per open save
+        self.tab_bar = SessionTabBar(main_frame, self.colors, self.switch_tab, self.close_tab)
+        self.tab_bar.pack(fill=tk.X, pady=(0, 15))
+        
         # Player name scanner section
         scan_frame = ttk.LabelFrame(main_frame, text="NAME SCANNER", padding=15)
         scan_frame.pack(fill=tk.X, pady=(0, 20))
@@ -82,8 +107,10 @@ class XboxColorEditor:
         # Player name entry
         ttk.Label(scan_frame, text="CHARACTER NAME:").pack(side=tk.LEFT, padx=(0, 10))
         self.player_name_var = tk.StringVar()
-        player_name_entry = ttk.Entry(scan_frame, textvariable=self.player_name_var, width=30)
-        player_name_entry.pack(side=tk.LEFT, padx=(0, 15), fill=tk.X, expand=True)
+        # Editable dropdown filled with the names discovered in the loaded save
+        self.player_name_entry = ttk.Combobox(scan_frame, textvariable=self.player_name_var, width=30)
+        self.player_name_entry.pack(side=tk.LEFT, padx=(0, 15), fill=tk.X, expand=True)
+        self.player_name_entry.bind("<<ComboboxSelected>>", lambda e: self.scan_for_player_name())
         
         # Scan button
         scan_button = ttk.Button(scan_frame, text="SCAN", command=self.scan_for_player_name, width=15)
@@ -142,6 +169,14 @@ class XboxColorEditor:
         menu_button = ttk.Button(button_frame, text="MAIN MENU", command=self.return_to_menu, width=15)
         menu_button.pack(side=tk.LEFT, padx=5)
         
+        # Compare the save with its backup
+        diff_button = ttk.Button(button_frame, text="DIFF BACKUP", command=self.show_backup_diff, width=15)
+        diff_button.pack(side=tk.LEFT, padx=5)
+        
+        # Inspect the raw bytes around the located color block
+        hex_button = ttk.Button(button_frame, text="HEX VIEW", command=self.show_hex_inspector, width=12)
+        hex_button.pack(side=tk.LEFT, padx=5)
+        
         # Status bar with Borderlands-style border
         status_frame = tk.Frame(self.root, bg=self.colors['background'], bd=2, 
                              relief='sunken', highlightbackground=self.colors['yellow'])
@@ -155,7 +190,8 @@ class XboxColorEditor:
     
     def return_to_menu(self):
         """Return to the main platform selection menu"""
-        if self.modified:
+        self.capture_tab_state()
+        if any(tab.modified for tab in self.tabs):
             if not messagebox.askyesno("CONFIRM", "Discard unsaved changes and return to menu?"):
                 return
         
@@ -171,21 +207,165 @@ class XboxColorEditor:
         """Open a file dialog to select a Borderlands save file"""
         file_path = filedialog.askopenfilename(
             title="Select Borderlands Save File",
-            filetypes=[("Save Files", "*.sav"), ("All Files", "*.*")]
+            filetypes=[("Save Files", "*.sav"),
+                       ("Save Archives", "*.zip *.tar *.tgz *.tar.gz *.tbz2 *.tar.bz2 *.txz *.tar.xz"),
+                       ("All Files", "*.*")]
         )
         
         if file_path:
-            self.file_path = file_path
-            self.file_path_var.set(file_path)
-            self.load_save_file()
+            self.open_file(file_path)
+    
+    def open_file(self, file_path, announce=True):
+        """Open a save in a new tab, or switch to its tab if it is already open"""
+        if archive_saves.is_archive(file_path):
+            self.open_archive(file_path)
+            return
+        
+        for tab in self.tabs:
+            if os.path.abspath(tab.path) == os.path.abspath(file_path):
+                self.switch_tab(tab)
+                return
+        
+        self.capture_tab_state()
+        tab = save_session.SaveTab(file_path)
+        self.tabs.append(tab)
+        self.active_tab = tab
+        self.tab_bar.set_tabs(self.tabs, tab)
+        self.file_path = file_path
+        self.file_path_var.set(file_path)
+        self.player_name_var.set("")
+        self.load_save_file(announce)
+    
+    def open_paths(self, file_paths):
+        """Open saves handed over by a later launch, each in its own tab
+
+        Saves only another platform's layout fits are refused, since this editor would
+        read and write their colors with the wrong byte layout.
+        """
+        accepted, refused = [], []
+        for file_path in file_paths:
+            layout_keys = save_session.matching_layouts(file_path)
+            if layout_keys and self.layout.key not in layout_keys:
+                refused.append(file_path)
+            else:
+                accepted.append(file_path)
+        for file_path in accepted:
+            self.open_file(file_path, announce=len(accepted) == 1)
+        single_instance.bring_to_front(self.root)
+        if refused:
+            names = "\n".join(os.path.basename(path) for path in refused)
+            messagebox.showwarning("WRONG PLATFORM", f"These saves are for another platform and were not opened:\n\n{names}\n\nReturn to the menu and choose PC to edit them.")
+    
+    def open_archive(self, archive_path):
+        """Open every save inside a zip or tar archive in its own tab, without extracting it"""
+        try:
+            members = archive_saves.list_members(archive_path)
+        except (OSError, archive_saves.ArchiveError) as e:
+            messagebox.showerror("ERROR", f"Failed to read archive: {str(e)}")
+            return
+        if not members:
+            messagebox.showinfo("INFO", "No .sav files found in this archive")
+            return
+        for member in members:
+            self.open_file(archive_saves.member_path(archive_path, member), announce=False)
+        messagebox.showinfo("SUCCESS", f"Opened {len(members)} save(s) from {os.path.basename(archive_path)} in tabs.")
     
-    def load_save_file(self):
-        """Load the selected save file without automatic color extraction"""
+    def capture_tab_state(self):
+        """Remember the active tab's offsets, colors and pending edits; its bytes stay in the pool"""
+        tab = self.active_tab
+        if tab is None:
+            return
+        tab.state = {field: getattr(self, field) for field in self.TAB_FIELDS}
+        tab.state["color_positions"] = dict(self.color_positions)
+        tab.state["colors"] = {name: var.get() for name, var in self.color_values.items()}
+        tab.state["player_name"] = self.player_name_var.get()
+        tab.state["name_choices"] = list(self.player_name_entry["values"] or ())
+        tab.state["status"] = self.status_var.get()
+    
+    def restore_tab_state(self, tab):
+        """Put a tab's saved fields back into the editor"""
+        for field in self.TAB_FIELDS:
+            setattr(self, field, tab.state[field])
+        self.color_positions.update(tab.state["color_positions"])
+        for color_name, hex_color in tab.state["colors"].items():
+            self.color_values[color_name].set(hex_color)
+            self.hex_displays[color_name].set(hex_color)
+            self.color_displays[color_name].config(bg=hex_color)
+        self.player_name_var.set(tab.state["player_name"])
+        self.player_name_entry.configure(values=tab.state["name_choices"])
+        self.status_var.set(tab.state["status"])
+        self.file_path_var.set(self.file_path)
+    
+    def switch_tab(self, tab):
+        """Show another open save; its buffer is reread if the pool gave it up"""
+        if tab is self.active_tab:
+            return
+        self.capture_tab_state()
+        self.active_tab = tab
+        self.restore_tab_state(tab)
+        self.tab_bar.set_tabs(self.tabs, tab)
+        
         try:
-            with open(self.file_path, 'rb') as f:
-                self.save_data = bytearray(f.read())
+            self.save_data, fingerprint = self.pool.get(tab)
+        except OSError as e:
+            self.save_data = None
+            messagebox.showerror("ERROR", f"Failed to reopen save file: {str(e)}")
+            self.status_var.set("ERROR LOADING FILE")
+            return
+        
+        if fingerprint is not None and fingerprint != self.loaded_fingerprint:
+            # The file changed on disk while the tab was idle, so its offsets may be stale
+            messagebox.showwarning("FILE CHANGED", "This save was modified outside the editor and has been reloaded. Scan again to locate your colors.")
+            self.load_save_file(announce=False)
+    
+    def close_tab(self, tab):
+        """Close one open save, asking first if it has unsaved changes"""
+        if tab is self.active_tab:
+            self.capture_tab_state()
+        if tab.modified:
+            if not messagebox.askyesno("CONFIRM", f"Discard unsaved changes to {tab.title}?"):
+                return
+        
+        self.pool.release(tab)
+        index = self.tabs.index(tab)
+        self.tabs.remove(tab)
+        if tab is not self.active_tab:
+            self.tab_bar.set_tabs(self.tabs, self.active_tab)
+            return
+        
+        self.active_tab = None
+        if self.tabs:
+            self.switch_tab(self.tabs[min(index, len(self.tabs) - 1)])
+        else:
+            self.clear_editor()
+    
+    def clear_editor(self):
+        """Reset the editor once the last tab is closed"""
+        self.file_path = None
+        self.save_data = None
+        self.loaded_fingerprint = None
+        self.modified = False
+        self.name_pos = None
+        self.file_path_var.set("")
+        self.player_name_var.set("")
+        self.player_name_entry.configure(values=[])
+        for color_name in self.color_values:
+            self.color_positions[color_name] = 0
+            self.color_values[color_name].set("#CCCCCC")
+            self.hex_displays[color_name].set("#CCCCCC")
+            self.color_displays[color_name].config(bg="#CCCCCC")
+        self.tab_bar.set_tabs(self.tabs, None)
+        self.status_var.set("READY TO CUSTOMIZE")
+    
+    def load_save_file(self, announce=True):
+        """Load the active tab's save file without automatic color extraction"""
+        try:
+            # Read into the tab pool, which may give idle tabs' buffers up
+            self.save_data, self.loaded_fingerprint = self.pool.load(self.active_tab)
             
-            # Clear any previous color data
+            # Clear any previous scan and color data
+            self.name_pos = None
+            self.marker_pos = None
             for color_name in ["color1", "color2", "color3"]:
                 # Reset position data
                 self.color_positions[color_name] = 0
@@ -195,27 +375,86 @@ class XboxColorEditor:
                 self.hex_displays[color_name].set(default_color)
                 self.color_displays[color_name].config(bg=default_color)
             
+            # Offer the names that have a valid color block after them
+            names = self.discover_names()
+            
+            # A save worked on in an earlier session opens with its colors already located
+            restored = self.restore_session()
+            
             # Update status message
-            self.status_var.set("SAVE FILE LOADED - USE SCAN BUTTON OR ENTER NAME TO LOCATE COLORS")
-            messagebox.showinfo("SUCCESS", "Save file loaded successfully! Use the Name Scanner to locate your character colors.")
+            if restored:
+                self.status_var.set(f"COLORS RESTORED FOR '{self.player_name_var.get().upper()}' FROM LAST SESSION")
+            elif names:
+                self.status_var.set(f"SAVE FILE LOADED - {len(names)} CHARACTER NAME(S) FOUND, PICK ONE AND SCAN")
+            else:
+                self.status_var.set("SAVE FILE LOADED - USE SCAN BUTTON OR ENTER NAME TO LOCATE COLORS")
+            if announce and restored:
+                messagebox.showinfo("SUCCESS", "Save file loaded with your character colors from the last session!")
+            elif announce:
+                messagebox.showinfo("SUCCESS", "Save file loaded successfully! Use the Name Scanner to locate your character colors.")
             self.modified = False
             
         except Exception as e:
+            self.save_data = None
             messagebox.showerror("ERROR", f"Failed to load save file: {str(e)}")
             self.status_var.set("ERROR LOADING FILE")
     
+    def discover_names(self):
+        """Fill the name dropdown with candidates followed by a valid color block"""
+        candidates = [c for c in self.layout.name_candidates(self.save_data) if c.block_ok]
+        names = [c.name for c in candidates]
+        self.player_name_entry.configure(values=names)
+        for candidate in candidates:
+            print(f"Name candidate '{candidate.name}' at {candidate.name_pos:X}, block at {candidate.color_start:X}")
+        if names and not self.player_name_var.get().strip():
+            self.player_name_var.set(names[0])
+        return names
+    
+    def restore_session(self):
+        """Fill in the name, offsets and colors remembered for this file if it is unchanged since"""
+        restored = session_restore.restore(self.file_path, self.layout, self.save_data, self.loaded_fingerprint)
+        if restored is None:
+            return False
+        entry, colors = restored
+        self.player_name_var.set(entry["name"])
+        self.name_pos = int(entry["name_pos"])
+        self.name_len = len(entry["name"])
+        for color_name in self.layout.slot_names:
+            self.color_positions[color_name] = int(entry["color_positions"][color_name])
+        color1_pos = self.color_positions["color1"]
+        marker_pos = color1_pos - len(self.layout.marker)
+        self.marker_pos = marker_pos if marker_pos >= 0 and self.save_data[marker_pos:color1_pos] == self.layout.marker else None
+        for color_name, hex_color in colors.items():
+            self.color_values[color_name].set(hex_color)
+            self.hex_displays[color_name].set(hex_color)
+            self.color_displays[color_name].config(bg=hex_color)
+        print(f"Restored '{entry['name']}' at {self.name_pos:X} from the last session")
+        return True
+    
+    def remember_session(self, player_name):
+        """Record the located name and color offsets so the next launch can reopen this save"""
+        session_restore.remember(self.file_path, self.layout.key, self.loaded_fingerprint,
+                                 player_name, self.name_pos, self.color_positions)
+    
     def choose_color(self, color_name):
         """Open color picker for the specified color"""
         current_color = self.color_values[color_name].get()
         new_color = ColorPicker.choose_color(self.root, current_color, color_name, self.colors)
         
-        if new_color:
-            # Update the color
-            self.color_values[color_name].set(new_color)
-            self.hex_displays[color_name].set(new_color)
-            self.color_displays[color_name].config(bg=new_color)
-            self.modified = True
-            self.status_var.set("CHANGES PENDING - SAVE TO APPLY")
+        if isinstance(new_color, dict):
+            # A scheme extracted from an image sets all three colors at once
+            for slot, hex_color in new_color.items():
+                self.set_color_value(slot, hex_color)
+        elif new_color:
+            self.set_color_value(color_name, new_color)
+    
+    def set_color_value(self, color_name, new_color):
+        """Show a new pending color for one slot"""
+        self.color_values[color_name].set(new_color)
+        self.hex_displays[color_name].set(new_color)
+        self.color_displays[color_name].config(bg=new_color)
+        self.modified = True
+        self.status_var.set("CHANGES PENDING - SAVE TO APPLY")
     
     def save_changes(self):
         """Save color changes back to the file"""
@@ -227,35 +466,108 @@ class XboxColorEditor:
             messagebox.showinfo("INFO", "No changes to save")
             return
         
+        if self.name_pos is None or not all(self.color_positions.values()):
+            messagebox.showerror("ERROR", "No color block has been located. Scan for your character before saving.")
+            return
+        
         try:
-            # Create backup if it doesn't exist
-            backup_path = f"{self.file_path}.bak"
-            if not os.path.exists(backup_path):
-                with open(backup_path, 'wb') as f_backup:
-                    with open(self.file_path, 'rb') as f_orig:
-                        f_backup.write(f_orig.read())
+            # Encode the new colors as patches against the loaded data
+            hex_colors = {name: self.color_values[name].get() for name in self.layout.slot_names}
+            patches = [(self.color_positions[name], self.layout.encode_slot(hex_colors[name]))
+                       for name in self.layout.slot_names]
+            expected = save_io.expected_bytes(self.save_data, patches)
             
-            # Update colors in the save data
-            for color_name in ["color1", "color2", "color3"]:
-                color_pos = self.color_positions[color_name]
-                color_hex = self.color_values[color_name].get().lstrip('#')
-                self.save_data[color_pos:color_pos+3] = binascii.unhexlify(color_hex)
-                print(f"Saved {color_name} at {color_pos:X}: #{color_hex}")
+            # Write only the color bytes under a file lock, backing up first and verifying
+            # the target bytes still match what was loaded if something else wrote the file.
+            # A save inside an archive is written by rebuilding the archive around it
+            self.loaded_fingerprint = archive_saves.patch_save(self.file_path, patches, expected,
+                                                               self.loaded_fingerprint)
             
-            # Write back to file
-            with open(self.file_path, 'wb') as f:
-                f.write(self.save_data)
+            # Update colors in the save data
+            for (color_pos, color_bytes), color_name in zip(patches, self.layout.slot_names):
+                self.save_data[color_pos:color_pos+3] = color_bytes
+                print(f"Saved {color_name} at {color_pos:X}: {hex_colors[color_name]}")
             
             # Update status - Borderlands style
             self.modified = False
+            
+            # The file is written by now, so catalog or session bookkeeping that fails is
+            # only logged rather than reported as a failed save
+            try:
+                save_catalog.update_catalog(self.file_path)
+                self.remember_session(self.player_name_var.get().strip())
+            except Exception as e:
+                print(f"Saved, but failed to update the catalog or session: {e}")
+            
             self.status_var.set("CHANGES SAVED SUCCESSFULLY")
             messagebox.showinfo("SUCCESS", "Character customization complete!")
             
+        except save_io.ConflictError as e:
+            messagebox.showerror("ERROR", f"The save file was changed by another program. Reload it and try again.\n\n{str(e)}")
+            print(f"Exception details: {e}")
+            self.status_var.set("SAVE CONFLICT - RELOAD REQUIRED")
+            
         except Exception as e:
             messagebox.showerror("ERROR", f"Failed to save changes: {str(e)}")
             print(f"Exception details: {e}")
             self.status_var.set("ERROR SAVING CHANGES")
     
+    def show_backup_diff(self):
+        """Show the byte ranges that differ between the save file and its .bak backup"""
+        if not self.file_path:
+            messagebox.showinfo("INFO", "No save file loaded")
+            return
+        
+        backup_path = save_diff.backup_path_for(self.file_path)
+        if not os.path.exists(backup_path):
+            messagebox.showinfo("INFO", "No backup exists for this save yet")
+            return
+        
+        try:
+            # Only mark color slots once a scan has located them
+            color_positions = None
+            if any(self.color_positions.values()):
+                color_positions = dict(self.color_positions)
+            
+            ranges, elapsed = save_diff.diff_files(backup_path, self.file_path, color_positions=color_positions)
+            lines = save_diff.format_report(backup_path, self.file_path, ranges, elapsed)
+            ReportViewer.show(self.root, "Backup Diff", lines, self.colors, highlight="[COLOR")
+            self.status_var.set(f"{len(ranges)} CHANGED RANGE(S) SINCE BACKUP")
+            
+        except Exception as e:
+            messagebox.showerror("ERROR", f"Failed to compare with backup: {str(e)}")
+            print(f"Exception details: {e}")
+    
+    def show_hex_inspector(self):
+        """Open the hex inspector with the name, marker, separators and color slots highlighted"""
+        if not self.save_data:
+            messagebox.showinfo("INFO", "No save file loaded")
+            return
+        
+        highlights = []
+        focus_offset = 0
+        if self.name_pos is not None:
+            highlights.append((self.name_pos, self.name_pos + self.name_len, "name", self.colors['yellow']))
+            focus_offset = self.name_pos
+        
+        if any(self.color_positions.values()):
+            # The 00 FF marker right before the first color
+            if self.marker_pos is not None:
+                highlights.append((self.marker_pos, self.marker_pos + len(self.layout.marker), "00 FF marker", self.colors['orange']))
+            
+            # FF separators sit right before color 2 and color 3
+            for color_name in self.layout.slot_names[1:]:
+                sep_pos = self.color_positions[color_name] - 1
+                highlights.append((sep_pos, sep_pos + 1, "separator", "#888888"))
+            
+            # Each slot is filled with the color it currently holds in the editor
+            for color_name in self.layout.slot_names:
+                color_pos = self.color_positions[color_name]
+                highlights.append((color_pos, color_pos + 3, color_name, self.color_values[color_name].get()))
+        
+        HexInspector(self.root, self.save_data, self.colors, highlights, focus_offset,
+                     title=f"HEX INSPECTOR - {os.path.basename(self.file_path).upper()}")
+    
     def reload_file(self):
         """Reload the current save file"""
         if not self.file_path:
@@ -267,6 +579,13 @@ class XboxColorEditor:
                 
         self.load_save_file()
     
+    def forget_block(self):
+        """Drop the located name and color block, so save_changes refuses to write until a scan succeeds"""
+        self.name_pos = None
+        self.marker_pos = None
+        for color_name in self.layout.slot_names:
+            self.color_positions[color_name] = 0
+    
     def scan_for_player_name(self):
         """Scan for the player name in the save file - Xbox 360 version (00 FF XX XX XX FF XX XX XX FF XX XX XX)"""
         if not self.save_data:
@@ -278,41 +597,21 @@ class XboxColorEditor:
             messagebox.showerror("ERROR", "Please enter a character name")
             return
             
+        # A failed scan must not leave an earlier scan's offsets for save_changes to write to
+        self.forget_block()
         try:
             print(f"Scanning for name '{player_name}' in Xbox 360 save file...")
             
-            # First, search for the name in the save file (case insensitive)
-            found_pos = -1
-            
-            # Try a direct search first (faster)
-            player_name_bytes = player_name.encode('utf-8', errors='replace')
-            found_pos = self.save_data.find(player_name_bytes)
-            
+            # Use the save catalog's offset if it indexed this exact version of the file,
+            # otherwise check every occurrence of the name (any case) against the full block
+            # layout and take the best one; a tie between valid blocks raises AmbiguousNameError
+            found_pos = save_catalog.catalog_name_pos(self.file_path, self.layout, player_name,
+                                                      self.save_data, self.loaded_fingerprint)
             if found_pos == -1:
-                # Try case-insensitive search
-                save_str = self.save_data.decode('latin-1', errors='replace').lower()
-                player_name_lower = player_name.lower()
-                
-                if player_name_lower in save_str:
-                    found_pos = save_str.find(player_name_lower)
-                    print(f"Found name '{player_name}' using case-insensitive search at position: {found_pos:X}")
-            else:
-                print(f"Found name '{player_name}' using direct search at position: {found_pos:X}")
-            
-            if found_pos == -1:
-                # Try a character-by-character search
-                for i in range(len(self.save_data) - len(player_name)):
-                    match = True
-                    for j, char in enumerate(player_name.lower()):
-                        byte_val = self.save_data[i + j]
-                        if byte_val != ord(char) and byte_val != ord(char.upper()):
-                            match = False
-                            break
-                    
-                    if match:
-                        found_pos = i
-                        print(f"Found name '{player_name}' using character-by-character search at position: {found_pos:X}")
-                        break
+                hit = self.layout.best_name_hit(self.save_data, player_name)
+                found_pos = hit.name_pos if hit else -1
+            if found_pos != -1:
+                print(f"Found name '{player_name}' at position: {found_pos:X}")
             
             if found_pos == -1:
                 messagebox.showerror("ERROR", f"Could not find character name '{player_name}' in save file")
@@ -323,13 +622,10 @@ class XboxColorEditor:
             name_end_pos = found_pos + len(player_name)
             
             # Look for 00 FF pattern after the name
-            null_ff_pos = -1
-            
-            for i in range(name_end_pos, min(name_end_pos + 20, len(self.save_data) - 1)):
-                if self.save_data[i] == 0x00 and self.save_data[i + 1] == 0xFF:
-                    null_ff_pos = i  # Position of the 00 byte (FF is at i+1)
-                    print(f"Found 00 FF at position: {null_ff_pos:X}-{null_ff_pos+1:X}")
-                    break
+            color_start_pos = self.layout.locate_block(self.save_data, found_pos, len(player_name))
+            null_ff_pos = color_start_pos - len(self.layout.marker) if color_start_pos != -1 else -1
+            if null_ff_pos != -1:
+                print(f"Found 00 FF at position: {null_ff_pos:X}-{null_ff_pos+1:X}")
             
             if null_ff_pos == -1:
                 # Try a more general search 
@@ -346,11 +642,9 @@ class XboxColorEditor:
                 print(f"Bytes in region: {debug_region.hex(' ').upper()}")
                 
                 # Look for 00 FF sequence
-                for i in range(search_start, search_end - 1):
-                    if self.save_data[i] == 0x00 and self.save_data[i + 1] == 0xFF:
-                        null_ff_pos = i
-                        print(f"Found 00 FF in extended search at position: {null_ff_pos:X}-{null_ff_pos+1:X}")
-                        break
+                null_ff_pos = self.save_data.find(self.layout.marker, search_start, search_end)
+                if null_ff_pos != -1:
+                    print(f"Found 00 FF in extended search at position: {null_ff_pos:X}-{null_ff_pos+1:X}")
             
             if null_ff_pos == -1:
                 messagebox.showerror("ERROR", "Found character name but couldn't locate 00 FF marker")
@@ -369,49 +663,29 @@ class XboxColorEditor:
             # Extract colors based on Xbox 360 format
             try:
                 # The pattern should be: 00 FF, 3 bytes (color1), FF, 3 bytes (color2), FF, 3 bytes (color3)
+                if color_start_pos + self.layout.block_size > len(self.save_data):
+                    raise ValueError(f"Color block at {color_start_pos:X} runs past the end of the file")
                 
-                # Extract color1 (right after the 00 FF)
-                color1_pos = color_start_pos
-                color1_bytes = self.save_data[color1_pos:color1_pos+3]
-                self.color_positions["color1"] = color1_pos
-                print(f"Color1 bytes: {color1_bytes.hex(' ').upper()}")
-                
-                # Check for first FF separator
-                ff1_pos = color1_pos + 3
-                if self.save_data[ff1_pos] != 0xFF:
-                    raise ValueError(f"Expected FF separator at {ff1_pos:X}, found {self.save_data[ff1_pos]:02X}")
+                # Check the FF separators between the color slots
+                for sep_off in self.layout.separator_offsets:
+                    ff_pos = color_start_pos + sep_off
+                    if self.save_data[ff_pos] != self.layout.separator:
+                        raise ValueError(f"Expected FF separator at {ff_pos:X}, found {self.save_data[ff_pos]:02X}")
                 
-                # Extract color2
-                color2_pos = ff1_pos + 1
-                color2_bytes = self.save_data[color2_pos:color2_pos+3]
-                self.color_positions["color2"] = color2_pos
-                print(f"Color2 bytes: {color2_bytes.hex(' ').upper()}")
+                # The block checks out; only now does it become the one save_changes writes to
+                self.name_pos = found_pos
+                self.name_len = len(player_name)
+                self.marker_pos = null_ff_pos
                 
-                # Check for second FF separator
-                ff2_pos = color2_pos + 3
-                if self.save_data[ff2_pos] != 0xFF:
-                    raise ValueError(f"Expected FF separator at {ff2_pos:X}, found {self.save_data[ff2_pos]:02X}")
-                
-                # Extract color3
-                color3_pos = ff2_pos + 1
-                color3_bytes = self.save_data[color3_pos:color3_pos+3]
-                self.color_positions["color3"] = color3_pos
-                print(f"Color3 bytes: {color3_bytes.hex(' ').upper()}")
-                
-                # Update color values in the UI
-                colors = {
-                    "color1": color1_bytes,
-                    "color2": color2_bytes,
-                    "color3": color3_bytes
-                }
+                # Decode all three colors in one pass
+                self.color_positions.update(self.layout.slot_positions(color_start_pos))
+                colors = self.layout.decode_block(self.save_data, color_start_pos)
                 
                 # Debug color values
-                print(f"Color1: #{color1_bytes.hex().upper()} at position {color1_pos:X}")
-                print(f"Color2: #{color2_bytes.hex().upper()} at position {color2_pos:X}")
-                print(f"Color3: #{color3_bytes.hex().upper()} at position {color3_pos:X}")
+                for color_name, hex_color in colors.items():
+                    print(f"{color_name.capitalize()}: {hex_color} at position {self.color_positions[color_name]:X}")
                 
-                for color_name, color_bytes in colors.items():
-                    hex_color = f"#{color_bytes.hex().upper()}"
+                for color_name, hex_color in colors.items():
                     # Update variables
                     self.color_values[color_name].set(hex_color)
                     self.hex_displays[color_name].set(hex_color)
@@ -422,6 +696,7 @@ class XboxColorEditor:
                 messagebox.showinfo("SUCCESS", f"Found character colors for '{player_name}' successfully!")
                 self.status_var.set(f"COLORS LOADED FOR '{player_name.upper()}'")
                 self.modified = False
+                self.remember_session(player_name)
                 
             except Exception as e:
                 # If we failed to extract the colors in the usual pattern, try to debug
@@ -456,6 +731,10 @@ class XboxColorEditor:
                     print(f"Expected FF1 at: {expected_ff1_pos:X}, Found: {ff_positions[0]:X}")
                     print(f"Expected FF2 at: {expected_ff2_pos:X}, Found: {ff_positions[1]:X}")
                     
+                    self.name_pos = found_pos
+                    self.name_len = len(player_name)
+                    self.marker_pos = null_ff_pos
+                    
                     # Try to extract colors even if the positions don't match perfectly
                     # Color1: 3 bytes starting right after 00 FF
                     color1_pos = null_ff_pos + 2
@@ -479,14 +758,9 @@ class XboxColorEditor:
                         print(f"Alternative Color3: #{color3_bytes.hex().upper()} at position {color3_pos:X}")
                     
                     # Update UI with the colors we found
-                    colors = {
-                        "color1": self.save_data[self.color_positions["color1"]:self.color_positions["color1"]+3],
-                        "color2": self.save_data[self.color_positions["color2"]:self.color_positions["color2"]+3],
-                        "color3": self.save_data[self.color_positions["color3"]:self.color_positions["color3"]+3]
-                    }
-                    
-                    for color_name, color_bytes in colors.items():
-                        hex_color = f"#{color_bytes.hex().upper()}"
+                    for color_name in self.layout.slot_names:
+                        color_pos = self.color_positions[color_name]
+                        hex_color = self.layout.decode_slot(self.save_data[color_pos:color_pos+3])
                         # Update variables
                         self.color_values[color_name].set(hex_color)
                         self.hex_displays[color_name].set(hex_color)
@@ -497,12 +771,20 @@ class XboxColorEditor:
                     messagebox.showinfo("SUCCESS", f"Found character colors for '{player_name}' using alternative method!")
                     self.status_var.set(f"COLORS LOADED FOR '{player_name.upper()}' (ALTERNATIVE METHOD)")
                     self.modified = False
+                    # Not remembered: these offsets were guessed without the block's separators
                     return
                 
                 # If we couldn't extract the colors using the alternative method, show the error
                 messagebox.showerror("ERROR", f"Found potential character data but failed to extract colors: {str(e)}")
                 self.status_var.set("ERROR EXTRACTING COLORS")
                 
+        except AmbiguousNameError as e:
+            # Forget any located block so save_changes refuses to write to a guessed one
+            self.forget_block()
+            messagebox.showerror("AMBIGUOUS NAME", f"{str(e)}\n\nNothing will be saved. Pick another name from the list or inspect the save in the hex view.")
+            print(f"Ambiguous name hits: {e.hits}")
+            self.status_var.set("AMBIGUOUS NAME - SAVING DISABLED")
+            
         except Exception as e:
             messagebox.showerror("ERROR", f"Error during scan: {str(e)}")
             print(f"Exception details: {e}")